@@ -0,0 +1,368 @@
+'''
+Bucket backups: :func:`export_bucket` writes every object of a bucket
+to a local file, and :func:`import_bucket` stores them back, in the same
+bucket or another one, on the same cluster or another one.
+
+Keys are paged from the ``$bucket`` secondary index, or from a range of
+any other index, and objects are fetched and stored with pipelined
+requests. Their values are copied as is, without decoding.
+
+The file holds one record per sibling: a 4-byte big-endian length
+followed by an ``RpbPutReq`` protocol buffer with the key, the vector
+clock and the ``RpbContent`` of the sibling. An index of the records
+follows, so that :class:`BackupReader` finds the records of a key
+without reading the whole file, which it memory-maps.
+
+Run it from the command line with ``aioriak-backup`` or ``python -m
+aioriak.backup``::
+
+    aioriak-backup export --bucket-type users profiles profiles.bak
+    aioriak-backup import --bucket-type users profiles profiles.bak
+'''
+import argparse
+import asyncio
+import logging
+import mmap
+import struct
+from riak.pb import riak_kv_pb2
+from aioriak.error import RiakError
+
+
+logger = logging.getLogger('aioriak.backup')
+
+#: Default number of requests in flight
+DEFAULT_CONCURRENCY = 16
+
+#: Default number of keys per secondary index page on export
+DEFAULT_PAGE_SIZE = 1000
+
+#: Default number of records stored per pipeline on import
+DEFAULT_BATCH_SIZE = 1000
+
+MAGIC = b'AIORIAKB'
+VERSION = 2
+
+# Magic and version
+_HEADER = struct.Struct('>8sB')
+# Length of a record
+_LENGTH = struct.Struct('>I')
+# Offset of a record and length of its key, followed by the key
+_ENTRY = struct.Struct('>QI')
+# Offset of the index, number of records and magic
+_TRAILER = struct.Struct('>QI8s')
+
+
+class BackupWriter:
+    '''
+    Writes a backup file, see :mod:`aioriak.backup`. The index is
+    written when the writer is closed.
+
+    :param path: the path of the file
+    :type path: str
+    '''
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION))
+        self._index = []
+
+    def __len__(self):
+        return len(self._index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            # Without its index, the incomplete file cannot be read
+            self._file.close()
+
+    def write(self, key, vclock, content):
+        '''
+        Appends the record of a sibling.
+
+        :param key: the key of the object
+        :type key: bytes
+        :param vclock: the vector clock of the object
+        :type vclock: bytes
+        :param content: the sibling
+        :type content: riak_pb2.RpbContent
+        '''
+        req = riak_kv_pb2.RpbPutReq(key=key, vclock=vclock)
+        req.content.CopyFrom(content)
+        # The bucket is left out, it is given on import
+        data = req.SerializePartialToString()
+        self._index.append((self._file.tell(), key))
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+
+    def close(self):
+        '''
+        Writes the index and closes the file.
+        '''
+        if self._file.closed:
+            return
+        offset = self._file.tell()
+        for record, key in self._index:
+            self._file.write(_ENTRY.pack(record, len(key)))
+            self._file.write(key)
+        self._file.write(_TRAILER.pack(offset, len(self._index), MAGIC))
+        self._file.close()
+
+
+class BackupReader:
+    '''
+    Reads a backup file, see :mod:`aioriak.backup`. The file is
+    memory-mapped, and records are parsed as they are read.
+
+    Iterating over the reader yields the ``RpbPutReq`` record of every
+    sibling, in file order.
+
+    :param path: the path of the file
+    :type path: str
+    '''
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('{} is not an aioriak backup'.format(path))
+        self._index_offset, self._count, magic = _TRAILER.unpack_from(
+            self._map, len(self._map) - _TRAILER.size)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('{} is truncated'.format(path))
+        self._offsets = None
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def _read(self, offset):
+        length, = _LENGTH.unpack_from(self._map, offset)
+        start = offset + _LENGTH.size
+        req = riak_kv_pb2.RpbPutReq()
+        req.ParseFromString(self._map[start:start + length])
+        return req, start + length
+
+    def __iter__(self):
+        offset = _HEADER.size
+        while offset < self._index_offset:
+            req, offset = self._read(offset)
+            yield req
+
+    def _load_index(self):
+        offsets = {}
+        position = self._index_offset
+        for _ in range(self._count):
+            record, length = _ENTRY.unpack_from(self._map, position)
+            position += _ENTRY.size
+            key = self._map[position:position + length]
+            position += length
+            offsets.setdefault(key, []).append(record)
+        self._offsets = offsets
+
+    def keys(self):
+        '''
+        Returns the keys of the backup.
+
+        :rtype: list of bytes
+        '''
+        if self._offsets is None:
+            self._load_index()
+        return list(self._offsets)
+
+    def get(self, key):
+        '''
+        Returns the records of the siblings of a key, without reading
+        the other records.
+
+        :param key: the key
+        :type key: bytes
+        :rtype: list of RpbPutReq messages
+        '''
+        if self._offsets is None:
+            self._load_index()
+        return [self._read(offset)[0]
+                for offset in self._offsets.get(key, [])]
+
+
+async def export_bucket(bucket, path, index='$bucket', startkey=None,
+                        endkey=None, concurrency=DEFAULT_CONCURRENCY,
+                        page_size=DEFAULT_PAGE_SIZE):
+    '''
+    Writes the objects of a bucket to a backup file. Tombstones are left
+    out, and siblings are kept.
+
+    By default, every key of the bucket is exported, paged from the
+    ``$bucket`` secondary index. Another index range can be given with
+    ``index``, ``startkey`` and ``endkey``.
+
+    :param bucket: the bucket to export
+    :type bucket: :class:`~aioriak.bucket.Bucket`
+    :param path: the path of the backup file
+    :type path: str
+    :param index: the secondary index listing the keys
+    :type index: str
+    :param startkey: the beginning of the index range, the bucket name
+        for ``$bucket``
+    :type startkey: str | int
+    :param endkey: the end of the index range
+    :type endkey: str | int
+    :param concurrency: the number of fetches in flight
+    :type concurrency: int
+    :param page_size: the number of keys per index page
+    :type page_size: int
+    :rtype: int, the number of objects exported
+    '''
+    if startkey is None and index == '$bucket':
+        startkey = bucket.name
+    exported = 0
+    continuation = None
+    with BackupWriter(path) as writer:
+        while True:
+            keys, continuation = await bucket.get_index(
+                index, startkey, endkey, max_results=page_size,
+                continuation=continuation)
+            responses = await bucket._client._get_raw(bucket, keys,
+                                                      concurrency)
+            for key, resp in zip(keys, responses):
+                # Keys deleted since they were listed have no content
+                contents = [c for c in resp.content if not c.deleted]
+                if contents:
+                    exported += 1
+                for content in contents:
+                    writer.write(key.encode(), resp.vclock, content)
+            if not continuation:
+                break
+    return exported
+
+
+async def import_bucket(bucket, path, concurrency=DEFAULT_CONCURRENCY,
+                        batch_size=DEFAULT_BATCH_SIZE, vclocks=True):
+    '''
+    Stores the records of a backup file in a bucket. The siblings of an
+    object are stored with the same vector clock, so they are restored
+    as siblings if the bucket allows them.
+
+    A failed batch does not stop the import; the first error is raised
+    once every record has been sent.
+
+    :param bucket: the bucket to import into
+    :type bucket: :class:`~aioriak.bucket.Bucket`
+    :param path: the path of the backup file
+    :type path: str
+    :param concurrency: the number of stores in flight
+    :type concurrency: int
+    :param batch_size: the number of records per pipeline
+    :type batch_size: int
+    :param vclocks: whether to store the objects with their exported
+        vector clocks; without them, objects already in the bucket get
+        the imported values as siblings or are overwritten
+    :type vclocks: bool
+    :rtype: int, the number of records imported
+    '''
+    errors = []
+    imported = 0
+
+    async def flush(batch):
+        try:
+            await bucket._client._put_raw(bucket, batch, concurrency)
+        except RiakError as exc:
+            logger.warning('Could not import a batch of %d records into '
+                           '%r: %s', len(batch), bucket, exc)
+            errors.append(exc)
+            return 0
+        return len(batch)
+
+    with BackupReader(path) as reader:
+        batch = []
+        for req in reader:
+            if not vclocks:
+                req.ClearField('vclock')
+            batch.append(req)
+            if len(batch) >= batch_size:
+                imported += await flush(batch)
+                batch = []
+        if batch:
+            imported += await flush(batch)
+    if errors:
+        raise errors[0]
+    return imported
+
+
+def main(argv=None):
+    '''
+    Command line entry point, see ``aioriak-backup --help``.
+    '''
+    from aioriak.client import RiakClient
+    parser = argparse.ArgumentParser(
+        prog='aioriak-backup',
+        description='Export the objects of a Riak bucket to a file, or '
+                    'import them back.')
+    parser.add_argument('command', choices=('export', 'import'))
+    parser.add_argument('bucket', help='the bucket to export or import')
+    parser.add_argument('path', help='the backup file')
+    parser.add_argument('--bucket-type', default='default',
+                        help='the bucket type of the bucket')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8087)
+    parser.add_argument('--concurrency', type=int,
+                        default=DEFAULT_CONCURRENCY,
+                        help='number of requests in flight')
+    parser.add_argument('--index', default='$bucket',
+                        help='secondary index listing the keys to export')
+    parser.add_argument('--start', help='beginning of the index range')
+    parser.add_argument('--end', help='end of the index range')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--batch-size', type=int,
+                        default=DEFAULT_BATCH_SIZE,
+                        help='number of records per pipeline on import')
+    parser.add_argument('--no-vclocks', action='store_true',
+                        help='import without the exported vector clocks')
+    args = parser.parse_args(argv)
+    if args.index.endswith('_int'):
+        args.start = None if args.start is None else int(args.start)
+        args.end = None if args.end is None else int(args.end)
+
+    logging.basicConfig(level=logging.WARNING)
+    loop = asyncio.get_event_loop()
+
+    async def go():
+        client = await RiakClient.create(args.host, args.port, loop=loop)
+        try:
+            bucket = client.bucket(args.bucket, args.bucket_type)
+            if args.command == 'export':
+                return await export_bucket(
+                    bucket, args.path, args.index, args.start, args.end,
+                    concurrency=args.concurrency, page_size=args.page_size)
+            return await import_bucket(
+                bucket, args.path, concurrency=args.concurrency,
+                batch_size=args.batch_size, vclocks=not args.no_vclocks)
+        finally:
+            client.close()
+
+    try:
+        count = loop.run_until_complete(go())
+    except RiakError as exc:
+        print('{} failed: {}'.format(args.command, exc))
+        return 1
+    if args.command == 'export':
+        print('exported {} objects'.format(count))
+    else:
+        print('imported {} records'.format(count))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
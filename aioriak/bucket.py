@@ -1,4 +1,53 @@
+import asyncio
 from aioriak.datatypes import TYPES
+from aioriak.codecs import get_json_codec
+from aioriak import compression
+from aioriak import chunked
+
+
+class _PropertyCache:
+    '''
+    Properties of a bucket or bucket type as last fetched from Riak.
+    Concurrent fetches share a single request.
+    '''
+    def __init__(self):
+        self._props = None
+        self._expires = None
+        self._fetching = None
+        self._generation = 0
+
+    async def get(self, fetch, ttl, loop):
+        '''
+        Returns the cached properties, or fetches them with ``fetch()``
+        and keeps them ``ttl`` seconds: forever if None, not at all if 0.
+        '''
+        if self._props is not None and (self._expires is None or
+                                        loop.time() < self._expires):
+            return self._props
+        if self._fetching is None:
+            self._fetching = asyncio.ensure_future(
+                self._fetch(fetch, ttl, loop), loop=loop)
+        return await asyncio.shield(self._fetching, loop=loop)
+
+    def invalidate(self):
+        self._props = None
+        self._fetching = None
+        self._generation += 1
+
+    async def _fetch(self, fetch, ttl, loop):
+        generation = self._generation
+        try:
+            props = await fetch()
+        finally:
+            if generation == self._generation:
+                self._fetching = None
+        if generation == self._generation and ttl != 0:
+            self._props = props
+            self._expires = None if ttl is None else loop.time() + ttl
+        return props
+
+
+_UNKNOWN = object()
 
 
 def bucket_property(name, doc=None):
@@ -42,6 +91,9 @@ class Bucket:
         self._encoders = {}
         self._decoders = {}
         self._resolver = None
+        self._compression = None
+        self._offload = None
+        self._props = _PropertyCache()
 
     def _get_resolver(self):
         if callable(self._resolver):
@@ -71,7 +123,7 @@ class Bucket:
     def get_decoder(self, content_type):
         '''
         Get the decoding function for the provided content type for
-        this bucket.
+        this bucket, falling back to the bucket type and then the client.
 
         :param content_type: the requested media type
         :type content_type: str
@@ -80,12 +132,12 @@ class Bucket:
         if content_type in self._decoders:
             return self._decoders[content_type]
         else:
-            return self._client.get_decoder(content_type)
+            return self.bucket_type.get_decoder(content_type)
 
     def get_encoder(self, content_type):
         '''
         Get the encoding function for the provided content type for
-        this bucket.
+        this bucket, falling back to the bucket type and then the client.
 
         :param content_type: the requested media type
         :type content_type: str
@@ -94,7 +146,7 @@ class Bucket:
         if content_type in self._encoders:
             return self._encoders[content_type]
         else:
-            return self._client.get_encoder(content_type)
+            return self.bucket_type.get_encoder(content_type)
 
     def set_encoder(self, content_type, encoder):
         '''
@@ -124,6 +176,82 @@ class Bucket:
         self._decoders[content_type] = decoder
         return self
 
+    def set_json_codec(self, name):
+        '''
+        Use the named JSON backend for the ``application/json`` and
+        ``text/json`` content types in this bucket.
+
+        :param name: one of ``'orjson'``, ``'ujson'`` or ``'json'``
+        :type name: str
+        '''
+        encoder, decoder = get_json_codec(name)
+        for content_type in ('application/json', 'text/json'):
+            self.set_encoder(content_type, encoder)
+            self.set_decoder(content_type, decoder)
+        return self
+
+    def get_compression(self):
+        '''
+        Get the compression policy for values stored in this bucket,
+        falling back to the bucket type and then the client.
+
+        :rtype: tuple of algorithm and threshold, or None
+        '''
+        if self._compression is None:
+            return self.bucket_type.get_compression()
+        # False when compression is disabled here
+        return self._compression or None
+
+    def set_compression(self, algorithm,
+                        threshold=compression.DEFAULT_THRESHOLD):
+        '''
+        Compress values stored in this bucket whose encoded size is at
+        least ``threshold`` bytes. The algorithm is recorded in the
+        ``content_encoding`` of the value, which is decompressed
+        transparently on read.
+
+        :param algorithm: one of ``'gzip'``, ``'deflate'``, ``'zstd'``
+            or ``'lz4'``, or None to disable compression even if the
+            bucket type or the client sets a policy
+        :type algorithm: str, None
+        :param threshold: the minimal encoded size to compress, in bytes
+        :type threshold: int
+        '''
+        if algorithm is None:
+            self._compression = False
+        else:
+            compression.validate_algorithm(algorithm)
+            self._compression = (algorithm, threshold)
+        return self
+
+    def get_offload(self):
+        '''
+        Get the offload policy for values stored in this bucket, falling
+        back to the bucket type and then the client.
+
+        :rtype: tuple of threshold and executor, or None
+        '''
+        if self._offload is not None:
+            return self._offload
+        else:
+            return self.bucket_type.get_offload()
+
+    def set_offload(self, threshold, executor=None):
+        '''
+        Encode and decode values of at least ``threshold`` bytes in an
+        executor instead of the event loop thread. This applies to
+        :meth:`RiakObject.load_data
+        <aioriak.riak_object.RiakObject.load_data>` and to stores.
+
+        :param threshold: the minimal encoded size to offload, in bytes
+        :type threshold: int
+        :param executor: the executor to use, the loop's default
+            executor if None
+        :type executor: :class:`concurrent.futures.Executor`
+        '''
+        self._offload = (threshold, executor)
+        return self
+
     async def set_property(self, key, value):
         '''
         Set a bucket property.
@@ -156,11 +284,24 @@ class Bucket:
 
     async def get_properties(self):
         '''
-        Retrieve a dict of all bucket properties.
+        Retrieve a dict of all bucket properties. Properties are cached
+        for the client's ``props_ttl``, see :meth:`invalidate`.
 
         :rtype: dict
         '''
-        return await self._client.get_bucket_props(self)
+        return dict(await self._props.get(
+            lambda: self._client.get_bucket_props(self),
+            self._client._props_ttl, self._loop()))
+
+    def invalidate(self):
+        '''
+        Drops the cached bucket properties, so that the next access
+        fetches them from Riak.
+        '''
+        self._props.invalidate()
+
+    def _loop(self):
+        return self._client._loop or asyncio.get_event_loop()
 
     async def get_keys(self):
         '''
@@ -170,22 +311,50 @@ class Bucket:
         '''
         return await self._client.get_keys(self)
 
-    async def get(self, key):
+    async def get(self, key, if_modified=None):
         '''
         Retrieve an :class:`~aioriak.riak_object.RiakObject` or
         :class:`~aioriak.datatypes.Datatype`, based on the presence and value
         of the :attr:`datatype <BucketType.datatype>` bucket property.
 
+        With ``if_modified``, an object whose vector clock is unchanged is
+        not transferred: the returned object only has its
+        :attr:`~aioriak.riak_object.RiakObject.unchanged` attribute set::
+
+            obj = await bucket.get('key', if_modified=cached.vclock)
+            if not obj.unchanged:
+                cached = obj
+
         :param key: Name of the key.
         :type key: string
+        :param if_modified: the vector clock of a previously fetched
+            version of the object, not supported by datatypes
+        :type if_modified: :class:`~riak.riak_object.VClock` or bytes
         :rtype: :class:`RiakObject <aioriak.riak_object.RiakObject>` or
            :class:`~aioriak.datatypes.Datatype`
         '''
         if await self.bucket_type.get_datatype():
+            if if_modified is not None:
+                raise ValueError('if_modified is not supported by datatypes')
             return await self._client.fetch_datatype(self, key)
         from aioriak.riak_object import RiakObject
         obj = RiakObject(self._client, self, key)
-        return await obj.reload()
+        return await obj.reload(if_modified=if_modified)
+
+    async def head(self, key):
+        '''
+        Retrieve the metadata of the siblings of an object (vector clock,
+        vtag, last modification time, user metadata, indexes, content
+        type) without their values, e.g. to check that the object exists.
+        The siblings are left unresolved.
+
+        :param key: Name of the key.
+        :type key: string
+        :rtype: :class:`RiakObject <aioriak.riak_object.RiakObject>`
+        '''
+        from aioriak.riak_object import RiakObject
+        obj = RiakObject(self._client, self, key)
+        return await obj.reload(head_only=True)
 
     async def new(self, key=None, data=None, content_type='application/json',
                   encoded_data=None):
@@ -218,6 +387,10 @@ class Bucket:
         :type encoded_data: str
         :rtype: :class:`~aioriak.riak_object.RiakObject` or
                 :class:`~aioriak.datatypes.Datatype`
+
+        When the client has a vector clock cache, a new object gets the
+        last vector clock seen for its key, so that storing it replaces
+        the current value instead of creating a sibling.
         '''
         from aioriak import RiakObject
         datatype = await self.bucket_type.get_datatype()
@@ -225,6 +398,8 @@ class Bucket:
             return TYPES[datatype](bucket=self, key=key)
 
         obj = RiakObject(self._client, self, key)
+        if key is not None and self._client._vclocks is not None:
+            obj.vclock = self._client._vclocks.get(self, key)
         obj.content_type = content_type
         if data is not None:
             obj.data = data
@@ -244,6 +419,92 @@ class Bucket:
         '''
         return await (await self.new(key)).delete(**kwargs)
 
+    async def store_chunked(self, key, data=None,
+                            content_type='application/json',
+                            encoded_data=None, chunk_size=chunked.CHUNK_SIZE,
+                            threshold=chunked.DEFAULT_THRESHOLD,
+                            concurrency=chunked.DEFAULT_CONCURRENCY):
+        '''
+        Stores a large value, splitting it into chunk objects when its
+        encoded size is at least ``threshold`` bytes. The chunks are
+        stored under keys derived from ``key`` and a generation id new to
+        each write (see :func:`aioriak.chunked.chunk_key`), and a small
+        manifest object is stored under ``key`` once all of them are
+        written. The chunks of the previous value are deleted after that.
+        Smaller values are stored as a regular object.
+
+        Chunked values must be read with :meth:`get_chunked` or
+        :meth:`stream_chunked` and deleted with :meth:`delete_chunked`.
+
+        :param key: Name of the key.
+        :type key: str
+        :param data: The data to store, see :meth:`new`.
+        :type data: object
+        :param content_type: The media type of the data.
+        :type content_type: str
+        :param encoded_data: The encoded data to store, see :meth:`new`.
+        :type encoded_data: bytes
+        :param chunk_size: The size of each chunk, in bytes.
+        :type chunk_size: int
+        :param threshold: The minimal encoded size to split, in bytes.
+        :type threshold: int
+        :param concurrency: The number of chunk writes in flight.
+        :type concurrency: int
+        :rtype: :class:`~aioriak.riak_object.RiakObject`
+        '''
+        return await chunked.store(self, key, data, content_type,
+                                   encoded_data, chunk_size, threshold,
+                                   concurrency)
+
+    async def get_chunked(self, key,
+                          concurrency=chunked.DEFAULT_CONCURRENCY):
+        '''
+        Retrieves a value stored with :meth:`store_chunked`, fetching
+        and reassembling its chunks. Values that were not chunked are
+        returned as fetched.
+
+        :param key: Name of the key.
+        :type key: str
+        :param concurrency: The number of chunk reads in flight.
+        :type concurrency: int
+        :rtype: :class:`~aioriak.riak_object.RiakObject`
+        '''
+        return await chunked.fetch(self, key, concurrency)
+
+    async def stream_chunked(self, key,
+                             prefetch=chunked.DEFAULT_CONCURRENCY):
+        '''
+        Streams the encoded chunks of a value stored with
+        :meth:`store_chunked`, without reassembling it in memory.
+
+        Example::
+
+            stream = await bucket.stream_chunked('video')
+            async for chunk in stream:
+                output.write(chunk)
+
+        :param key: Name of the key.
+        :type key: str
+        :param prefetch: The number of chunks fetched ahead.
+        :type prefetch: int
+        :rtype: :class:`~aioriak.chunked.ChunkStream`
+        '''
+        return await chunked.stream(self, key, prefetch)
+
+    async def delete_chunked(self, key,
+                             concurrency=chunked.DEFAULT_CONCURRENCY):
+        '''
+        Deletes a value stored with :meth:`store_chunked`, including
+        its chunks.
+
+        :param key: Name of the key.
+        :type key: str
+        :param concurrency: The number of chunk deletes in flight.
+        :type concurrency: int
+        :rtype: :class:`~aioriak.riak_object.RiakObject`
+        '''
+        return await chunked.delete(self, key, concurrency)
+
     async def get_index(self, index, startkey, endkey=None,
                         return_terms=None, max_results=None,
                         continuation=None, timeout=None, term_regex=None):
@@ -285,6 +546,13 @@ class BucketType:
         '''
         self._client = client
         self.name = name
+        self._encoders = {}
+        self._decoders = {}
+        self._resolver = None
+        self._compression = None
+        self._offload = None
+        self._props = _PropertyCache()
+        self._datatype = _UNKNOWN
 
     def __repr__(self):
         return "<BucketType {0}>".format(self.name)
@@ -323,6 +591,139 @@ class BucketType:
                         bucket. If the resolver is not set, the
                         client's resolver will be used.''')
 
+    def get_decoder(self, content_type):
+        '''
+        Get the decoding function for the provided content type for
+        buckets of this type, falling back to the client.
+
+        :param content_type: the requested media type
+        :type content_type: str
+        :rtype: function
+        '''
+        if content_type in self._decoders:
+            return self._decoders[content_type]
+        else:
+            return self._client.get_decoder(content_type)
+
+    def get_encoder(self, content_type):
+        '''
+        Get the encoding function for the provided content type for
+        buckets of this type, falling back to the client.
+
+        :param content_type: the requested media type
+        :type content_type: str
+        :rtype: function
+        '''
+        if content_type in self._encoders:
+            return self._encoders[content_type]
+        else:
+            return self._client.get_encoder(content_type)
+
+    def set_encoder(self, content_type, encoder):
+        '''
+        Set the encoding function for the provided content type for
+        buckets of this type.
+
+        :param content_type: the requested media type
+        :type content_type: str
+        :param encoder: an encoding function, takes a single object
+            argument and returns encoded data
+        :type encoder: function
+        '''
+        self._encoders[content_type] = encoder
+        return self
+
+    def set_decoder(self, content_type, decoder):
+        '''
+        Set the decoding function for the provided content type for
+        buckets of this type.
+
+        :param content_type: the requested media type
+        :type content_type: str
+        :param decoder: a decoding function, takes encoded data and
+            returns a Python type
+        :type decoder: function
+        '''
+        self._decoders[content_type] = decoder
+        return self
+
+    def set_json_codec(self, name):
+        '''
+        Use the named JSON backend for the ``application/json`` and
+        ``text/json`` content types in buckets of this type.
+
+        :param name: one of ``'orjson'``, ``'ujson'`` or ``'json'``
+        :type name: str
+        '''
+        encoder, decoder = get_json_codec(name)
+        for content_type in ('application/json', 'text/json'):
+            self.set_encoder(content_type, encoder)
+            self.set_decoder(content_type, decoder)
+        return self
+
+    def get_compression(self):
+        '''
+        Get the compression policy for values stored in buckets of
+        this type, falling back to the client.
+
+        :rtype: tuple of algorithm and threshold, or None
+        '''
+        if self._compression is None:
+            return self._client.get_compression()
+        # False when compression is disabled here
+        return self._compression or None
+
+    def set_compression(self, algorithm,
+                        threshold=compression.DEFAULT_THRESHOLD):
+        '''
+        Compress values stored in buckets of this type whose encoded
+        size is at least ``threshold`` bytes. The algorithm is recorded
+        in the ``content_encoding`` of the value, which is decompressed
+        transparently on read.
+
+        :param algorithm: one of ``'gzip'``, ``'deflate'``, ``'zstd'``
+            or ``'lz4'``, or None to disable compression even if the
+            client sets a policy
+        :type algorithm: str, None
+        :param threshold: the minimal encoded size to compress, in bytes
+        :type threshold: int
+        '''
+        if algorithm is None:
+            self._compression = False
+        else:
+            compression.validate_algorithm(algorithm)
+            self._compression = (algorithm, threshold)
+        return self
+
+    def get_offload(self):
+        '''
+        Get the offload policy for values stored in buckets of this
+        type, falling back to the client.
+
+        :rtype: tuple of threshold and executor, or None
+        '''
+        if self._offload is not None:
+            return self._offload
+        else:
+            return self._client.get_offload()
+
+    def set_offload(self, threshold, executor=None):
+        '''
+        Encode and decode values of at least ``threshold`` bytes stored
+        in buckets of this type in an executor instead of the event loop
+        thread. This applies to
+        :meth:`RiakObject.load_data
+        <aioriak.riak_object.RiakObject.load_data>` and to stores.
+
+        :param threshold: the minimal encoded size to offload, in bytes
+        :type threshold: int
+        :param executor: the executor to use, the loop's default
+            executor if None
+        :type executor: :class:`concurrent.futures.Executor`
+        '''
+        self._offload = (threshold, executor)
+        return self
+
     def is_default(self):
         '''
         Whether this bucket type is the default type, or a user-defined type.
@@ -339,7 +740,7 @@ class BucketType:
         :type key: string
         :rtype: mixed
         '''
-        return await self.get_properties()[key]
+        return (await self.get_properties())[key]
 
     async def set_property(self, key, value):
         '''
@@ -354,11 +755,14 @@ class BucketType:
 
     async def get_properties(self):
         '''
-        Retrieve a dict of all bucket-type properties.
+        Retrieve a dict of all bucket-type properties. Properties are
+        cached for the client's ``props_ttl``, see :meth:`invalidate`.
 
         :rtype: dict
         '''
-        return await self._client.get_bucket_type_props(self)
+        return dict(await self._props.get(
+            lambda: self._client.get_bucket_type_props(self),
+            self._client._props_ttl, self._loop()))
 
     async def set_properties(self, props):
         '''
@@ -369,6 +773,17 @@ class BucketType:
         '''
         await self._client.set_bucket_type_props(self, props)
 
+    def invalidate(self):
+        '''
+        Drops the cached bucket-type properties and datatype, so that
+        the next access fetches them from Riak.
+        '''
+        self._props.invalidate()
+        self._datatype = _UNKNOWN
+
+    def _loop(self):
+        return self._client._loop or asyncio.get_event_loop()
+
     def bucket(self, name):
         '''
         Gets a bucket that belongs to this bucket-type.
@@ -394,10 +809,12 @@ class BucketType:
 
     async def get_datatype(self):
         '''
-        The assigned datatype for this bucket type, if present.
+        The assigned datatype for this bucket type, if present. It cannot
+        change once the bucket type is active, so it is cached until
+        :meth:`invalidate` is called.
 
         :rtype: None or string
         '''
-        if not hasattr(self, '_datatype'):
+        if self._datatype is _UNKNOWN:
             self._datatype = (await self.get_properties()).get('datatype')
         return self._datatype
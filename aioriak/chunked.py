@@ -0,0 +1,288 @@
+'''
+Chunked objects: values too large to be stored as a single Riak object
+are split into fixed-size chunk objects plus a small manifest object
+stored under the original key.
+
+Every write of a value uses new chunk keys, tagged with a generation id
+recorded in the manifest. The manifest is written after all chunks, and
+the chunks of the previous generation are only deleted afterwards, so
+readers never see a partially written value and chunks are never
+overwritten. Chunks are written and read concurrently.
+See :meth:`Bucket.store_chunked <aioriak.bucket.Bucket.store_chunked>`.
+'''
+import asyncio
+import uuid
+from aioriak.error import RiakError
+from aioriak.util import discard_result
+
+
+#: Default chunk size, in bytes
+CHUNK_SIZE = 1024 * 1024
+
+#: Values smaller than this many encoded bytes are stored as a single
+#: object
+DEFAULT_THRESHOLD = CHUNK_SIZE
+
+#: Default number of chunk requests in flight
+DEFAULT_CONCURRENCY = 4
+
+#: User metadata key marking manifest objects
+MANIFEST_USERMETA = 'aioriak-chunked'
+
+_MANIFEST_CONTENT_TYPE = 'application/json'
+_CHUNK_CONTENT_TYPE = 'binary/octet-stream'
+
+
+def chunk_key(key, index, generation=None):
+    '''
+    Returns the key of a chunk of the given manifest key.
+
+    :param key: the manifest key
+    :type key: str
+    :param index: the chunk number
+    :type index: int
+    :param generation: the generation id of the value, from its
+        manifest; None for values stored before generations existed
+    :type generation: str
+    :rtype: str
+    '''
+    if generation is None:
+        return '{}/chunk-{:06d}'.format(key, index)
+    return '{}/{}/chunk-{:06d}'.format(key, generation, index)
+
+
+def is_manifest(obj):
+    '''
+    Whether a fetched object is the manifest of a chunked value.
+
+    :param obj: a fetched object
+    :type obj: :class:`~aioriak.riak_object.RiakObject`
+    :rtype: bool
+    '''
+    return (len(obj.siblings) == 1 and obj.exists and
+            MANIFEST_USERMETA in obj.usermeta)
+
+
+async def _gather(loop, concurrency, coros):
+    semaphore = asyncio.Semaphore(concurrency, loop=loop)
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*[limited(coro) for coro in coros],
+                                loop=loop)
+
+
+def _loop(bucket):
+    return bucket._client._loop or asyncio.get_event_loop()
+
+
+async def _fetch_manifest(bucket, key):
+    from aioriak.riak_object import RiakObject
+    obj = RiakObject(bucket._client, bucket, key)
+    await obj.reload()
+    if is_manifest(obj):
+        return obj, await obj.load_data()
+    return obj, None
+
+
+async def _fetch_chunk(bucket, key, index, generation):
+    from aioriak.riak_object import RiakObject
+    obj = RiakObject(bucket._client, bucket,
+                     chunk_key(key, index, generation))
+    await obj.reload()
+    if not obj.exists:
+        raise RiakError('Missing chunk {} of {!r}'.format(index, key))
+    return obj.encoded_data
+
+
+async def _delete_chunks(bucket, key, manifest, concurrency):
+    from aioriak.riak_object import RiakObject
+    generation = manifest.get('generation')
+    await _gather(_loop(bucket), concurrency, [
+        RiakObject(bucket._client, bucket,
+                   chunk_key(key, index, generation)).delete()
+        for index in range(manifest['chunks'])])
+
+
+async def store(bucket, key, data=None, content_type='application/json',
+                encoded_data=None, chunk_size=CHUNK_SIZE,
+                threshold=DEFAULT_THRESHOLD,
+                concurrency=DEFAULT_CONCURRENCY):
+    '''
+    Stores a value, splitting it into chunks if its encoded size is at
+    least ``threshold`` bytes. See :meth:`Bucket.store_chunked
+    <aioriak.bucket.Bucket.store_chunked>`.
+    '''
+    from aioriak.riak_object import RiakObject
+    obj = RiakObject(bucket._client, bucket, key)
+    obj.content_type = content_type
+    if data is not None:
+        obj.data = data
+    if encoded_data is not None:
+        obj.encoded_data = encoded_data
+    value = await obj.dump_data()
+
+    previous, old_manifest = await _fetch_manifest(bucket, key)
+
+    if len(value) < threshold:
+        obj.vclock = previous.vclock
+        await obj.store(return_body=False, return_head=True)
+        if old_manifest:
+            await _delete_chunks(bucket, key, old_manifest, concurrency)
+        return obj
+
+    view = memoryview(value)
+    offsets = range(0, len(value), chunk_size)
+    # Chunk keys are new for every write, so chunks are written once and
+    # need no vector clock
+    generation = uuid.uuid4().hex
+
+    async def store_chunk(index, offset):
+        chunk = RiakObject(bucket._client, bucket,
+                           chunk_key(key, index, generation))
+        chunk.content_type = _CHUNK_CONTENT_TYPE
+        chunk.encoded_data = bytes(view[offset:offset + chunk_size])
+        await chunk.store(return_body=False)
+
+    await _gather(_loop(bucket), concurrency,
+                  [store_chunk(index, offset)
+                   for index, offset in enumerate(offsets)])
+
+    manifest = RiakObject(bucket._client, bucket, key)
+    manifest.vclock = previous.vclock
+    manifest.content_type = _MANIFEST_CONTENT_TYPE
+    manifest.usermeta = {MANIFEST_USERMETA: str(len(offsets))}
+    manifest.data = {'generation': generation,
+                     'chunks': len(offsets),
+                     'chunk_size': chunk_size,
+                     'size': len(value),
+                     'content_type': obj.content_type,
+                     'content_encoding': obj.content_encoding,
+                     'charset': obj.charset}
+    await manifest.store(return_body=False, return_head=True)
+
+    if old_manifest:
+        await _delete_chunks(bucket, key, old_manifest, concurrency)
+    return manifest
+
+
+async def fetch(bucket, key, concurrency=DEFAULT_CONCURRENCY):
+    '''
+    Fetches a value stored with :func:`store`, reassembling its chunks.
+    See :meth:`Bucket.get_chunked <aioriak.bucket.Bucket.get_chunked>`.
+    '''
+    obj, manifest = await _fetch_manifest(bucket, key)
+    if manifest is None:
+        return obj
+
+    generation = manifest.get('generation')
+    chunks = await _gather(_loop(bucket), concurrency,
+                           [_fetch_chunk(bucket, key, index, generation)
+                            for index in range(manifest['chunks'])])
+    value = b''.join(chunks)
+    if len(value) != manifest['size']:
+        raise RiakError('Chunked value {!r} has {} bytes, {} expected'.
+                        format(key, len(value), manifest['size']))
+
+    obj.content_type = manifest['content_type']
+    obj.content_encoding = manifest['content_encoding']
+    obj.charset = manifest['charset']
+    obj.usermeta = {}
+    obj.encoded_data = value
+    return obj
+
+
+async def stream(bucket, key, prefetch=DEFAULT_CONCURRENCY):
+    '''
+    Streams the encoded chunks of a value stored with :func:`store`.
+    See :meth:`Bucket.stream_chunked
+    <aioriak.bucket.Bucket.stream_chunked>`.
+    '''
+    obj, manifest = await _fetch_manifest(bucket, key)
+    if manifest is None:
+        if not obj.exists:
+            raise RiakError('Chunked value {!r} not found'.format(key))
+        value = obj.encoded_data
+        manifest = {'chunks': 0,
+                    'size': len(value),
+                    'content_type': obj.content_type,
+                    'content_encoding': obj.content_encoding,
+                    'charset': obj.charset}
+        return ChunkStream(bucket, key, manifest, prefetch, first=value)
+    return ChunkStream(bucket, key, manifest, prefetch)
+
+
+async def delete(bucket, key, concurrency=DEFAULT_CONCURRENCY):
+    '''
+    Deletes a value stored with :func:`store` together with its chunks.
+    See :meth:`Bucket.delete_chunked
+    <aioriak.bucket.Bucket.delete_chunked>`.
+    '''
+    obj, manifest = await _fetch_manifest(bucket, key)
+    if manifest is not None:
+        await _delete_chunks(bucket, key, manifest, concurrency)
+    await obj.delete()
+    return obj
+
+
+class ChunkStream:
+    '''
+    Async iterator over the encoded chunks of a chunked value, in order.
+    Up to ``prefetch`` chunks are fetched ahead of the consumer.
+
+    Chunks are yielded as stored, so they are compressed if
+    :attr:`content_encoding` is set.
+    '''
+    def __init__(self, bucket, key, manifest, prefetch=DEFAULT_CONCURRENCY,
+                 first=None):
+        self._bucket = bucket
+        self._key = key
+        self._chunks = manifest['chunks']
+        self._generation = manifest.get('generation')
+        self._prefetch = max(1, prefetch)
+        self._next = 0
+        self._pending = []
+        self._first = first
+        #: Total size of the encoded value, in bytes
+        self.size = manifest['size']
+        #: Content type of the value
+        self.content_type = manifest['content_type']
+        #: Content encoding (compression) of the value
+        self.content_encoding = manifest['content_encoding']
+        #: Character set of the value
+        self.charset = manifest['charset']
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._first is not None:
+            first, self._first = self._first, None
+            return first
+        loop = _loop(self._bucket)
+        while (self._next < self._chunks and
+               len(self._pending) < self._prefetch):
+            self._pending.append(asyncio.ensure_future(
+                _fetch_chunk(self._bucket, self._key, self._next,
+                             self._generation),
+                loop=loop))
+            self._next += 1
+        if not self._pending:
+            raise StopAsyncIteration
+        try:
+            return await self._pending.pop(0)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        '''
+        Stops prefetching. Requests already sent are left to complete so
+        the connection stays in sync, their results are discarded.
+        '''
+        for future in self._pending:
+            future.add_done_callback(discard_result)
+        self._pending = []
+        self._next = self._chunks
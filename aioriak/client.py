@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import json
 import random
@@ -5,8 +6,17 @@ from weakref import WeakValueDictionary
 from .transport import create_transport
 from .bucket import BucketType, Bucket
 from aioriak.resolver import default_resolver
-from riak.util import bytes_to_str, str_to_bytes
+from aioriak.codecs import default_codecs, get_json_codec
+from aioriak import compression
+# Kept importable from this module for backwards compatibility
+from aioriak.codecs import (binary_encoder_decoder,  # noqa
+                            json_encoder as binary_json_encoder,
+                            json_decoder as binary_json_decoder)
+from riak.util import bytes_to_str
 from aioriak.datatypes import TYPES
+from aioriak.search import SearchPages, DEFAULT_ROWS, DEFAULT_PREFETCH
+from aioriak import ts
+from aioriak.vclocks import VClockCache
 
 
 logger = logging.getLogger('aioriak.client')
@@ -24,39 +34,14 @@ def default_encoder(obj):
         return json.dumps(obj, ensure_ascii=False).encode("utf-8")
 
 
-def binary_json_encoder(obj):
-    '''
-    Default encoder for JSON datatypes, which returns UTF-8 encoded
-    json instead of the default bloated backslash u XXXX escaped ASCII strings.
-    '''
-    if isinstance(obj, bytes):
-        return json.dumps(bytes_to_str(obj),
-                          ensure_ascii=False).encode("utf-8")
-    else:
-        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
-
-
-def binary_json_decoder(obj):
-    '''
-    Default decoder from JSON datatypes.
-    '''
-    return json.loads(bytes_to_str(obj))
-
-
-def binary_encoder_decoder(obj):
-    '''
-    Assumes value is already in binary format, so passes unchanged.
-    '''
-    return obj
-
-
 class RiakClient:
     '''
     The ``RiakClient`` object holds information necessary to connect
     to Riak. Requests can be made to Riak directly through the client
     or by using the methods on related objects.
     '''
-    def __init__(self, host='localhost', port=8087, loop=None):
+    def __init__(self, host='localhost', port=8087, loop=None, props_ttl=0,
+                 ts_ttb=False, vclock_cache_size=0, sibling_stats=None):
         if isinstance(host, (list, tuple, set)):
             self._host = random.choice(host)
         else:
@@ -66,15 +51,20 @@ class RiakClient:
         self._bucket_types = WeakValueDictionary()
         self._buckets = WeakValueDictionary()
         self._resolver = None
-        self._decoders = {'application/json': binary_json_decoder,
-                          'text/json': binary_json_decoder,
-                          'text/plain': bytes_to_str,
-                          'binary/octet-stream': binary_encoder_decoder}
-        self._encoders = {'application/json': binary_json_encoder,
-                          'text/json': binary_json_encoder,
-                          'text/plain': str_to_bytes,
-                          'binary/octet-stream': binary_encoder_decoder}
+        self._encoders, self._decoders = default_codecs()
+        self._compression = None
+        self._offload = None
+        self._transport = None
         self._closed = False
+        self._props_ttl = props_ttl
+        self._ts_ttb = ts_ttb
+        if vclock_cache_size:
+            self._vclocks = VClockCache(vclock_cache_size)
+        else:
+            self._vclocks = None
+        self._sibling_stats = sibling_stats
+        # Buckets and bucket types warmed up at creation, kept alive
+        self._warm = []
 
     def __del__(self):
         self.close()
@@ -123,6 +113,75 @@ class RiakClient:
         '''
         self._decoders[content_type] = decoder
 
+    def set_json_codec(self, name):
+        '''
+        Use the named JSON backend for the ``application/json`` and
+        ``text/json`` content types.
+
+        :param name: one of ``'orjson'``, ``'ujson'`` or ``'json'``
+        :type name: str
+        '''
+        encoder, decoder = get_json_codec(name)
+        for content_type in ('application/json', 'text/json'):
+            self.set_encoder(content_type, encoder)
+            self.set_decoder(content_type, decoder)
+
+    def get_compression(self):
+        '''
+        Get the default compression policy for stored values.
+
+        :rtype: tuple of algorithm and threshold, or None
+        '''
+        return self._compression
+
+    def set_compression(self, algorithm,
+                        threshold=compression.DEFAULT_THRESHOLD):
+        '''
+        Compress stored values whose encoded size is at least
+        ``threshold`` bytes, unless a bucket or bucket type sets its own
+        policy. The algorithm is recorded in the ``content_encoding`` of
+        the value, which is decompressed transparently on read.
+
+        :param algorithm: one of ``'gzip'``, ``'deflate'``, ``'zstd'``
+            or ``'lz4'``, or None to disable compression
+        :type algorithm: str, None
+        :param threshold: the minimal encoded size to compress, in bytes
+        :type threshold: int
+        '''
+        if algorithm is None:
+            self._compression = None
+        else:
+            compression.validate_algorithm(algorithm)
+            self._compression = (algorithm, threshold)
+
+    def get_offload(self):
+        '''
+        Get the default offload policy for encoding and decoding values.
+
+        :rtype: tuple of threshold and executor, or None
+        '''
+        return self._offload
+
+    def set_offload(self, threshold, executor=None):
+        '''
+        Encode and decode values of at least ``threshold`` bytes in an
+        executor instead of the event loop thread, unless a bucket or
+        bucket type sets its own policy. This applies to
+        :meth:`RiakObject.load_data
+        <aioriak.riak_object.RiakObject.load_data>` and to stores.
+
+        :param threshold: the minimal encoded size to offload, in bytes,
+            or None to disable offloading
+        :type threshold: int, None
+        :param executor: the executor to use, the loop's default
+            executor if None
+        :type executor: :class:`concurrent.futures.Executor`
+        '''
+        if threshold is None:
+            self._offload = None
+        else:
+            self._offload = (threshold, executor)
+
     def _get_resolver(self):
         return self._resolver or default_resolver
 
@@ -140,14 +199,53 @@ class RiakClient:
     def close(self):
         if not self._closed:
             self._closed = True
-            self._transport.close()
+            if self._transport is not None:
+                self._transport.close()
 
     async def _create_transport(self):
         self._transport = await create_transport(
-            self._host, self._port, self._loop)
+            self._host, self._port, self._loop,
+            sibling_stats=self._sibling_stats)
+
+    async def warm_up(self, buckets):
+        '''
+        Fetches the properties of buckets and of their bucket types
+        concurrently, so that first accesses do not wait for them. The
+        warmed up objects are kept for the lifetime of the client.
+
+        Bucket properties are only kept with a non-zero ``props_ttl``,
+        so warming up buckets without one raises a :class:`ValueError`.
+        The datatypes of bucket types are always kept.
+
+        :param buckets: bucket names in the default bucket type,
+            ``(bucket_type, bucket)`` pairs, or ``(bucket_type, None)``
+            for a bucket type alone
+        :type buckets: list
+        '''
+        targets = []
+        for spec in buckets:
+            if isinstance(spec, str):
+                spec = ('default', spec)
+            btype, name = spec
+            if name is not None and self._props_ttl == 0:
+                raise ValueError('Bucket properties are not cached with '
+                                 'props_ttl=0, nothing to warm up for '
+                                 'bucket {!r}'.format(name))
+            btype = self.bucket_type(btype)
+            if not btype.is_default() and btype not in targets:
+                targets.append(btype)
+            if name is not None:
+                targets.append(self.bucket(name, btype))
+        self._warm.extend(targets)
+        await asyncio.gather(
+            *[target.get_datatype() if isinstance(target, BucketType)
+              else target.get_properties() for target in targets],
+            loop=self._loop)
 
     @classmethod
-    async def create(cls, host='localhost', port=8087, loop=None):
+    async def create(cls, host='localhost', port=8087, loop=None,
+                     props_ttl=0, warm_buckets=None, ts_ttb=False,
+                     vclock_cache_size=0, sibling_stats=None):
         '''
         Return initialized instance of RiakClient since
         RiakClient.__init__() can't be async.
@@ -168,13 +266,41 @@ class RiakClient:
         :param port: Port of riak instance
         :type port: int
         :param loop: asyncio event loop
+        :param props_ttl: how long bucket and bucket-type properties are
+            cached, in seconds; 0 disables caching and None caches them
+            until invalidated. The datatype of a bucket type is always
+            cached.
+        :type props_ttl: float, None
+        :param warm_buckets: buckets whose properties are fetched
+            upfront, which needs a non-zero ``props_ttl``, see
+            :meth:`warm_up`
+        :type warm_buckets: list, None
+        :param ts_ttb: whether to encode Riak TS requests and responses
+            as Erlang term-to-binary instead of protocol buffers, which
+            requires Riak TS 1.5 or later
+        :type ts_ttb: bool
+        :param vclock_cache_size: the number of keys whose last seen
+            vector clock is kept and given to the objects created with
+            :meth:`Bucket.new <aioriak.bucket.Bucket.new>`, so that they
+            can be stored without fetching them first; 0 disables the
+            cache. See :mod:`aioriak.vclocks`.
+        :type vclock_cache_size: int
+        :param sibling_stats: records the sibling counts and sizes of the
+            objects read, and warns about or refuses objects with too
+            many siblings. See :mod:`aioriak.siblings`.
+        :type sibling_stats: :class:`~aioriak.siblings.SiblingStats`
         :rtype: :class:`~aioriak.client.RiakClient`
         '''
-        client = cls(host, port, loop)
+        client = cls(host, port, loop, props_ttl, ts_ttb, vclock_cache_size,
+                     sibling_stats)
         await client._create_transport()
+        if warm_buckets:
+            await client.warm_up(warm_buckets)
         return client
 
-    async def fetch_datatype(self, bucket, key):
+    async def fetch_datatype(self, bucket, key, r=None, pr=None,
+                             basic_quorum=None, notfound_ok=None,
+                             timeout=None, include_context=None):
         '''
         Fetches the value of a Riak Datatype.
 
@@ -183,16 +309,70 @@ class RiakClient:
         :type bucket: :class:`~aioriak.bucket.Bucket`
         :param key: the key of the datatype
         :type key: string
+        :param r: the read quorum
+        :type r: integer, string, None
+        :param pr: the primary read quorum
+        :type pr: integer, string, None
+        :param basic_quorum: whether to use the "basic quorum" policy
+            for not-founds
+        :type basic_quorum: bool, None
+        :param notfound_ok: whether to treat not-found responses as
+            successful
+        :type notfound_ok: bool, None
+        :param timeout: a timeout value in milliseconds
+        :type timeout: int, None
+        :param include_context: whether to return the opaque context; a
+            datatype fetched without it cannot stage removals. Skipping it
+            saves transferring a context that can be larger than the value
+            for read-only uses.
+        :type include_context: bool, None
         :rtype: :class:`~aioriak.datatypes.Datatype`
         '''
-        dtype, value, context = await self._fetch_datatype(bucket, key)
+        dtype, value, context = await self._fetch_datatype(
+            bucket, key, r=r, pr=pr, basic_quorum=basic_quorum,
+            notfound_ok=notfound_ok, timeout=timeout,
+            include_context=include_context)
 
         return TYPES[dtype](bucket=bucket, key=key, value=value,
                             context=context)
 
-    async def _fetch_datatype(self, bucket, key):
+    async def fetch_datatypes(self, bucket, keys, concurrency=10,
+                              include_context=True, **params):
         '''
-        _fetch_datatype(bucket, key)
+        Fetches the values of several Riak Datatypes of a bucket. Up to
+        ``concurrency`` requests are pipelined on the connection, without
+        waiting for the previous responses.
+
+        Example::
+
+            counters = await client.fetch_datatypes(
+                bucket, ['a', 'b', 'c'], include_context=False)
+
+        :param bucket: the bucket of the datatypes, which must belong to a
+            :class:`~aioriak.bucket.BucketType`
+        :type bucket: :class:`~aioriak.bucket.Bucket`
+        :param keys: the keys of the datatypes
+        :type keys: list
+        :param concurrency: the maximal number of requests in flight
+        :type concurrency: int
+        :param include_context: whether to fetch the contexts; datatypes
+            fetched without one are read-only for removals
+        :type include_context: bool
+        :param params: other options, see :meth:`fetch_datatype`
+        :rtype: list of :class:`~aioriak.datatypes.Datatype`, in the order
+            of the keys
+        '''
+        keys = list(keys)
+        results = await self._transport.fetch_datatypes(
+            bucket, keys, concurrency, include_context=include_context,
+            **params)
+        return [TYPES[dtype](bucket=bucket, key=key, value=value,
+                             context=context)
+                for key, (dtype, value, context) in zip(keys, results)]
+
+    async def _fetch_datatype(self, bucket, key, **params):
+        '''
+        _fetch_datatype(bucket, key, **params)
 
         Fetches the value of a Riak Datatype as raw data. This is used
         internally to update already reified Datatype objects. Use the
@@ -203,9 +383,10 @@ class RiakClient:
         :type bucket: RiakBucket
         :param key: the key of the datatype
         :type key: string, None
+        :param params: fetch options, see :meth:`fetch_datatype`
         :rtype: tuple of type, value and context
         '''
-        return await self._transport.fetch_datatype(bucket, key)
+        return await self._transport.fetch_datatype(bucket, key, **params)
 
     async def ping(self):
         '''
@@ -326,7 +507,11 @@ class RiakClient:
         :param props: the properties to set
         :type props: dict
         '''
-        return await self._transport.set_bucket_type_props(bucket_type, props)
+        try:
+            return await self._transport.set_bucket_type_props(bucket_type,
+                                                               props)
+        finally:
+            bucket_type.invalidate()
 
     async def get_bucket_props(self, bucket):
         '''
@@ -347,7 +532,10 @@ class RiakClient:
         :param props: the properties to set
         :type props: dict
         '''
-        return await self._transport.set_bucket_props(bucket, props)
+        try:
+            return await self._transport.set_bucket_props(bucket, props)
+        finally:
+            bucket.invalidate()
 
     async def get_keys(self, bucket):
         '''
@@ -362,21 +550,31 @@ class RiakClient:
         '''
         return await self._transport.get_keys(bucket)
 
-    async def get(self, robj):
+    async def get(self, robj, if_modified=None, head_only=False):
         '''
         Fetches the contents of a Riak object.
 
         :param robj: the object to fetch
         :type robj: RiakObject
+        :param if_modified: only fetch the object if its vector clock
+            differs from this one, see :meth:`RiakObject.reload
+            <aioriak.riak_object.RiakObject.reload>`
+        :type if_modified: :class:`~riak.riak_object.VClock` or bytes
+        :param head_only: whether to fetch metadata only
+        :type head_only: bool
         '''
         if not isinstance(robj.key, str):
             raise TypeError(
                 'key must be a string, instead got {0}'.format(repr(robj.key)))
 
-        return await self._transport.get(robj)
+        await self._transport.get(robj, if_modified=if_modified,
+                                  head_only=head_only)
+        if self._vclocks is not None:
+            self._vclocks.set(robj.bucket, robj.key, robj.vclock)
+        return robj
 
     async def put(self, robj, w=None, dw=None, pw=None, return_body=None,
-                  if_none_match=None, timeout=None):
+                  if_none_match=None, timeout=None, return_head=False):
         '''
         Stores an object in the Riak cluster.
 
@@ -396,11 +594,22 @@ class RiakClient:
         :type if_none_match: boolean
         :param timeout: a timeout value in milliseconds
         :type timeout: int
-        '''
-        return await self._transport.put(robj, w=w, dw=dw, pw=pw,
-                                         return_body=return_body,
-                                         if_none_match=if_none_match,
-                                         timeout=timeout)
+        :param return_head: whether to return the metadata of the
+          object after the write, without its value. Ignored when
+          ``return_body`` is set.
+        :type return_head: boolean
+        '''
+        vclock = robj.vclock
+        await self._transport.put(robj, w=w, dw=dw, pw=pw,
+                                  return_body=return_body,
+                                  if_none_match=if_none_match,
+                                  timeout=timeout, return_head=return_head)
+        if self._vclocks is not None and robj.key:
+            # Without a returned vclock, the one sent is outdated
+            self._vclocks.set(robj.bucket, robj.key,
+                              robj.vclock if robj.vclock is not vclock
+                              else None)
+        return robj
 
     async def delete(self, robj):
         '''
@@ -409,8 +618,25 @@ class RiakClient:
         :param robj: the object to delete
         :type robj: RiakObject
         '''
+        if self._vclocks is not None:
+            self._vclocks.discard(robj.bucket, robj.key)
         return await self._transport.delete(robj)
 
+    async def _get_raw(self, bucket, keys, concurrency=1):
+        '''
+        Fetches several objects as RpbGetResp messages, without decoding
+        them, pipelining up to ``concurrency`` requests. This is used by
+        :mod:`aioriak.backup`.
+        '''
+        return await self._transport.get_raw(bucket, keys, concurrency)
+
+    async def _put_raw(self, bucket, requests, concurrency=1):
+        '''
+        Stores RpbPutReq messages in a bucket, pipelining up to
+        ``concurrency`` requests. This is used by :mod:`aioriak.backup`.
+        '''
+        await self._transport.put_raw(bucket, requests, concurrency)
+
     async def update_datatype(self, datatype, **params):
         '''
         Sends an update to a Riak Datatype to the server.
@@ -451,7 +677,7 @@ class RiakClient:
         return await self._transport.get_index(bucket, index, startkey, *args,
                                                **kwargs)
 
-    async def mapred(self, inputs, query, timeout=None):
+    async def mapred(self, inputs, query, timeout=None, by_phase=False):
         """
         Executes a MapReduce query.
 
@@ -470,14 +696,20 @@ class RiakClient:
         :type query: list[dict]
         :param timeout: the query timeout
         :type timeout: int | None
+        :param by_phase: whether to return a dict of the results of each
+            phase by phase number instead of the merged results
+        :type by_phase: bool
         :rtype: mixed
         """
-        return await self._transport.mapred(inputs, query, timeout)
+        return await self._transport.mapred(inputs, query, timeout, by_phase)
 
-    async def stream_mapred(self, inputs, query, timeout=None):
+    async def stream_mapred(self, inputs, query, timeout=None, batch=False):
         """
         Streams a MapReduce query as (phase, data) pairs.
-        Returns async iterator.
+        Returns async iterator. Results are read from the connection as
+        the iterator is consumed, and the connection is busy until the
+        stream is exhausted or closed: leave it early within
+        ``async with stream`` or with ``await stream.aclose()``.
 
         Example::
                 client = await RiakClient.create()
@@ -497,7 +729,260 @@ class RiakClient:
         :type query: list[dict]
         :param timeout: the query timeout
         :type timeout: integer, None
+        :param batch: whether to yield (phase, results) pairs with all the
+            results of a response frame, instead of one pair per result
+        :type batch: bool
         :rtype: iterator
         """
 
-        return await self._transport.stream_mapred(inputs, query, timeout)
+        return await self._transport.stream_mapred(inputs, query, timeout,
+                                                   batch)
+
+    async def fulltext_search(self, index, query, rows=None, start=None,
+                              sort=None, fl=None, filter=None, df=None,
+                              op=None, presort=None):
+        '''
+        Performs a full-text search query on a Riak Search (Yokozuna)
+        index.
+
+        Example::
+
+            result = await client.fulltext_search('famous', 'name_s:Lion*',
+                                                  rows=10, fl=['_yz_rk'])
+            for doc in result['docs']:
+                print(doc['_yz_rk'])
+
+        :param index: the index to search
+        :type index: str
+        :param query: the search query
+        :type query: str
+        :param rows: the maximal number of documents to return
+        :type rows: int
+        :param start: the offset of the first document to return
+        :type start: int
+        :param sort: the sort order, e.g. ``'age_i desc'``
+        :type sort: str
+        :param fl: the fields to return
+        :type fl: str | list[str]
+        :param filter: a filter query applied to the matches
+        :type filter: str
+        :param df: the default field of the query
+        :type df: str
+        :param op: the default operator of the query, ``'and'`` or
+            ``'or'``
+        :type op: str
+        :param presort: sort by ``'key'`` or ``'score'`` before
+            paginating
+        :type presort: str
+        :rtype: dict with the ``docs`` list of matching documents, the
+            ``num_found`` number of matches and the ``max_score`` if
+            scores were returned. Fields with several values are lists.
+        '''
+        return await self._transport.search(
+            index, query, rows=rows, start=start, sort=sort, fl=fl,
+            filter=filter, df=df, op=op, presort=presort)
+
+    def paginate_search(self, index, query, rows=DEFAULT_ROWS, start=0,
+                        prefetch=DEFAULT_PREFETCH, batch=False, **params):
+        '''
+        Iterates over all the documents matching a search query, fetching
+        them page by page. While a page is consumed, the next
+        ``prefetch`` pages are requested.
+
+        Example::
+
+            pages = client.paginate_search('famous', 'age_i:[30 TO *]',
+                                           sort='age_i asc')
+            async for doc in pages:
+                print(doc)
+
+        :param index: the index to search
+        :type index: str
+        :param query: the search query
+        :type query: str
+        :param rows: the number of documents per page
+        :type rows: int
+        :param start: the offset of the first document
+        :type start: int
+        :param prefetch: the number of pages requested ahead
+        :type prefetch: int
+        :param batch: whether to yield lists with the documents of each
+            page instead of single documents
+        :type batch: bool
+        :param params: other search parameters, see
+            :meth:`fulltext_search`
+        :rtype: :class:`~aioriak.search.SearchPages`
+        '''
+        return SearchPages(self, index, query, rows=rows, start=start,
+                           prefetch=prefetch, batch=batch, **params)
+
+    async def create_search_index(self, index, schema=None, n_val=None,
+                                  timeout=None):
+        '''
+        Creates a Riak Search index.
+
+        :param index: the name of the index
+        :type index: str
+        :param schema: the schema of the index, ``_yz_default`` if unset
+        :type schema: str
+        :param n_val: the replication factor of the index
+        :type n_val: int
+        :param timeout: a timeout value in milliseconds
+        :type timeout: int
+        '''
+        return await self._transport.create_search_index(index, schema,
+                                                         n_val, timeout)
+
+    async def get_search_index(self, index):
+        '''
+        Fetches a Riak Search index.
+
+        :param index: the name of the index
+        :type index: str
+        :rtype: dict with ``name``, ``schema`` and ``n_val``
+        '''
+        return await self._transport.get_search_index(index)
+
+    async def list_search_indexes(self):
+        '''
+        Lists all Riak Search indexes.
+
+        :rtype: list of dicts, see :meth:`get_search_index`
+        '''
+        return await self._transport.list_search_indexes()
+
+    async def delete_search_index(self, index):
+        '''
+        Deletes a Riak Search index.
+
+        :param index: the name of the index
+        :type index: str
+        '''
+        return await self._transport.delete_search_index(index)
+
+    async def create_search_schema(self, schema, content):
+        '''
+        Creates or replaces a Riak Search schema.
+
+        :param schema: the name of the schema
+        :type schema: str
+        :param content: the Solr schema XML
+        :type content: str
+        '''
+        return await self._transport.create_search_schema(schema, content)
+
+    async def get_search_schema(self, schema):
+        '''
+        Fetches a Riak Search schema.
+
+        :param schema: the name of the schema
+        :type schema: str
+        :rtype: dict with ``name`` and ``content``
+        '''
+        return await self._transport.get_search_schema(schema)
+
+    async def ts_get(self, table, key, columnar=False,
+                     convert_timestamp=False):
+        '''
+        Fetches a row of a Riak TS table by its key.
+
+        :param table: the name of the table
+        :type table: str
+        :param key: the values of the key columns
+        :type key: list
+        :param columnar: whether to return columns instead of rows
+        :type columnar: bool
+        :param convert_timestamp: whether to convert timestamps to
+            :class:`datetime.datetime`, or to ``datetime64[ms]`` arrays
+            in columnar mode
+        :type convert_timestamp: bool
+        :rtype: :class:`~aioriak.ts.TsResult`
+        '''
+        return await self._transport.ts_get(
+            table, key, ttb=self._ts_ttb, columnar=columnar,
+            convert_timestamp=convert_timestamp)
+
+    async def ts_put(self, table, rows, batch_size=ts.DEFAULT_BATCH_SIZE,
+                     window=ts.DEFAULT_WINDOW):
+        '''
+        Writes rows to a Riak TS table. Rows are sent in requests of up
+        to ``batch_size`` rows, with up to ``window`` requests in flight.
+
+        Example::
+
+            await client.ts_put('GeoCheckin', [
+                ['hash1', 'user2', datetime.datetime.utcnow(), 'cloudy', 79.0],
+                ['hash1', 'user2', datetime.datetime.utcnow(), 'sunny', 80.5],
+            ])
+
+        :param table: the name of the table
+        :type table: str
+        :param rows: the rows, as lists of cell values in column order
+        :type rows: iterable
+        :param batch_size: the number of rows per request
+        :type batch_size: int
+        :param window: the number of requests in flight
+        :type window: int
+        '''
+        return await self._transport.ts_put(
+            table, rows, ttb=self._ts_ttb, batch_size=batch_size,
+            window=window)
+
+    async def ts_query(self, table, query, columnar=False,
+                       convert_timestamp=False):
+        '''
+        Runs a query on a Riak TS table. ``{table}`` in the query is
+        replaced with the table name.
+
+        Example::
+
+            result = await client.ts_query(
+                'GeoCheckin',
+                "SELECT weather, temperature FROM {table} "
+                "WHERE time > 1234560 AND time < 1234569 "
+                "AND region = 'South Atlantic' AND state = 'South Carolina'",
+                columnar=True)
+            mean = result.data['temperature'].mean()
+
+        :param table: the name of the table
+        :type table: str
+        :param query: the SQL query
+        :type query: str
+        :param columnar: whether to return columns instead of rows
+        :type columnar: bool
+        :param convert_timestamp: whether to convert timestamps to
+            :class:`datetime.datetime`, or to ``datetime64[ms]`` arrays
+            in columnar mode
+        :type convert_timestamp: bool
+        :rtype: :class:`~aioriak.ts.TsResult`
+        '''
+        return await self._transport.ts_query(
+            table, query, ttb=self._ts_ttb, columnar=columnar,
+            convert_timestamp=convert_timestamp)
+
+    async def ts_stream_keys(self, table, timeout=None, batch=False):
+        '''
+        Streams the keys of a Riak TS table as tuples of cell values.
+        Keys are read from the connection as the iterator is consumed,
+        and the connection is busy until the stream is exhausted or
+        closed: leave it early within ``async with stream`` or with
+        ``await stream.aclose()``.
+
+        .. warning:: Do not use this in production, as it requires
+           traversing through all keys stored in a cluster.
+
+        Example::
+
+            async for key in await client.ts_stream_keys('GeoCheckin'):
+                print(key)
+
+        :param table: the name of the table
+        :type table: str
+        :param timeout: a timeout value in milliseconds
+        :type timeout: int
+        :param batch: whether to yield lists with the keys of each
+            response frame instead of single keys
+        :type batch: bool
+        :rtype: async iterator
+        '''
+        return await self._transport.ts_stream_keys(table, timeout, batch)
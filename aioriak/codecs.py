@@ -0,0 +1,223 @@
+'''
+Encoders and decoders for object values.
+
+The fastest available JSON implementation is picked at import time, in
+order of preference: ``orjson``, ``ujson`` and the standard library
+``json`` module. ``application/msgpack`` is supported when the
+``msgpack`` package is installed.
+
+All decoders accept ``bytes``, ``bytearray`` or ``memoryview`` values
+directly, without an intermediate ``str`` copy where the backend allows
+it.
+
+Values the faster backends would alter, integers wider than 64 bits and
+non-finite floats, are encoded and decoded with the standard library
+instead, so every backend reads and writes the same values.
+'''
+import json
+import math
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+# Integer literals orjson may decode as floats, and strings with as many
+# digits in a row
+_LONG_DIGITS = re.compile(rb'\d{19}')
+
+
+def _has_non_finite(obj):
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(value) for value in obj)
+    return False
+
+
+def _to_str(obj):
+    if isinstance(obj, str):
+        return obj
+    return bytes(obj).decode('utf-8')
+
+
+def stdlib_json_encoder(obj):
+    '''
+    Encodes a value to UTF-8 JSON with the standard library ``json``
+    module.
+    '''
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        obj = _to_str(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def stdlib_json_decoder(obj):
+    '''
+    Decodes UTF-8 JSON with the standard library ``json`` module.
+    '''
+    return json.loads(_to_str(obj))
+
+
+def orjson_encoder(obj):
+    '''
+    Encodes a value to UTF-8 JSON with ``orjson``. Values ``orjson``
+    refuses (e.g. non-string dict keys or integers wider than 64 bits)
+    or writes as ``null`` (NaN and infinities) are encoded with the
+    standard library instead.
+    '''
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        obj = _to_str(obj)
+    try:
+        encoded = orjson.dumps(obj)
+    except TypeError:
+        return stdlib_json_encoder(obj)
+    if b'null' in encoded and _has_non_finite(obj):
+        return stdlib_json_encoder(obj)
+    return encoded
+
+
+def orjson_decoder(obj):
+    '''
+    Decodes UTF-8 JSON with ``orjson``. Documents with integers that may
+    not fit in 64 bits, which ``orjson`` decodes as floats, or with
+    values it rejects, such as ``NaN``, are decoded with the standard
+    library instead.
+    '''
+    if _LONG_DIGITS.search(obj) is not None:
+        return stdlib_json_decoder(obj)
+    try:
+        return orjson.loads(obj)
+    except ValueError:
+        return stdlib_json_decoder(obj)
+
+
+def ujson_encoder(obj):
+    '''
+    Encodes a value to UTF-8 JSON with ``ujson``. Integers
+    wider than 64 bits, which ``ujson`` refuses, are encoded with the
+    standard library instead.
+    '''
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        obj = _to_str(obj)
+    try:
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+    except OverflowError:
+        return stdlib_json_encoder(obj)
+
+
+def ujson_decoder(obj):
+    '''
+    Decodes UTF-8 JSON with ``ujson``. Documents it rejects, such as
+    those with integers wider than 64 bits or ``NaN``, are decoded with
+    the standard library instead.
+    '''
+    if isinstance(obj, memoryview):
+        obj = bytes(obj)
+    try:
+        return ujson.loads(obj)
+    except (OverflowError, ValueError):
+        return stdlib_json_decoder(obj)
+
+
+def msgpack_encoder(obj):
+    '''
+    Encodes a value with MessagePack.
+    '''
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def msgpack_decoder(obj):
+    '''
+    Decodes a MessagePack value.
+    '''
+    return msgpack.unpackb(obj, raw=False)
+
+
+def text_encoder(obj):
+    '''
+    Encodes a string to UTF-8.
+    '''
+    if isinstance(obj, str):
+        return obj.encode('utf-8')
+    return bytes(obj)
+
+
+def text_decoder(obj):
+    '''
+    Decodes UTF-8 bytes to a string.
+    '''
+    return _to_str(obj)
+
+
+def binary_encoder_decoder(obj):
+    '''
+    Assumes value is already in binary format, so passes unchanged.
+    '''
+    return obj
+
+
+#: JSON backends by name, as ``(encoder, decoder)`` pairs. Only
+#: installed backends are listed.
+JSON_CODECS = {'json': (stdlib_json_encoder, stdlib_json_decoder)}
+if ujson is not None:
+    JSON_CODECS['ujson'] = (ujson_encoder, ujson_decoder)
+if orjson is not None:
+    JSON_CODECS['orjson'] = (orjson_encoder, orjson_decoder)
+
+
+def get_json_codec(name=None):
+    '''
+    Returns the ``(encoder, decoder)`` pair of the named JSON backend,
+    or of the fastest installed one when no name is given.
+
+    :param name: one of ``'orjson'``, ``'ujson'`` or ``'json'``
+    :type name: str, None
+    :rtype: tuple
+    '''
+    if name is None:
+        for name in ('orjson', 'ujson', 'json'):
+            if name in JSON_CODECS:
+                break
+    try:
+        return JSON_CODECS[name]
+    except KeyError:
+        raise ValueError('JSON backend {!r} is not available'.format(name))
+
+
+json_encoder, json_decoder = get_json_codec()
+
+
+def default_codecs():
+    '''
+    Returns the default encoders and decoders by content type, as a
+    pair of dicts suitable for a client.
+
+    :rtype: tuple of dict
+    '''
+    encoders = {'application/json': json_encoder,
+                'text/json': json_encoder,
+                'text/plain': text_encoder,
+                'binary/octet-stream': binary_encoder_decoder}
+    decoders = {'application/json': json_decoder,
+                'text/json': json_decoder,
+                'text/plain': text_decoder,
+                'binary/octet-stream': binary_encoder_decoder}
+    if msgpack is not None:
+        for content_type in ('application/msgpack', 'application/x-msgpack'):
+            encoders[content_type] = msgpack_encoder
+            decoders[content_type] = msgpack_decoder
+    return encoders, decoders
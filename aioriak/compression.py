@@ -0,0 +1,79 @@
+'''
+Value compression driven by the ``content_encoding`` of a sibling.
+
+``gzip`` and ``deflate`` are always available. ``zstd`` and ``lz4`` are
+registered when the ``zstandard`` and ``lz4`` packages are installed.
+'''
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+
+#: Values smaller than this many bytes are stored uncompressed unless
+#: another threshold is given.
+DEFAULT_THRESHOLD = 1024
+
+#: Compression functions by content encoding, as ``(compress,
+#: decompress)`` pairs. Only installed algorithms are listed.
+COMPRESSORS = {
+    'gzip': (gzip.compress, gzip.decompress),
+    'deflate': (zlib.compress, zlib.decompress),
+}
+if zstandard is not None:
+    COMPRESSORS['zstd'] = (
+        lambda data: zstandard.ZstdCompressor().compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(
+            data, max_output_size=2 ** 31 - 1))
+if lz4 is not None:
+    COMPRESSORS['lz4'] = (lz4.frame.compress, lz4.frame.decompress)
+
+
+def validate_algorithm(algorithm):
+    '''
+    Raises an exception if the given compression algorithm is not
+    available.
+    '''
+    if algorithm not in COMPRESSORS:
+        raise ValueError('Compression algorithm {!r} is not available'.
+                         format(algorithm))
+
+
+def compress(content_encoding, data):
+    '''
+    Compresses data according to the content encoding. Data with an
+    unknown or empty content encoding is returned unchanged.
+
+    :param content_encoding: the content encoding of the sibling
+    :type content_encoding: str, None
+    :param data: the encoded value
+    :type data: bytes
+    :rtype: bytes
+    '''
+    if content_encoding in COMPRESSORS:
+        return COMPRESSORS[content_encoding][0](data)
+    return data
+
+
+def decompress(content_encoding, data):
+    '''
+    Decompresses data according to the content encoding. Data with an
+    unknown or empty content encoding is returned unchanged.
+
+    :param content_encoding: the content encoding of the sibling
+    :type content_encoding: str, None
+    :param data: the value as stored in Riak
+    :type data: bytes
+    :rtype: bytes
+    '''
+    if content_encoding in COMPRESSORS:
+        return COMPRESSORS[content_encoding][1](data)
+    return data
@@ -11,7 +11,20 @@ KIND, either express or implied.  See the License for the
 specific language governing permissions and limitations
 under the License.
 '''
+import asyncio
+import functools
 from aioriak.error import RiakError
+from aioriak import compression
+
+
+def _encode(encoder, value):
+    if encoder is None:
+        return value.encode()
+    return encoder(value)
+
+
+def _decode(decoder, content_encoding, value):
+    return decoder(compression.decompress(content_encoding, value))
 
 
 class RiakContent(object):
@@ -19,7 +32,15 @@ class RiakContent(object):
     The RiakContent holds the metadata and value of a single sibling
     within a RiakObject. RiakObjects that have more than one sibling
     are considered to be in conflict.
+
+    Metadata containers (``usermeta``, ``links`` and ``indexes``) are not
+    allocated until they are first accessed or assigned, so siblings
+    without metadata stay small.
     '''
+    __slots__ = ('_robject', '_data', '_encoded_data', 'charset',
+                 'content_type', 'content_encoding', 'last_modified', 'etag',
+                 '_usermeta', '_links', '_indexes', 'exists', '_size_hint')
+
     def __init__(self, robject, data=None, encoded_data=None, charset=None,
                  content_type='application/json', content_encoding=None,
                  last_modified=None, etag=None, usermeta=None, links=None,
@@ -32,10 +53,49 @@ class RiakContent(object):
         self.content_encoding = content_encoding
         self.last_modified = last_modified
         self.etag = etag
-        self.usermeta = usermeta or {}
-        self.links = links or []
-        self.indexes = indexes or set()
+        self._usermeta = usermeta
+        self._links = links
+        self._indexes = indexes
         self.exists = exists
+        self._size_hint = None
+
+    def _get_usermeta(self):
+        if self._usermeta is None:
+            self._usermeta = {}
+        return self._usermeta
+
+    def _set_usermeta(self, value):
+        self._usermeta = value
+
+    usermeta = property(_get_usermeta, _set_usermeta, doc='''
+        Arbitrary user-defined metadata dict, mapping strings to strings.
+        :type dict''')
+
+    def _get_links(self):
+        if self._links is None:
+            self._links = []
+        return self._links
+
+    def _set_links(self, value):
+        self._links = value
+
+    links = property(_get_links, _set_links, doc='''
+        A list of bucket/key/tag 3-tuples representing links to other
+        keys.
+        :type list''')
+
+    def _get_indexes(self):
+        if self._indexes is None:
+            self._indexes = set()
+        return self._indexes
+
+    def _set_indexes(self, value):
+        self._indexes = value
+
+    indexes = property(_get_indexes, _set_indexes, doc='''
+        The set of secondary index entries, consisting of
+        index-name/value tuples.
+        :type set''')
 
     def _get_data(self):
         if self._encoded_data is not None and self._data is None:
@@ -46,6 +106,7 @@ class RiakContent(object):
     def _set_data(self, value):
         self._encoded_data = None
         self._data = value
+        self._size_hint = None
 
     data = property(_get_data, _set_data, doc='''
         The data stored in this object, as Python objects. For the raw
@@ -64,6 +125,7 @@ class RiakContent(object):
     def _set_encoded_data(self, value):
         self._data = None
         self._encoded_data = value
+        self._size_hint = None
 
     encoded_data = property(_get_encoded_data, _set_encoded_data, doc='''
         The raw data stored in this object, essentially the encoded
@@ -75,23 +137,104 @@ class RiakContent(object):
         :type str''')
 
     def _serialize(self, value):
+        return self._compress(_encode(self._get_encoder(value), value))
+
+    def _deserialize(self, value):
+        self._size_hint = len(value)
+        return _decode(self._get_decoder(), self.content_encoding, value)
+
+    def _get_encoder(self, value):
         encoder = self._robject.bucket.get_encoder(self.content_type)
-        if encoder:
-            return encoder(value)
-        elif isinstance(value, str):
-            return value.encode()
-        else:
+        if encoder is None and not isinstance(value, str):
             raise TypeError('No encoder for non-string data '
                             'with content type "{0}"'.
                             format(self.content_type))
+        return encoder
 
-    def _deserialize(self, value):
+    def _get_decoder(self):
         decoder = self._robject.bucket.get_decoder(self.content_type)
-        if decoder:
-            return decoder(value)
-        else:
+        if decoder is None:
             raise TypeError('No decoder for content type "{0}"'.
                             format(self.content_type))
+        return decoder
+
+    def _compress(self, encoded):
+        self._apply_compression_policy(len(encoded))
+        return compression.compress(self.content_encoding, encoded)
+
+    def _apply_compression_policy(self, size):
+        '''
+        Updates :attr:`content_encoding` for a freshly encoded value of
+        the given size, following the bucket's compression policy.
+        '''
+        self._size_hint = size
+        policy = self._robject.bucket.get_compression()
+        if policy is not None:
+            algorithm, threshold = policy
+            if size >= threshold:
+                self.content_encoding = algorithm
+            elif self.content_encoding in compression.COMPRESSORS:
+                self.content_encoding = None
+
+    def _get_offload_executor(self, size):
+        '''
+        Returns a callable running a function in the bucket's offload
+        executor if a value of the given size should be processed there,
+        None otherwise. Values of unknown size are not offloaded.
+        '''
+        policy = self._robject.bucket.get_offload()
+        if policy is None or size is None or size < policy[0]:
+            return None
+        loop = self._robject.client._loop or asyncio.get_event_loop()
+        return functools.partial(loop.run_in_executor, policy[1])
+
+    async def load_data(self):
+        '''
+        Awaitable counterpart of the :attr:`data` property. Values whose
+        encoded size reaches the offload threshold of the bucket are
+        decompressed and decoded in the offload executor instead of the
+        event loop thread.
+
+        :rtype: mixed
+        '''
+        if self._encoded_data is not None and self._data is None:
+            value = self._encoded_data
+            run = self._get_offload_executor(len(value))
+            if run is not None:
+                self._size_hint = len(value)
+                self._data = await run(_decode, self._get_decoder(),
+                                       self.content_encoding, value)
+                self._encoded_data = None
+        return self.data
+
+    async def dump_data(self):
+        '''
+        Awaitable counterpart of the :attr:`encoded_data` property.
+        Values are encoded and compressed in the offload executor of the
+        bucket when their last known encoded size, or their length for
+        strings and bytes, reaches the offload threshold. The size is
+        known for values decoded or encoded since they were last
+        assigned, so other values, such as those of new objects, are
+        encoded in the event loop thread.
+
+        :rtype: bytes
+        '''
+        if self._data is not None and self._encoded_data is None:
+            value = self._data
+            if isinstance(value, (str, bytes)):
+                size = len(value)
+            else:
+                size = self._size_hint
+            run = self._get_offload_executor(size)
+            if run is not None:
+                encoded = await run(_encode, self._get_encoder(value), value)
+                self._apply_compression_policy(len(encoded))
+                if self.content_encoding in compression.COMPRESSORS:
+                    encoded = await run(compression.compress,
+                                        self.content_encoding, encoded)
+                self._encoded_data = encoded
+                self._data = None
+        return self.encoded_data
 
     def add_index(self, field, value):
         '''
@@ -109,7 +252,9 @@ class RiakContent(object):
             raise RiakError("Riak 2i fields must end with either '_bin'"
                             " or '_int'.")
 
-        self.indexes.add((field, value))
+        if self._indexes is None:
+            self._indexes = set()
+        self._indexes.add((field, value))
 
         return self._robject
 
@@ -125,13 +270,17 @@ class RiakContent(object):
         :type value: string or integer
         :rtype: :class:`RiakObject <riak.riak_object.RiakObject>`
         '''
+        indexes = self._indexes
         if not field and not value:
-            self.indexes.clear()
+            if indexes is not None:
+                indexes.clear()
         elif field and not value:
-            for index in [x for x in self.indexes if x[0] == field]:
-                self.indexes.remove(index)
+            for index in [x for x in indexes or () if x[0] == field]:
+                indexes.remove(index)
         elif field and value:
-            self.indexes.remove((field, value))
+            if indexes is None:
+                raise KeyError((field, value))
+            indexes.remove((field, value))
         else:
             raise RiakError("Cannot pass value without a field"
                             " name while removing index")
@@ -152,8 +301,9 @@ class RiakContent(object):
         :type value: string or integer
         :rtype: :class:`RiakObject <riak.riak_object.RiakObject>`
         '''
-        to_rem = set((x for x in self.indexes if x[0] == field))
-        self.indexes.difference_update(to_rem)
+        if self._indexes is not None:
+            self._indexes.difference_update(
+                [x for x in self._indexes if x[0] == field])
         return self.add_index(field, value)
 
     def add_link(self, obj, tag=None):
@@ -173,5 +323,7 @@ class RiakContent(object):
         else:
             newlink = (obj.bucket.name, obj.key, tag)
 
-        self.links.append(newlink)
+        if self._links is None:
+            self._links = []
+        self._links.append(newlink)
         return self._robject
@@ -1,10 +1,14 @@
 from .types import TYPES
 from .datatype import Datatype
-from .counter import Counter
+from .counter import Counter, ShardedCounter
 from .map import Map
 from .register import Register
 from .flag import Flag
 from .set import Set
+from .gset import GSet
+from .hll import Hll
+from .buffer import CounterBuffer, DatatypeBuffer
 
 
-__all__ = ['Datatype', 'Map', 'TYPES', 'Counter', 'Register', 'Flag', 'Set']
+__all__ = ['Datatype', 'Map', 'TYPES', 'Counter', 'Register', 'Flag', 'Set',
+           'GSet', 'Hll', 'CounterBuffer', 'DatatypeBuffer', 'ShardedCounter']
@@ -0,0 +1,387 @@
+'''
+Write-behind buffers that coalesce datatype mutations in memory and send
+them to Riak in batches, one update per key.
+'''
+import asyncio
+import logging
+from . import TYPES
+from .counter import Counter
+
+
+logger = logging.getLogger('aioriak.datatypes')
+
+#: Default delay between the first staged operation and its flush, in
+#: seconds
+DEFAULT_INTERVAL = 0.1
+
+#: Default number of staged operations that triggers a flush
+DEFAULT_MAX_OPS = 1000
+
+#: Default bound on staged operations; staging more waits for a flush
+DEFAULT_MAX_PENDING = 100000
+
+
+class _WriteBehindBuffer:
+    '''
+    Base class for write-behind buffers. Operations staged under a key
+    are flushed ``interval`` seconds after the first one, or as soon as
+    ``max_ops`` operations are staged. Once ``max_pending`` operations
+    are staged, staging waits for the flush to complete.
+
+    Subclasses keep one staged item per key and implement :meth:`_send`
+    and :meth:`_restore`.
+    '''
+    def __init__(self, client, interval=DEFAULT_INTERVAL,
+                 max_ops=DEFAULT_MAX_OPS, max_pending=DEFAULT_MAX_PENDING,
+                 loop=None):
+        self._client = client
+        self._interval = interval
+        self._max_ops = max_ops
+        self._max_pending = max(max_ops, max_pending)
+        self._loop = loop or client._loop or asyncio.get_event_loop()
+        self._staged = {}
+        self._ops = 0
+        self._lock = asyncio.Lock(loop=self._loop)
+        self._timer = None
+        self._task = None
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __len__(self):
+        '''
+        Returns the number of keys with staged operations.
+        '''
+        return len(self._staged)
+
+    @property
+    def closed(self):
+        '''
+        Whether the buffer has been closed.
+
+        :rtype: bool
+        '''
+        return self._closed
+
+    async def flush(self):
+        '''
+        Sends all staged operations to Riak, one update per key. Keys
+        whose update failed stay staged for the next flush and the first
+        error is raised.
+        '''
+        async with self._lock:
+            self._cancel_timer()
+            staged, self._staged = self._staged, {}
+            self._ops = 0
+            if not staged:
+                return
+            keys = list(staged)
+            results = await asyncio.gather(
+                *[self._send(key, staged[key]) for key in keys],
+                loop=self._loop, return_exceptions=True)
+            errors = []
+            for key, result in zip(keys, results):
+                if isinstance(result, Exception):
+                    self._restore(key, staged[key])
+                    self._ops += 1
+                    errors.append(result)
+            if errors:
+                if not self._closed:
+                    self._arm_timer()
+                raise errors[0]
+
+    async def close(self):
+        '''
+        Flushes staged operations and stops the buffer. Staging
+        operations on a closed buffer raises :exc:`RuntimeError`.
+        '''
+        self._closed = True
+        self._cancel_timer()
+        if self._task is not None and not self._task.done():
+            await asyncio.wait([self._task], loop=self._loop)
+        await self.flush()
+
+    # Private stuff
+
+    async def _staged_op(self):
+        '''
+        Accounts for an operation staged by a subclass and schedules or
+        performs the flush it requires.
+        '''
+        self._ops += 1
+        if self._ops >= self._max_pending:
+            await self.flush()
+        elif self._ops >= self._max_ops:
+            self._flush_soon()
+        elif self._timer is None:
+            self._arm_timer()
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError('Buffer is closed')
+
+    def _arm_timer(self):
+        self._timer = self._loop.call_later(self._interval, self._flush_soon)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_soon(self):
+        self._cancel_timer()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._background_flush(),
+                                               loop=self._loop)
+
+    async def _background_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.warning('Write-behind flush of %r failed, will retry',
+                           self, exc_info=True)
+
+    async def _send(self, key, item):
+        '''
+        Sends the staged item of a key to Riak.
+        '''
+        raise NotImplementedError
+
+    def _restore(self, key, item):
+        '''
+        Stages again an item whose flush failed, before any operation
+        staged on the key since.
+        '''
+        raise NotImplementedError
+
+
+class CounterBuffer(_WriteBehindBuffer):
+    '''
+    Aggregates increments of :class:`~aioriak.datatypes.Counter` keys of
+    a bucket in memory and sends a single update per key on flush,
+    trading durability of the last ``interval`` seconds of increments
+    for far fewer requests.
+
+    Example::
+
+        counters = CounterBuffer(client.bucket_type('counters')
+                                       .bucket('hits'))
+        await counters.increment('index.html')
+        ...
+        await counters.close()
+
+    :param bucket: the bucket holding the counters
+    :type bucket: :class:`~aioriak.bucket.Bucket`
+    :param interval: the delay after which increments are flushed, in
+        seconds
+    :type interval: float
+    :param max_ops: the number of increments that triggers a flush
+    :type max_ops: int
+    :param max_pending: the number of unflushed increments beyond which
+        :meth:`increment` waits for a flush
+    :type max_pending: int
+    '''
+    def __init__(self, bucket, interval=DEFAULT_INTERVAL,
+                 max_ops=DEFAULT_MAX_OPS, max_pending=DEFAULT_MAX_PENDING,
+                 loop=None):
+        super().__init__(bucket._client, interval, max_ops, max_pending,
+                         loop)
+        self.bucket = bucket
+
+    def __repr__(self):
+        return '<CounterBuffer {!r}>'.format(self.bucket)
+
+    async def increment(self, key, amount=1):
+        '''
+        Stages an increment of the counter at the given key.
+
+        :param key: the key of the counter
+        :type key: str
+        :param amount: the amount to increment the counter
+        :type amount: int
+        '''
+        self._check_open()
+        if not isinstance(amount, int):
+            raise TypeError(Counter._type_error_msg)
+        self._staged[key] = self._staged.get(key, 0) + amount
+        await self._staged_op()
+
+    async def decrement(self, key, amount=1):
+        '''
+        Stages a decrement of the counter at the given key.
+
+        :param key: the key of the counter
+        :type key: str
+        :param amount: the amount to decrement the counter
+        :type amount: int
+        '''
+        await self.increment(key, -amount)
+
+    @property
+    def pending(self):
+        '''
+        The unflushed amounts, by key.
+
+        :rtype: dict
+        '''
+        return dict(self._staged)
+
+    async def _send(self, key, amount):
+        if amount == 0:
+            return
+        counter = Counter(self.bucket, key)
+        counter.increment(amount)
+        await self._client.update_datatype(counter, return_body=False)
+
+    def _restore(self, key, amount):
+        self._staged[key] = self._staged.get(key, 0) + amount
+
+
+def _needs_context(type_name, op):
+    '''
+    Whether a datatype operation removes something, and so must be sent
+    with a context.
+    '''
+    if type_name == 'set':
+        return 'removes' in op
+    elif type_name == 'flag':
+        return op == 'disable'
+    elif type_name == 'map':
+        for item in op:
+            if item[0] == 'remove':
+                return True
+            if _needs_context(item[1][1], item[2]):
+                return True
+    return False
+
+
+class _Pending:
+    '''
+    Mutations staged on a key of a :class:`DatatypeBuffer`, with the
+    context they were made against.
+    '''
+    __slots__ = ('datatype', 'context', 'conflict')
+
+    def __init__(self, datatype):
+        self.datatype = datatype
+        self.context = None
+        self.conflict = False
+
+    def add_context(self, context):
+        if context is None:
+            return
+        if self.context is None:
+            self.context = context
+        elif self.context != context:
+            self.conflict = True
+
+    def merge(self, other):
+        self.datatype._merge_staged(other.datatype)
+        self.add_context(other.context)
+        self.conflict = self.conflict or other.conflict
+
+
+class DatatypeBuffer(_WriteBehindBuffer):
+    '''
+    Merges the mutations staged on datatypes of any type by many callers
+    into a single operation per ``(bucket, key)`` and sends it on flush.
+
+    Example::
+
+        buffer = DatatypeBuffer(client)
+        followers = Set(client.bucket_type('sets').bucket('followers'),
+                        'seancribbs')
+        followers.add('javajolt')
+        await buffer.stage(followers)
+        ...
+        await buffer.close()
+
+    Operations that remove something are sent with a context. The
+    context the removing datatype was fetched with is used; a fresh one
+    is fetched at flush time only when it is missing or when merged
+    removals were made against different contexts. Operations that only
+    add are sent without context.
+
+    :param client: the client to send the updates with
+    :type client: :class:`~aioriak.client.RiakClient`
+    :param interval: the delay after which mutations are flushed, in
+        seconds
+    :type interval: float
+    :param max_ops: the number of staged datatypes that triggers a flush
+    :type max_ops: int
+    :param max_pending: the number of unflushed staged datatypes beyond
+        which :meth:`stage` waits for a flush
+    :type max_pending: int
+    '''
+
+    def __repr__(self):
+        return '<DatatypeBuffer {!r}>'.format(self._client)
+
+    async def stage(self, datatype):
+        '''
+        Moves the mutations staged on a datatype into the buffer, after
+        the ones already buffered for the same bucket and key. The
+        datatype is cleared.
+
+        :param datatype: the datatype with staged mutations
+        :type datatype: :class:`~aioriak.datatypes.Datatype`
+        '''
+        self._check_open()
+        if not datatype.bucket:
+            raise ValueError('bucket property not assigned')
+        if not datatype.key:
+            raise ValueError('key property not assigned')
+        if not datatype.modified:
+            return
+
+        key = (datatype.bucket, datatype.key)
+        pending = self._staged.get(key)
+        if pending is None:
+            pending = _Pending(TYPES[datatype.type_name](*key))
+            self._staged[key] = pending
+        elif pending.datatype.type_name != datatype.type_name:
+            raise TypeError('Expected datatype {} but got datatype {}'.format(
+                pending.datatype.__class__, datatype.__class__))
+
+        if _needs_context(datatype.type_name, datatype.to_op()):
+            pending.add_context(datatype._context)
+        pending.datatype._merge_staged(datatype)
+        datatype.clear()
+        await self._staged_op()
+
+    def pending(self, bucket, key):
+        '''
+        Returns the operation buffered for a bucket and key, if any.
+
+        :param bucket: the bucket of the datatype
+        :type bucket: :class:`~aioriak.bucket.Bucket`
+        :param key: the key of the datatype
+        :type key: str
+        :rtype: see the ``to_op()`` method of the datatype
+        '''
+        pending = self._staged.get((bucket, key))
+        if pending is not None:
+            return pending.datatype.to_op()
+
+    async def _send(self, key, pending):
+        datatype = pending.datatype
+        op = datatype.to_op()
+        if not op:
+            return
+        if not _needs_context(datatype.type_name, op):
+            datatype._context = None
+        elif pending.context is None or pending.conflict:
+            _, _, datatype._context = await self._client._fetch_datatype(
+                *key)
+        else:
+            datatype._context = pending.context
+        await self._client.update_datatype(datatype, return_body=False)
+
+    def _restore(self, key, pending):
+        if key in self._staged:
+            pending.merge(self._staged[key])
+        self._staged[key] = pending
@@ -1,3 +1,6 @@
+import asyncio
+import random
+import zlib
 from . import TYPES
 from .datatype import Datatype
 
@@ -23,7 +26,7 @@ class Counter(Datatype):
         '''
         Whether this counter has staged increments.
         '''
-        return self._increment is not 0
+        return self._increment != 0
 
     def to_op(self):
         '''
@@ -53,8 +56,155 @@ class Counter(Datatype):
         self._raise_if_badtype(amount)
         self._increment -= amount
 
+    def _merge_staged(self, other):
+        self._increment += other._increment
+
     def _check_type(self, new_value):
         return isinstance(new_value, int)
 
 
 TYPES['counter'] = Counter
+
+
+class ShardedCounter:
+    '''
+    A logical counter spread over ``shards`` :class:`Counter` keys, so
+    that increments of a hot counter are spread over several
+    preference lists instead of saturating one. Each increment goes to a
+    single shard; reading the value fetches all shards concurrently and
+    sums them.
+
+    Shards are picked at random, or always the same one for a given
+    ``affinity`` token (e.g. a worker or node name), which keeps each
+    writer on its own shard across processes.
+
+    Example::
+
+        views = ShardedCounter(bucket, 'index.html', shards=16,
+                               cache_ttl=1)
+        await views.increment()
+        await views.reload()
+        views.value  # => total of all shards
+
+    :param bucket: the bucket holding the shards, which must belong to a
+        bucket type of counters
+    :type bucket: :class:`~aioriak.bucket.Bucket`
+    :param key: the key of the logical counter
+    :type key: str
+    :param shards: the number of shard keys
+    :type shards: int
+    :param affinity: a token selecting the shard incremented, shards are
+        picked at random when None
+    :type affinity: object
+    :param cache_ttl: how long :meth:`reload` reuses the last total, in
+        seconds; 0 always fetches the shards
+    :type cache_ttl: float
+    '''
+    def __init__(self, bucket, key, shards=16, affinity=None, cache_ttl=0):
+        if shards < 1:
+            raise ValueError('A sharded counter needs at least one shard')
+        self.bucket = bucket
+        self.key = key
+        self.shards = shards
+        self.affinity = affinity
+        self.cache_ttl = cache_ttl
+        self._value = 0
+        self._loaded_at = None
+
+    @property
+    def value(self):
+        '''
+        The total of all shards as of the last :meth:`reload`, including
+        increments sent since through this instance.
+
+        :rtype: int
+        '''
+        return self._value
+
+    @property
+    def shard_keys(self):
+        '''
+        The keys of all shards.
+
+        :rtype: list
+        '''
+        return [self.shard_key(index) for index in range(self.shards)]
+
+    def shard_key(self, index):
+        '''
+        Returns the key of a shard.
+
+        :param index: the shard number
+        :type index: int
+        :rtype: str
+        '''
+        return '{}/shard-{}'.format(self.key, index)
+
+    async def increment(self, amount=1, shard=None):
+        '''
+        Increments one shard of the counter by one or the given amount.
+
+        :param amount: the amount to increment the counter
+        :type amount: int
+        :param shard: the shard number to increment, picked according to
+            the affinity when None
+        :type shard: int
+        '''
+        if shard is None:
+            shard = self._pick_shard()
+        counter = Counter(self.bucket, self.shard_key(shard))
+        counter.increment(amount)
+        await self.bucket._client.update_datatype(counter, return_body=False)
+        self._value += amount
+
+    async def decrement(self, amount=1, shard=None):
+        '''
+        Decrements one shard of the counter by one or the given amount.
+
+        :param amount: the amount to decrement the counter
+        :type amount: int
+        :param shard: the shard number to decrement, picked according to
+            the affinity when None
+        :type shard: int
+        '''
+        await self.increment(-amount, shard)
+
+    async def reload(self):
+        '''
+        Fetches all shards concurrently and sums them, unless the total
+        was loaded less than ``cache_ttl`` seconds ago.
+
+        :rtype: :class:`ShardedCounter`
+        '''
+        loop = self._loop()
+        if (self._loaded_at is not None and
+                loop.time() - self._loaded_at < self.cache_ttl):
+            return self
+        client = self.bucket._client
+        results = await asyncio.gather(
+            *[client._fetch_datatype(self.bucket, key, include_context=False)
+              for key in self.shard_keys], loop=loop)
+        self._value = sum(value or 0 for _, value, _ in results)
+        self._loaded_at = loop.time()
+        return self
+
+    async def delete(self):
+        '''
+        Deletes all shards of the counter.
+
+        :rtype: :class:`ShardedCounter`
+        '''
+        await asyncio.gather(
+            *[Counter(self.bucket, key).delete() for key in self.shard_keys],
+            loop=self._loop())
+        self._value = 0
+        self._loaded_at = None
+        return self
+
+    def _pick_shard(self):
+        if self.affinity is None:
+            return random.randrange(self.shards)
+        return zlib.crc32(str(self.affinity).encode()) % self.shards
+
+    def _loop(self):
+        return self.bucket._client._loop or asyncio.get_event_loop()
@@ -62,6 +62,13 @@ class Datatype:
         .. warning: This clears any local modifications you might have
            made.
 
+        Accepts the ``r``, ``pr``, ``basic_quorum``, ``notfound_ok``,
+        ``timeout`` and ``include_context`` options of
+        :meth:`RiakClient.fetch_datatype
+        <aioriak.client.RiakClient.fetch_datatype>`. Reloading with
+        ``include_context=False`` drops the context, so removals cannot
+        be staged afterwards.
+
         :rtype: :class:`Datatype`
         '''
         if not self.bucket:
@@ -165,6 +172,14 @@ class Datatype:
         '''
         pass
 
+    def _merge_staged(self, other):
+        '''
+        Stages the mutations staged on another datatype of the same type
+        after the ones already staged on this one. Each type must
+        implement this method.
+        '''
+        raise NotImplementedError
+
     def _require_context(self):
         '''
         Raises an exception if the context is not present
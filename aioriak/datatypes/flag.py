@@ -46,6 +46,10 @@ class Flag(Datatype):
         '''
         return self._op
 
+    def _merge_staged(self, other):
+        if other._op is not None:
+            self._op = other._op
+
     def _check_type(self, new_value):
         return isinstance(new_value, bool)
 
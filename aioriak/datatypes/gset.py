@@ -0,0 +1,28 @@
+from aioriak.datatypes.set import Set
+from aioriak.datatypes import TYPES
+
+
+class GSet(Set):
+    '''
+    A convergent datatype representing a grow-only Set: elements can be
+    added but never removed, so no context is ever needed. Currently
+    strings are the only supported value type.
+
+    Example::
+        myset.add('barista')
+        myset.add('roaster')
+        await myset.update()
+    '''
+    type_name = 'gset'
+    _type_error_msg = 'GSets can only be iterables of strings'
+
+    def discard(self, element):
+        '''
+        Elements cannot be removed from a grow-only set.
+
+        :raises: :exc:`TypeError`
+        '''
+        raise TypeError('GSets are grow-only, elements cannot be removed')
+
+
+TYPES[GSet.type_name] = GSet
@@ -0,0 +1,64 @@
+from aioriak.datatypes.datatype import Datatype
+from aioriak.datatypes import TYPES
+
+
+class Hll(Datatype):
+    '''
+    A convergent datatype representing a HyperLogLog, which estimates
+    the number of distinct elements added to it while using a bounded
+    amount of memory on the server. Currently strings are the only
+    supported element type.
+
+    Example::
+        myhll.add('barista')
+        myhll.add('roaster')
+        await myhll.update()
+        myhll.value  # => 2
+
+    Elements cannot be removed.
+    '''
+    type_name = 'hll'
+    _type_error_msg = 'Hlls can only be initialized with integers'
+
+    def _post_init(self):
+        self._adds = set()
+
+    def _default_value(self):
+        return 0
+
+    def add(self, element):
+        '''
+        Adds an element to the HyperLogLog.
+
+        :param element: the element to add
+        :type element: str
+        '''
+        if not isinstance(element, str):
+            raise TypeError('Hll elements can only be strings')
+        self._adds.add(element)
+
+    def to_op(self):
+        '''
+        Extracts the modification operation from the HyperLogLog.
+
+        :rtype: dict, None
+        '''
+        if not self._adds:
+            return None
+        return {'adds': list(self._adds)}
+
+    @Datatype.modified.getter
+    def modified(self):
+        '''
+        Whether this HyperLogLog has staged adds.
+        '''
+        return len(self._adds) > 0
+
+    def _merge_staged(self, other):
+        self._adds |= other._adds
+
+    def _check_type(self, new_value):
+        return isinstance(new_value, int)
+
+
+TYPES[Hll.type_name] = Hll
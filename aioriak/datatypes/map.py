@@ -4,6 +4,77 @@ from collections import Mapping
 from riak.util import lazy_property
 
 
+class LazyMapValue(Mapping):
+    '''
+    The value of a map as received from Riak: entries indexed by
+    ``(name, datatype)`` keys whose values are only decoded on access.
+    '''
+
+    def __init__(self, entries, decode):
+        self._entries = entries
+        self._decode = decode
+
+    def __getitem__(self, key):
+        return self._decode(self._entries[key])
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class _MapEntries(Mapping):
+    '''
+    The datatypes embedded in a map, keyed by ``(name, datatype)``.
+    Datatype wrappers are built on first access from the raw values.
+    '''
+
+    def __init__(self, values, context):
+        self._values = values
+        self._context = context
+        #: Wrappers built so far, by key
+        self.materialized = {}
+
+    def __getitem__(self, key):
+        try:
+            return self.materialized[key]
+        except KeyError:
+            pass
+        child = TYPES[key[1]](value=self._values[key], context=self._context)
+        self.materialized[key] = child
+        return child
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def plain_value(self, key):
+        '''
+        Returns the pure Python value at the key, without building its
+        wrapper.
+        '''
+        if key in self.materialized:
+            return self.materialized[key].value
+        return _plain_value(key[1], self._values[key])
+
+
+def _plain_value(datatype, value):
+    if datatype == 'set':
+        return frozenset(value)
+    elif datatype == 'map':
+        return {key: _plain_value(key[1], value[key]) for key in value}
+    return value
+
+
 class TypedMapView(Mapping):
     '''
     Implements a sort of view over a :class:`Map`, filtered by the embedded
@@ -31,7 +102,7 @@ class TypedMapView(Mapping):
         Iterates over all keys in the :class:`Map` scoped by this view's
         datatype.
         '''
-        for key in self.map.value:
+        for key in self.map._value:
             name, datatype = key
             if datatype == self.datatype:
                 yield name
@@ -40,7 +111,7 @@ class TypedMapView(Mapping):
         '''
         Returns the number of keys in this map scoped by this view's datatype.
         '''
-        return len(iter(self))
+        return sum(1 for _ in self)
 
     def __contains__(self, key):
         '''
@@ -95,6 +166,7 @@ class Map(Mapping, Datatype):
     def _post_init(self):
         self._removes = set()
         self._updates = {}
+        self._plain = None
 
     @lazy_property
     def counters(self):
@@ -179,7 +251,7 @@ class Map(Mapping, Datatype):
         '''
         Iterates over the *immutable* original value of the map.
         '''
-        return iter(self.value)
+        return iter(self._value)
 
     def __len__(self):
         '''
@@ -222,27 +294,28 @@ class Map(Mapping, Datatype):
         '''
         Returns a copy of the original map's value. Nested values are
         pure Python values as returned by :attr:`Datatype.value` from
-        the nested types.
+        the nested types. The value is computed once per fetch.
 
         :rtype: dict
         '''
-        pvalue = {}
-        for key in self._value:
-            pvalue[key] = self._value[key].value
-        return pvalue
+        if self._plain is None:
+            self._plain = {key: self._value.plain_value(key)
+                           for key in self._value}
+        return dict(self._plain)
 
     @Datatype.modified.getter
     def modified(self):
         '''
-        Whether the map has staged local modifications.
+        Whether the map has staged local modifications. Only the nested
+        datatypes accessed since the last fetch can have any.
         '''
         if self._removes:
             return True
-        for v in self._value:
-            if self._value[v].modified:
+        for child in self._value.materialized.values():
+            if child.modified:
                 return True
-        for v in self._updates:
-            if self._updates[v].modified:
+        for child in self._updates.values():
+            if child.modified:
                 return True
         return False
 
@@ -253,7 +326,7 @@ class Map(Mapping, Datatype):
         :rtype: list, None
         '''
         removes = [('remove', r) for r in self._removes]
-        value_updates = list(self._extract_updates(self._value))
+        value_updates = list(self._extract_updates(self._value.materialized))
         new_updates = list(self._extract_updates(self._updates))
         all_updates = removes + value_updates + new_updates
         if all_updates:
@@ -261,7 +334,14 @@ class Map(Mapping, Datatype):
         else:
             return None
 
+    def _set_value(self, value):
+        super()._set_value(value)
+        self._plain = None
+
     def _check_type(self, value):
+        if isinstance(value, LazyMapValue):
+            # Keys of values received from Riak are well-formed
+            return True
         for key in value:
             try:
                 self._check_key(key)
@@ -270,11 +350,19 @@ class Map(Mapping, Datatype):
         return True
 
     def _coerce_value(self, new_value):
-        cvalue = {}
-        for key in new_value:
-            cvalue[key] = TYPES[key[1]](value=new_value[key],
-                                        context=self._context)
-        return cvalue
+        return _MapEntries(new_value, self._context)
+
+    def _merge_staged(self, other):
+        # A later removal discards the updates staged before it
+        for key in other._removes:
+            self._updates.pop(key, None)
+            if key in self._value.materialized:
+                self._value.materialized[key].clear()
+            self._removes.add(key)
+        for values in (other._value.materialized, other._updates):
+            for key in values:
+                if values[key].modified:
+                    self[key]._merge_staged(values[key])
 
     def _extract_updates(self, d):
         for key in d:
@@ -57,6 +57,10 @@ class Register(Sized, Datatype):
     def __len__(self):
         return len(self.value)
 
+    def _merge_staged(self, other):
+        if other._new_value is not None:
+            self._new_value = other._new_value
+
     def _check_type(self, new_value):
         return isinstance(new_value, str)
 
@@ -89,6 +89,12 @@ class Set(collections.Set, Datatype):
     def __len__(self):
         return len(self.value)
 
+    def _merge_staged(self, other):
+        # A later add or remove of an element overrides an earlier one,
+        # Riak would otherwise let the add win
+        self._adds = (self._adds - other._removes) | other._adds
+        self._removes = (self._removes - other._adds) | other._removes
+
     def _coerce_value(self, new_value):
         return frozenset(new_value)
 
@@ -32,3 +32,28 @@ class ContextRequired(RiakError):
     def __init__(self, message=None):
         super(ContextRequired, self).__init__(message or
                                               self._default_message)
+
+
+class SiblingExplosionError(RiakError):
+    '''
+    Raised when an object read from Riak has more siblings than the
+    limit of the :class:`~aioriak.siblings.SiblingStats` of the client,
+    before they are decoded.
+    '''
+    def __init__(self, bucket, key, count, size):
+        if size is None:
+            message = '{} siblings for key {!r} of {!r}'.format(
+                count, key, bucket)
+        else:
+            message = '{} siblings of {} bytes for key {!r} of {!r}'.format(
+                count, size, key, bucket)
+        super(SiblingExplosionError, self).__init__(message)
+        #: The bucket of the object
+        self.bucket = bucket
+        #: The key of the object
+        self.key = key
+        #: The number of siblings
+        self.count = count
+        #: The encoded size of the siblings, in bytes, None for responses
+        #: without values
+        self.size = size
@@ -1,9 +1,57 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from riak.mapreduce import RiakMapReduce as _RiakMapReduce, RiakLinkPhase
 
 
 class RiakMapReduce(_RiakMapReduce):
     def __init__(self, client):
         super().__init__(client)
+        self._local_reduce = None
+
+    def local_reduce(self, function, arg=None, chunk_size=1000,
+                     executor=None, concurrency=None):
+        """
+        Adds a reduce phase run by the client, in Python, over the output
+        of the last phase run by Riak. It must be the last phase.
+
+        The output is reduced in chunks of ``chunk_size`` values, in
+        parallel in ``executor``, then the partial results are reduced
+        together. Like Riak reduce functions, ``function(values, arg)``
+        must return a list and accept its own output as input. With the
+        default process pool it must also be picklable, i.e. defined at
+        module level.
+
+        Example::
+                def reduce_sum(values, arg):
+                    return [sum(values)]
+
+                mr = RiakMapReduce(client)
+                mr.add_bucket('bucket')
+                mr.map(['riak_kv_mapreduce', 'map_object_value'])
+                mr.local_reduce(reduce_sum)
+                total, = await mr.run()
+
+        :param function: the reduce function
+        :type function: callable
+        :param arg: the argument passed to the function
+        :param chunk_size: the number of values reduced by each call
+        :type chunk_size: integer
+        :param executor: the executor running the function, a new
+            process pool by default
+        :type executor: :class:`concurrent.futures.Executor`
+        :param concurrency: the maximal number of chunks being reduced,
+            the number of CPUs by default
+        :type concurrency: integer, None
+        :rtype: :class:`RiakMapReduce`
+        """
+        if not self._phases:
+            raise ValueError('A local reduce needs a phase run by Riak')
+        self._local_reduce = (len(self._phases), function, arg,
+                              max(1, chunk_size), executor,
+                              concurrency or os.cpu_count() or 1)
+        return self
 
     async def run(self, timeout=None):
         """
@@ -22,6 +70,9 @@ class RiakMapReduce(_RiakMapReduce):
         :type timeout: integer, None
         :rtype: list
         """
+        if self._local_reduce is not None:
+            return await self._run_local_reduce(timeout)
+
         query, link_results_flag = self._normalize_query()
 
         result = await self._client.mapred(self._inputs, query, timeout)
@@ -49,9 +100,11 @@ class RiakMapReduce(_RiakMapReduce):
 
         return acc
 
-    async def stream(self, timeout=None):
+    async def stream(self, timeout=None, batch=False):
         """
-        Streams the MapReduce query (returns an async iterator).
+        Streams the MapReduce query (returns an async iterator). The
+        connection is busy until the stream is exhausted; close it with
+        ``async with`` or ``aclose()`` to leave it early.
 
         Example::
                 client = await RiakClient.create()
@@ -63,8 +116,62 @@ class RiakMapReduce(_RiakMapReduce):
 
         :param timeout: Timeout in milliseconds
         :type timeout: integer
+        :param batch: Whether to yield all the data of a response frame at
+            once
+        :type batch: bool
         :rtype: async iterator that yields (phase_num, data) tuples
         """
+        if self._local_reduce is not None:
+            raise ValueError('A local reduce phase cannot be streamed')
         query, link_results_flag = self._normalize_query()
 
-        return await self._client.stream_mapred(self._inputs, query, timeout)
+        return await self._client.stream_mapred(self._inputs, query, timeout,
+                                                batch)
+
+    async def _run_local_reduce(self, timeout):
+        phases, function, arg, chunk_size, executor, concurrency = \
+            self._local_reduce
+        if len(self._phases) != phases:
+            raise ValueError('The local reduce must be the last phase')
+        query, _ = self._normalize_query()
+        last_phase = len(query) - 1
+
+        loop = self._client._loop or asyncio.get_event_loop()
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor()
+        pending = []
+        partials = []
+        chunk = []
+
+        async def submit(values):
+            if len(pending) >= concurrency:
+                partials.append(await pending.pop(0))
+            pending.append(loop.run_in_executor(
+                executor, function, values, arg))
+
+        try:
+            stream = await self._client.stream_mapred(
+                self._inputs, query, timeout, batch=True)
+            # Closing the stream on an error frees the connection
+            async with stream:
+                async for phase, batch in stream:
+                    if phase != last_phase:
+                        continue
+                    chunk.extend(batch)
+                    while len(chunk) >= chunk_size:
+                        await submit(chunk[:chunk_size])
+                        del chunk[:chunk_size]
+            if chunk or not (pending or partials):
+                await submit(chunk)
+            for future in pending:
+                partials.append(await future)
+            if len(partials) == 1:
+                return partials[0]
+            return await loop.run_in_executor(
+                executor, function, list(chain.from_iterable(partials)), arg)
+        finally:
+            for future in pending:
+                future.cancel()
+            if own_executor:
+                executor.shutdown(wait=False)
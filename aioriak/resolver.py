@@ -11,6 +11,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor
 
 
 def default_resolver(riak_object):
@@ -38,3 +41,227 @@ def last_written_resolver(riak_object):
     """
     riak_object.siblings = [max(riak_object.siblings,
                                 key=lambda x: x.last_modified), ]
+
+
+#: Content types whose encoded numbers can be read without a decoder
+_PLAIN_TYPES = frozenset(('application/json', 'text/json', 'text/plain'))
+
+#: Default usermeta key holding the write timestamp of a sibling
+TIMESTAMP_META = 'timestamp'
+
+
+def _live(riak_object):
+    """
+    Returns the siblings that are not tombstones, or the most recent
+    tombstone when they all are.
+    """
+    siblings = [s for s in riak_object.siblings if s.exists]
+    if not siblings:
+        siblings = [max(riak_object.siblings,
+                        key=lambda x: x.last_modified or 0)]
+    return siblings
+
+
+def _timestamp(sibling, meta):
+    usermeta = sibling._usermeta
+    if usermeta and meta in usermeta:
+        try:
+            return float(usermeta[meta])
+        except ValueError:
+            pass
+    return sibling.last_modified or 0
+
+
+def _is_plain(sibling):
+    return sibling._data is None and \
+        sibling.content_type in _PLAIN_TYPES and \
+        sibling.content_encoding in (None, 'identity')
+
+
+def _distinct(siblings):
+    """
+    Drops the siblings whose encoded value is the same as the one of an
+    earlier sibling, without decoding them.
+    """
+    seen = set()
+    distinct = []
+    for sibling in siblings:
+        if sibling._encoded_data is not None:
+            value = (sibling.content_encoding, bytes(sibling._encoded_data))
+            if value in seen:
+                continue
+            seen.add(value)
+        distinct.append(sibling)
+    return distinct
+
+
+def _number(sibling):
+    """
+    Returns the numeric value of a sibling, parsed from its encoded
+    value when it is a plain JSON or text number.
+    """
+    if _is_plain(sibling):
+        value = sibling._encoded_data
+        for parse in (int, float):
+            try:
+                return parse(value)
+            except ValueError:
+                pass
+    return sibling.data
+
+
+def json_merge_resolver(meta=TIMESTAMP_META):
+    """
+    Returns a conflict-resolution function for objects holding JSON
+    dicts, which merges the siblings field by field: each field takes
+    the value it has in the most recent sibling holding it. Siblings are
+    dated by the ``meta`` entry of their usermeta, as a float, or by
+    their last modification time. The most recent sibling keeps its
+    metadata and gets the merged value.
+
+    Siblings with the same encoded value are decoded once.
+
+    :param meta: the usermeta key holding the write timestamp
+    :type meta: str
+    :rtype: function
+    """
+    def resolver(riak_object):
+        siblings = sorted(_live(riak_object),
+                          key=lambda x: _timestamp(x, meta), reverse=True)
+        newest = siblings[0]
+        if newest.exists:
+            merged = {}
+            for sibling in reversed(_distinct(siblings)):
+                merged.update(sibling.data)
+            newest.data = merged
+        riak_object.siblings = [newest]
+    return resolver
+
+
+def set_union_resolver(riak_object):
+    """
+    A conflict-resolution function for objects holding lists of
+    hashable values, such as strings or numbers, which resolves to the
+    union of the lists of all siblings. Values keep the order in which
+    they are first seen, from the most recently-modified sibling on.
+
+    Siblings with the same encoded value are decoded once.
+
+    :param riak_object: an object-in-conflict that will be resolved
+    :type riak_object: :class:`RiakObject <aioriak.riak_object.RiakObject>`
+    """
+    siblings = sorted(_live(riak_object),
+                      key=lambda x: x.last_modified or 0, reverse=True)
+    newest = siblings[0]
+    if newest.exists:
+        seen = set()
+        union = []
+        for sibling in _distinct(siblings):
+            for value in sibling.data:
+                if value not in seen:
+                    seen.add(value)
+                    union.append(value)
+        newest.data = union
+    riak_object.siblings = [newest]
+
+
+def max_resolver(riak_object):
+    """
+    A conflict-resolution function for objects holding a number, which
+    selects the sibling with the largest one. JSON and text numbers are
+    compared without decoding the siblings, and the selected sibling is
+    kept unchanged.
+
+    :param riak_object: an object-in-conflict that will be resolved
+    :type riak_object: :class:`RiakObject <aioriak.riak_object.RiakObject>`
+    """
+    siblings = _live(riak_object)
+    if siblings[0].exists:
+        siblings = [max(siblings, key=_number)]
+    riak_object.siblings = siblings
+
+
+def sum_resolver(riak_object):
+    """
+    A conflict-resolution function for objects holding a number, which
+    resolves to the sum of the numbers of all siblings. It suits
+    siblings that each hold a delta, written blindly; siblings written
+    over a common value would count it several times. JSON and text
+    numbers are summed without decoding the siblings.
+
+    :param riak_object: an object-in-conflict that will be resolved
+    :type riak_object: :class:`RiakObject <aioriak.riak_object.RiakObject>`
+    """
+    siblings = sorted(_live(riak_object),
+                      key=lambda x: x.last_modified or 0, reverse=True)
+    newest = siblings[0]
+    if newest.exists:
+        total = sum(_number(sibling) for sibling in siblings)
+        if _is_plain(newest):
+            newest.encoded_data = repr(total).encode()
+        else:
+            newest.data = total
+    riak_object.siblings = [newest]
+
+
+def content_type_resolver(resolvers, default=last_written_resolver):
+    """
+    Returns a conflict-resolution function which picks a resolver by the
+    content type of the siblings, e.g.::
+
+        bucket.resolver = content_type_resolver({
+            'application/json': json_merge_resolver(),
+            'text/plain': sum_resolver,
+        })
+
+    Siblings of different content types are resolved with ``default``.
+    The result of the chosen resolver is returned, so that coroutine
+    functions and :func:`offload_resolver` wrappers can be given.
+
+    :param resolvers: resolvers by content type
+    :type resolvers: dict
+    :param default: the resolver of other content types
+    :type default: function
+    :rtype: function
+    """
+    def resolver(riak_object):
+        content_types = set(s.content_type for s in riak_object.siblings
+                            if s.exists)
+        if len(content_types) == 1:
+            resolve = resolvers.get(content_types.pop(), default)
+        else:
+            resolve = default
+        return resolve(riak_object)
+    return resolver
+
+
+def offload_resolver(resolver, executor=None):
+    """
+    Wraps a conflict-resolution function so that it runs in an executor
+    instead of the event loop thread, for resolvers decoding and merging
+    large siblings::
+
+        bucket.resolver = offload_resolver(json_merge_resolver(), pool)
+
+    Resolvers may also be coroutine functions; fetches and stores await
+    them before returning the object.
+
+    The resolver modifies the object in place, so the executor must run
+    it in this process: process pools are rejected with a
+    :class:`TypeError`.
+
+    :param resolver: the resolver to run in the executor
+    :type resolver: function
+    :param executor: the executor, the default one of the event loop if
+        None
+    :type executor: :class:`concurrent.futures.ThreadPoolExecutor`
+    :rtype: function
+    """
+    if isinstance(executor, ProcessPoolExecutor):
+        raise TypeError('Resolvers modify objects in place and cannot '
+                        'run in a process pool')
+    @functools.wraps(resolver)
+    def wrapper(riak_object):
+        loop = riak_object.client._loop or asyncio.get_event_loop()
+        return loop.run_in_executor(executor, resolver, riak_object)
+    return wrapper
@@ -1,5 +1,5 @@
 from aioriak.content import RiakContent
-from aioriak.error import ConflictError
+from aioriak.error import ConflictError, RiakError
 
 
 def content_property(name, doc=None):
@@ -31,7 +31,8 @@ class RiakObject:
     The RiakObject holds meta information about a Riak object, plus the
     object's data.
     '''
-    siblings = []
+    __slots__ = ('client', 'bucket', 'key', 'vclock', 'siblings',
+                 '_resolver', 'unchanged', 'head_only')
 
     def __init__(self, client, bucket, key=None):
         '''
@@ -55,6 +56,12 @@ class RiakObject:
         self.vclock = None
         self.siblings = [RiakContent(self)]
         self._resolver = None
+        #: Whether the last :meth:`reload` with ``if_modified`` found the
+        #: object unchanged, in which case nothing else was updated
+        self.unchanged = False
+        #: Whether the siblings were fetched without their values, see
+        #: :meth:`reload`
+        self.head_only = False
 
     def _exists(self):
         if len(self.siblings) == 0:
@@ -72,7 +79,7 @@ class RiakObject:
         sibling is a tombstone.
         ''')
 
-    async def reload(self):
+    async def reload(self, if_modified=None, head_only=False):
         '''
         Reload the object from Riak. When this operation completes, the
         object could contain new metadata and a new value, if the object
@@ -82,32 +89,88 @@ class RiakObject:
            return a :class:`RiakObject`. Check the :attr:`exists`
            property to see if the key was found.
 
+        :param if_modified: a vector clock; if the object still has it,
+            Riak only answers that it is unchanged, :attr:`unchanged` is
+            set and the object is left as is
+        :type if_modified: :class:`~riak.riak_object.VClock` or bytes
+        :param head_only: whether to fetch the metadata of the siblings
+            without their values. The siblings are left unresolved and
+            the object cannot be stored until a value is set.
+        :type head_only: bool
         :rtype: :class:`RiakObject`
         '''
 
-        await self.client.get(self)
+        await self.client.get(self, if_modified=if_modified,
+                              head_only=head_only)
         return self
 
     async def store(self, w=None, dw=None, pw=None, return_body=True,
-                    if_none_match=False, timeout=None):
+                    if_none_match=False, timeout=None, return_head=False):
         '''
         Store the object in Riak. When this operation completes, the
         object could contain new metadata and possibly new data if Riak
         contains a newer version of the object according to the object's
         vector clock.
 
+        To update the vector clock and metadata of the object without
+        transferring its value back, store it with ``return_body=False,
+        return_head=True``. The object keeps its value, unless the write
+        created siblings: it then holds their metadata only, see
+        :attr:`head_only`.
+
         :param return_body: if the newly stored object should be retrieved
         :type return_body: bool
+        :param return_head: if the metadata of the newly stored object
+            should be retrieved, when ``return_body`` is not set
+        :type return_head: bool
         :rtype: :class:`RiakObject` '''
         if len(self.siblings) != 1:
             raise ConflictError("Attempting to store an invalid object, "
                                 "resolve the siblings first")
+        sibling = self.siblings[0]
+        if self.head_only and sibling._data is None and \
+                sibling._encoded_data is None:
+            raise RiakError("Attempting to store an object fetched without "
+                            "its value, set or reload the value first")
 
+        await sibling.dump_data()
         await self.client.put(self, w=w, dw=dw, pw=pw,
                               return_body=return_body,
-                              if_none_match=if_none_match, timeout=timeout)
+                              if_none_match=if_none_match, timeout=timeout,
+                              return_head=return_head)
         return self
 
+    async def load_data(self):
+        '''
+        Awaitable counterpart of the :attr:`data` property. Large values
+        are decoded in the offload executor of the bucket, see
+        :meth:`Bucket.set_offload <aioriak.bucket.Bucket.set_offload>`.
+
+        :rtype: mixed
+        '''
+        sibling = self._single_sibling()
+        if sibling is not None:
+            return await sibling.load_data()
+
+    async def dump_data(self):
+        '''
+        Awaitable counterpart of the :attr:`encoded_data` property. Large
+        values are encoded in the offload executor of the bucket, see
+        :meth:`Bucket.set_offload <aioriak.bucket.Bucket.set_offload>`.
+
+        :rtype: bytes
+        '''
+        sibling = self._single_sibling()
+        if sibling is not None:
+            return await sibling.dump_data()
+
+    def _single_sibling(self):
+        if len(self.siblings) == 0:
+            return
+        if len(self.siblings) != 1:
+            raise ConflictError()
+        return self.siblings[0]
+
     async def delete(self):
         '''
         Delete this object from Riak.
@@ -149,7 +212,12 @@ class RiakObject:
 
     content_encoding = content_property('content_encoding', doc='''
         The encoding (compression) of the encoded data. Valid values
-        are identity, deflate, gzip
+        are identity, deflate, gzip, and zstd or lz4 when the matching
+        packages are installed. Compressed values are decompressed
+        transparently on read; on write, the bucket's compression policy
+        (see :meth:`Bucket.set_compression
+        <aioriak.bucket.Bucket.set_compression>`) sets this property
+        when the value is encoded.
         ''')
 
     usermeta = content_property('usermeta', doc='''
@@ -0,0 +1,124 @@
+'''
+Paging through Riak Search (Yokozuna) results.
+
+Large result sets are read one page of ``rows`` documents at a time with
+successive ``start`` offsets. While a page is consumed, the next ones
+are already requested. See :meth:`RiakClient.paginate_search
+<aioriak.client.RiakClient.paginate_search>`.
+'''
+import asyncio
+from aioriak.util import discard_result
+
+
+#: Default number of documents per page
+DEFAULT_ROWS = 100
+
+#: Default number of pages requested ahead of the consumer
+DEFAULT_PREFETCH = 1
+
+
+class SearchPages:
+    '''
+    Async iterator over the documents matching a search query, fetched
+    page by page. Up to ``prefetch`` pages are requested ahead of the
+    consumer.
+
+    Example::
+
+        async for doc in client.paginate_search('famous', 'name_s:Lion*'):
+            print(doc['_yz_rk'])
+
+    :param client: the client to search with
+    :type client: :class:`~aioriak.client.RiakClient`
+    :param index: the index to search
+    :type index: str
+    :param query: the search query
+    :type query: str
+    :param rows: the number of documents per page
+    :type rows: int
+    :param start: the offset of the first document
+    :type start: int
+    :param prefetch: the number of pages requested ahead
+    :type prefetch: int
+    :param batch: whether to yield the documents of a page at once, as a
+        list, instead of one by one
+    :type batch: bool
+    :param params: other search parameters, see
+        :meth:`~aioriak.client.RiakClient.fulltext_search`
+    '''
+    def __init__(self, client, index, query, rows=DEFAULT_ROWS, start=0,
+                 prefetch=DEFAULT_PREFETCH, batch=False, **params):
+        if rows < 1:
+            raise ValueError('rows must be a positive integer')
+        self._client = client
+        self._index = index
+        self._query = query
+        self._rows = rows
+        self._next = start
+        self._prefetch = max(0, prefetch)
+        self._batch = batch
+        self._params = params
+        self._pending = []
+        self._docs = []
+        self._done = False
+        #: Number of matching documents, known once a page is fetched
+        self.num_found = None
+        #: Maximal score of the matching documents, if returned
+        self.max_score = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._docs:
+            if self._done and not self._pending:
+                raise StopAsyncIteration
+            page = await self._next_page()
+            if self._batch and page:
+                return page
+            self._docs = page
+            self._docs.reverse()
+        return self._docs.pop()
+
+    async def _next_page(self):
+        self._request_pages(1)
+        start, future = self._pending.pop(0)
+        try:
+            result = await future
+        except BaseException:
+            self.close()
+            raise
+        self.num_found = result['num_found']
+        self.max_score = result.get('max_score')
+        if len(result['docs']) < self._rows or \
+                start + self._rows >= self.num_found:
+            self._stop()
+        else:
+            self._request_pages(self._prefetch)
+        return result['docs']
+
+    def _request_pages(self, count):
+        loop = self._client._loop or asyncio.get_event_loop()
+        while not self._done and len(self._pending) < count:
+            if self.num_found is not None and self._next >= self.num_found:
+                break
+            self._pending.append((self._next, asyncio.ensure_future(
+                self._client.fulltext_search(
+                    self._index, self._query, rows=self._rows,
+                    start=self._next, **self._params),
+                loop=loop)))
+            self._next += self._rows
+
+    def _stop(self):
+        self._done = True
+        for _, future in self._pending:
+            future.add_done_callback(discard_result)
+        self._pending = []
+
+    def close(self):
+        '''
+        Stops paging. Requests already sent are left to complete so the
+        connection stays in sync, their results are discarded.
+        '''
+        self._stop()
+        self._docs = []
@@ -0,0 +1,133 @@
+'''
+Sibling statistics: objects with many siblings make large responses and
+slow resolution. Given to :class:`~aioriak.client.RiakClient` with the
+``sibling_stats`` argument, a :class:`SiblingStats` records the sibling
+count and the encoded size of every object read from Riak, per bucket,
+warns about objects above thresholds and can refuse to decode
+pathological ones.
+
+::
+
+    stats = SiblingStats(warn_count=10, warn_size=1 << 20, max_count=500)
+    client = await RiakClient.create(sibling_stats=stats)
+    ...
+    for (bucket_type, bucket), histogram in stats.histograms.items():
+        print(bucket_type, bucket, histogram.max_count)
+'''
+import logging
+from collections import Counter
+from aioriak.error import SiblingExplosionError
+
+
+logger = logging.getLogger('aioriak.siblings')
+
+
+class SiblingHistogram:
+    '''
+    Sibling counts and encoded sizes of the objects read from a bucket.
+    '''
+    def __init__(self):
+        #: Number of objects by sibling count, as a
+        #: :class:`collections.Counter`
+        self.counts = Counter()
+        #: Number of objects by encoded size of all their siblings,
+        #: rounded up to a power of two, as a :class:`collections.Counter`
+        self.sizes = Counter()
+        #: Largest sibling count seen
+        self.max_count = 0
+        #: Largest encoded size seen, in bytes
+        self.max_size = 0
+
+    def add(self, count, size=None):
+        '''
+        Records an object.
+
+        :param count: the number of siblings of the object
+        :type count: int
+        :param size: the encoded size of all its siblings, in bytes, None
+            if unknown
+        :type size: int
+        '''
+        self.counts[count] += 1
+        self.max_count = max(self.max_count, count)
+        if size is not None:
+            self.sizes[1 << (size - 1).bit_length() if size else 0] += 1
+            self.max_size = max(self.max_size, size)
+
+    def __repr__(self):
+        return '<SiblingHistogram objects={} max_count={} ' \
+            'max_size={}>'.format(sum(self.counts.values()), self.max_count,
+                                  self.max_size)
+
+
+class SiblingStats:
+    '''
+    Per bucket :class:`SiblingHistogram` of the objects read from Riak,
+    by fetches and by stores returning the stored object. Responses
+    without values, of :meth:`~aioriak.bucket.Bucket.head` and
+    ``return_head`` stores, only record the sibling count.
+
+    Objects with at least ``warn_count`` siblings, or at least
+    ``warn_size`` bytes of encoded siblings, are logged as warnings on
+    the ``aioriak.siblings`` logger. Objects with more than
+    ``max_count`` siblings raise
+    :class:`~aioriak.error.SiblingExplosionError` before any sibling is
+    decoded; the object then keeps the vector clock it was read with, so
+    that storing a new value over it replaces all the siblings.
+
+    :param warn_count: the sibling count to warn at, None to not warn
+    :type warn_count: int
+    :param warn_size: the encoded size to warn at, None to not warn
+    :type warn_size: int
+    :param max_count: the largest sibling count to decode, None for no
+        limit
+    :type max_count: int
+    '''
+    def __init__(self, warn_count=None, warn_size=None, max_count=None):
+        self.warn_count = warn_count
+        self.warn_size = warn_size
+        self.max_count = max_count
+        #: :class:`SiblingHistogram` by ``(bucket_type, bucket)`` names
+        self.histograms = {}
+
+    def record(self, obj, contents, head_only=False):
+        '''
+        Records the siblings read for an object, before they are decoded.
+
+        :param obj: the object
+        :type obj: :class:`~aioriak.riak_object.RiakObject`
+        :param contents: the RpbContent messages of its siblings
+        :type contents: list
+        :param head_only: whether the contents carry no values, so that
+            their size is not recorded
+        :type head_only: bool
+        '''
+        bucket = obj.bucket
+        count = len(contents)
+        if head_only:
+            size = None
+        else:
+            size = sum(len(content.value) for content in contents)
+        name = (bucket.bucket_type.name, bucket.name)
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = SiblingHistogram()
+        histogram.add(count, size)
+
+        if self.max_count is not None and count > self.max_count:
+            raise SiblingExplosionError(bucket, obj.key, count, size)
+        if self.warn_count is not None and count >= self.warn_count or \
+                self.warn_size is not None and size is not None and \
+                size >= self.warn_size:
+            if size is None:
+                logger.warning('%d siblings for key %r of %r', count,
+                               obj.key, bucket)
+            else:
+                logger.warning('%d siblings of %d bytes for key %r of %r',
+                               count, size, obj.key, bucket)
+
+    def reset(self):
+        '''
+        Drops all the histograms.
+        '''
+        self.histograms.clear()
@@ -0,0 +1,302 @@
+'''
+Sibling sweeper: a maintenance pass over a bucket that fetches every
+object, resolves its siblings with the bucket's resolver and writes the
+resolved objects back, so that later reads no longer pay for them.
+
+Keys are paged from the ``$bucket`` secondary index, or from a range of
+any other index, so the bucket is never listed in full. Objects are
+swept with bounded concurrency and an optional rate limit, and the
+sweep reports a histogram of sibling counts.
+
+Run it from the command line with ``aioriak-sweep`` or ``python -m
+aioriak.sweeper``. Resolving siblings drops data, so the command only
+reports the sibling counts until a resolver is named::
+
+    aioriak-sweep --bucket-type users profiles
+    aioriak-sweep --bucket-type users --resolver \\
+        aioriak.resolver.last_written_resolver profiles
+'''
+import argparse
+import asyncio
+import importlib
+import logging
+from collections import Counter
+
+
+logger = logging.getLogger('aioriak.sweeper')
+
+#: Default number of objects swept at once
+DEFAULT_CONCURRENCY = 8
+
+#: Default number of keys per secondary index page
+DEFAULT_PAGE_SIZE = 1000
+
+
+class SweepReport:
+    '''
+    Statistics of a sweep.
+    '''
+    def __init__(self):
+        #: Number of objects by sibling count, as a
+        #: :class:`collections.Counter`
+        self.histogram = Counter()
+        #: Number of objects with siblings written back resolved, or
+        #: that would be in a dry run
+        self.resolved = 0
+        #: Number of objects with siblings the resolver left in conflict
+        self.unresolved = 0
+        #: Number of objects that could not be fetched or written
+        self.errors = 0
+
+    @property
+    def swept(self):
+        '''
+        Number of objects fetched.
+
+        :rtype: int
+        '''
+        return sum(self.histogram.values())
+
+    def format(self):
+        '''
+        Returns the report as text, with one histogram line per sibling
+        count.
+
+        :rtype: str
+        '''
+        lines = ['siblings  objects']
+        for count in sorted(self.histogram):
+            lines.append('{:>8}  {:>7}'.format(count, self.histogram[count]))
+        lines.append('swept {}, resolved {}, unresolved {}, errors {}'.format(
+            self.swept, self.resolved, self.unresolved, self.errors))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return '<SweepReport swept={} resolved={} unresolved={} ' \
+            'errors={}>'.format(self.swept, self.resolved, self.unresolved,
+                                self.errors)
+
+
+class _RateLimiter:
+    '''
+    Spaces calls to :meth:`wait` at least ``1 / rate`` seconds apart.
+    '''
+    def __init__(self, rate, loop):
+        self._interval = 1.0 / rate if rate else 0
+        self._loop = loop
+        self._next = loop.time()
+
+    async def wait(self):
+        if not self._interval:
+            return
+        now = self._loop.time()
+        delay = self._next - now
+        self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay, loop=self._loop)
+
+
+async def sweep_key(bucket, key, report, resolver=None, dry_run=False):
+    '''
+    Fetches an object, resolves its siblings and writes it back
+    resolved, recording the outcome in ``report``. A resolved
+    tombstone is deleted with the fetched vector clock.
+
+    :param bucket: the bucket of the object
+    :type bucket: :class:`~aioriak.bucket.Bucket`
+    :param key: the key of the object
+    :type key: str
+    :param report: the report to update
+    :type report: :class:`SweepReport`
+    :param resolver: the resolver, the bucket's one if None
+    :type resolver: function
+    :param dry_run: whether to leave resolved objects unwritten
+    :type dry_run: bool
+    '''
+    from aioriak.riak_object import RiakObject
+    resolve = resolver or bucket.resolver
+    counts = []
+
+    def counting_resolver(obj):
+        counts.append(len(obj.siblings))
+        return resolve(obj)
+
+    obj = RiakObject(bucket._client, bucket, key)
+    obj.resolver = counting_resolver
+    try:
+        await obj.reload()
+    except Exception:
+        report.errors += 1
+        logger.warning('Could not fetch %r from %r', key, bucket,
+                       exc_info=True)
+        return
+    if not obj.siblings:
+        # Deleted since the key was listed
+        return
+    siblings = counts[0] if counts else len(obj.siblings)
+    report.histogram[siblings] += 1
+    if siblings < 2:
+        return
+    if len(obj.siblings) != 1:
+        report.unresolved += 1
+        return
+    if not dry_run:
+        try:
+            if obj.siblings[0].exists:
+                await obj.store(return_body=False)
+            else:
+                await obj.delete()
+        except Exception:
+            report.errors += 1
+            logger.warning('Could not write %r back to %r', key, bucket,
+                           exc_info=True)
+            return
+    report.resolved += 1
+
+
+async def sweep(bucket, index='$bucket', startkey=None, endkey=None,
+                keys=None, resolver=None, concurrency=DEFAULT_CONCURRENCY,
+                rate=None, page_size=DEFAULT_PAGE_SIZE, dry_run=False):
+    '''
+    Sweeps the objects of a bucket, see :func:`sweep_key`.
+
+    By default, every key of the bucket is swept, paged from the
+    ``$bucket`` secondary index. Another index range can be given with
+    ``index``, ``startkey`` and ``endkey``, or an explicit list of
+    ``keys``.
+
+    :param bucket: the bucket to sweep
+    :type bucket: :class:`~aioriak.bucket.Bucket`
+    :param index: the secondary index listing the keys
+    :type index: str
+    :param startkey: the beginning of the index range, the bucket name
+        for ``$bucket``
+    :type startkey: str | int
+    :param endkey: the end of the index range
+    :type endkey: str | int
+    :param keys: the keys to sweep instead of an index range
+    :type keys: iterable
+    :param resolver: the resolver, the bucket's one if None
+    :type resolver: function
+    :param concurrency: the number of objects swept at once
+    :type concurrency: int
+    :param rate: the maximal number of objects fetched per second, not
+        limited if None
+    :type rate: float
+    :param page_size: the number of keys per index page
+    :type page_size: int
+    :param dry_run: whether to only report, without writing
+    :type dry_run: bool
+    :rtype: :class:`SweepReport`
+    '''
+    loop = bucket._client._loop or asyncio.get_event_loop()
+    report = SweepReport()
+    limiter = _RateLimiter(rate, loop)
+    semaphore = asyncio.Semaphore(max(1, concurrency), loop=loop)
+    pending = set()
+
+    def done(task):
+        pending.discard(task)
+        semaphore.release()
+
+    async def submit(key):
+        await semaphore.acquire()
+        await limiter.wait()
+        task = asyncio.ensure_future(
+            sweep_key(bucket, key, report, resolver, dry_run), loop=loop)
+        pending.add(task)
+        task.add_done_callback(done)
+
+    try:
+        if keys is not None:
+            for key in keys:
+                await submit(key)
+        else:
+            if startkey is None and index == '$bucket':
+                startkey = bucket.name
+            continuation = None
+            while True:
+                page, continuation = await bucket.get_index(
+                    index, startkey, endkey, max_results=page_size,
+                    continuation=continuation)
+                for key in page:
+                    await submit(key)
+                if not continuation:
+                    break
+    finally:
+        if pending:
+            await asyncio.wait(pending, loop=loop)
+    return report
+
+
+def _import_resolver(path):
+    module, _, name = path.rpartition('.')
+    if not module:
+        raise ValueError('Expected a dotted path to a resolver: {}'.format(
+            path))
+    return getattr(importlib.import_module(module), name)
+
+
+def main(argv=None):
+    '''
+    Command line entry point, see ``aioriak-sweep --help``.
+    '''
+    from aioriak.client import RiakClient
+    parser = argparse.ArgumentParser(
+        prog='aioriak-sweep',
+        description='Resolve the siblings of the objects of a Riak bucket '
+                    'and write them back. Without --resolver, only the '
+                    'sibling counts are reported.')
+    parser.add_argument('bucket', help='the bucket to sweep')
+    parser.add_argument('--bucket-type', default='default',
+                        help='the bucket type of the bucket')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8087)
+    parser.add_argument('--resolver',
+                        help='dotted path of the resolver function; '
+                             'without it, nothing is written')
+    parser.add_argument('--index', default='$bucket',
+                        help='secondary index listing the keys')
+    parser.add_argument('--start', help='beginning of the index range')
+    parser.add_argument('--end', help='end of the index range')
+    parser.add_argument('--concurrency', type=int,
+                        default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--rate', type=float,
+                        help='maximal number of objects per second')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--dry-run', action='store_true',
+                        help='report without writing')
+    args = parser.parse_args(argv)
+    if args.index.endswith('_int'):
+        args.start = None if args.start is None else int(args.start)
+        args.end = None if args.end is None else int(args.end)
+
+    if args.resolver:
+        resolver = _import_resolver(args.resolver)
+    else:
+        # The resolver of the bucket, siblings are only counted
+        resolver = None
+        args.dry_run = True
+
+    logging.basicConfig(level=logging.WARNING)
+    loop = asyncio.get_event_loop()
+
+    async def go():
+        client = await RiakClient.create(args.host, args.port, loop=loop)
+        try:
+            bucket = client.bucket(args.bucket, args.bucket_type)
+            return await sweep(
+                bucket, args.index, args.start, args.end,
+                resolver=resolver, concurrency=args.concurrency,
+                rate=args.rate, page_size=args.page_size,
+                dry_run=args.dry_run)
+        finally:
+            client.close()
+
+    report = loop.run_until_complete(go())
+    print(report.format())
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
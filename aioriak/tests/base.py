@@ -1,7 +1,9 @@
 import asyncio
 from aioriak import RiakClient
 from aioriak.tests import HOST, PORT
+from aioriak.transport import RiakPbcAsyncTransport
 import unittest
+from unittest import mock
 import random
 
 
@@ -48,3 +50,37 @@ class AsyncUnitTestCase(unittest.TestCase):
         self.client.close()
         self.loop.stop()
         self.loop.close()
+
+
+class UnitTestCase(unittest.TestCase):
+    '''
+    Base of the tests running without Riak: every test gets a new event
+    loop and a client of ``client_class`` which is not connected.
+    '''
+    client_class = RiakClient
+
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.client = self.client_class(loop=self.loop)
+
+    def patch(self, target, name, new):
+        '''
+        Replaces an attribute of an object until the end of the test.
+        '''
+        patcher = mock.patch.object(target, name, new)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self):
+        '''
+        Gives the client a transport reading the responses fed to
+        ``self.reader`` and writing the requests to the mock
+        ``self.writer``.
+        '''
+        self.reader = asyncio.StreamReader(loop=self.loop)
+        self.writer = mock.Mock()
+        self.transport = RiakPbcAsyncTransport(self.reader, self.writer,
+                                               loop=self.loop)
+        self.client._transport = self.transport
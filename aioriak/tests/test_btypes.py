@@ -1,6 +1,10 @@
 from aioriak.tests.base import IntegrationTest, AsyncUnitTestCase
 from aioriak.bucket import BucketType, Bucket
 from aioriak.error import RiakError
+from aioriak.client import RiakClient
+from unittest import mock
+import asyncio
+import unittest
 
 
 class BucketTypeTests(IntegrationTest, AsyncUnitTestCase):
@@ -129,3 +133,94 @@ class BucketTypeTests(IntegrationTest, AsyncUnitTestCase):
                 self.client.bucket(self.bucket_name))
             self.assertCountEqual(keys, oldapikeys)
         self.loop.run_until_complete(go())
+
+
+class PropertyCacheUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.fetches = []
+
+        async def get_bucket_props(bucket):
+            self.fetches.append(bucket.name)
+            await asyncio.sleep(0.01, loop=self.loop)
+            return {'n_val': len(self.fetches)}
+
+        async def get_bucket_type_props(bucket_type):
+            self.fetches.append(bucket_type.name)
+            return {'datatype': 'set'}
+
+        async def set_bucket_props(bucket, props):
+            pass
+        self.transport = mock.Mock(**{
+            name: mock.Mock(side_effect=func)
+            for name, func in (('get_bucket_props', get_bucket_props),
+                               ('get_bucket_type_props',
+                                get_bucket_type_props),
+                               ('set_bucket_props', set_bucket_props))})
+
+    def tearDown(self):
+        self.loop.close()
+
+    def client(self, **kwargs):
+        client = RiakClient(loop=self.loop, **kwargs)
+        client._transport = self.transport
+        return client
+
+    def test_no_cache_by_default(self):
+        async def go():
+            bucket = self.client().bucket('test')
+            await bucket.get_properties()
+            self.assertEqual(2, await bucket.get_property('n_val'))
+        self.loop.run_until_complete(go())
+
+    def test_concurrent_fetches_coalesced(self):
+        async def go():
+            bucket = self.client().bucket('test')
+            props = await asyncio.gather(
+                *[bucket.get_properties() for _ in range(5)], loop=self.loop)
+            self.assertEqual([{'n_val': 1}] * 5, props)
+            self.assertEqual(['test'], self.fetches)
+        self.loop.run_until_complete(go())
+
+    def test_ttl(self):
+        async def go():
+            bucket = self.client(props_ttl=0.05).bucket('test')
+            await bucket.get_properties()
+            self.assertEqual(1, await bucket.get_property('n_val'))
+            await asyncio.sleep(0.06, loop=self.loop)
+            self.assertEqual(2, await bucket.get_property('n_val'))
+        self.loop.run_until_complete(go())
+
+    def test_invalidate(self):
+        async def go():
+            bucket = self.client(props_ttl=None).bucket('test')
+            await bucket.get_properties()
+            await bucket.set_property('n_val', 3)
+            self.assertEqual(2, await bucket.get_property('n_val'))
+            bucket.invalidate()
+            self.assertEqual(3, await bucket.get_property('n_val'))
+        self.loop.run_until_complete(go())
+
+    def test_warm_up(self):
+        async def go():
+            client = self.client(props_ttl=None)
+            await client.warm_up(['test', ('sets', 'other'),
+                                  ('maps', None)])
+            self.assertEqual({'test', 'sets', 'other', 'maps'},
+                             set(self.fetches))
+            self.assertEqual('set',
+                             await client.bucket_type('sets').get_datatype())
+            await client.bucket('test').get_properties()
+            await client.bucket('other', 'sets').get_properties()
+            self.assertEqual(4, len(self.fetches))
+            self.assertEqual(2, self.transport.get_bucket_props.call_count)
+        self.loop.run_until_complete(go())
+
+    def test_warm_up_needs_ttl(self):
+        async def go():
+            client = self.client()
+            with self.assertRaises(ValueError):
+                await client.warm_up(['test'])
+            await client.warm_up([('sets', None)])
+            self.assertEqual(['sets'], self.fetches)
+        self.loop.run_until_complete(go())
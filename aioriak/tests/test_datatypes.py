@@ -1,9 +1,13 @@
+import asyncio
 import unittest
 from aioriak.bucket import Bucket, BucketType
 from aioriak import datatypes
-from aioriak.tests.base import IntegrationTest, AsyncUnitTestCase
+from aioriak.tests.base import (
+    IntegrationTest, AsyncUnitTestCase, UnitTestCase)
 from aioriak import error
 from aioriak.riak_object import RiakObject
+from aioriak.transport import RiakPbcAsyncTransport
+from riak.pb import riak_dt_pb2, riak_pb2, messages
 
 
 class DatatypeUnitTestBase:
@@ -83,6 +87,38 @@ class RegisterUnitTests(DatatypeUnitTestBase, unittest.TestCase):
         self.assertEqual(('assign', 'foobarbaz'), op)
 
 
+class HllUnitTests(DatatypeUnitTestBase, unittest.TestCase):
+    dtype = datatypes.Hll
+
+    def op(self, dtype):
+        dtype.add('a')
+        dtype.add('b')
+        dtype.add('a')
+
+    def check_op_output(self, op):
+        self.assertEqual(['a', 'b'], sorted(op['adds']))
+
+    def test_elements_must_be_strings(self):
+        dtype = self.dtype(self.bucket, 'key')
+        with self.assertRaises(TypeError):
+            dtype.add(1)
+
+
+class GSetUnitTests(DatatypeUnitTestBase, unittest.TestCase):
+    dtype = datatypes.GSet
+
+    def op(self, dtype):
+        dtype.add('a')
+
+    def check_op_output(self, op):
+        self.assertEqual({'adds': ['a']}, op)
+
+    def test_discard_not_supported(self):
+        dtype = self.dtype(self.bucket, 'key', context=b'ctx')
+        with self.assertRaisesRegex(TypeError, 'grow-only'):
+            dtype.discard('a')
+
+
 class MapUnitTests(DatatypeUnitTestBase, unittest.TestCase):
     dtype = datatypes.Map
 
@@ -121,6 +157,380 @@ class MapUnitTests(DatatypeUnitTestBase, unittest.TestCase):
         self.assertTrue(dtype.modified)
 
 
+class LazyMapUnitTests(UnitTestCase):
+    bucket = Bucket(None, 'test', BucketType(None, 'datatypes'))
+
+    def setUp(self):
+        super().setUp()
+        self.transport = RiakPbcAsyncTransport(None, None, loop=self.loop)
+
+    def entry(self, msg, name, dtype):
+        entry = msg.add()
+        entry.field.name = name.encode()
+        entry.field.type = getattr(riak_dt_pb2.MapField, dtype.upper())
+        return entry
+
+    def fetch_resp(self):
+        resp = riak_dt_pb2.DtFetchResp()
+        resp.type = riak_dt_pb2.DtFetchResp.MAP
+        resp.context = b'ctx'
+        entries = resp.value.map_value
+        for i in range(100):
+            self.entry(entries, 'c{}'.format(i), 'counter').counter_value = i
+        self.entry(entries, 'name', 'register').register_value = b'riak'
+        self.entry(entries, 'tags', 'set').set_value.extend([b'a', b'b'])
+        nested = self.entry(entries, 'nested', 'map')
+        self.entry(nested.map_value, 'on', 'flag').flag_value = True
+        return resp
+
+    def fetch_map(self):
+        dtype, value, context = self.transport._decode_dt_fetch(
+            self.fetch_resp())
+        return datatypes.Map(self.bucket, 'key', value=value,
+                             context=context)
+
+    def test_wrappers_built_on_access(self):
+        mymap = self.fetch_map()
+        self.assertEqual(103, len(mymap))
+        self.assertEqual(100, len(mymap.counters))
+        self.assertFalse(mymap.modified)
+        self.assertEqual({}, mymap._value.materialized)
+
+        self.assertEqual(5, mymap.counters['c5'].value)
+        self.assertTrue(mymap.maps['nested'].flags['on'].value)
+        self.assertEqual(2, len(mymap._value.materialized))
+
+    def test_value(self):
+        mymap = self.fetch_map()
+        value = mymap.value
+        self.assertEqual(99, value[('c99', 'counter')])
+        self.assertEqual('riak', value[('name', 'register')])
+        self.assertEqual(frozenset(['a', 'b']), value[('tags', 'set')])
+        self.assertEqual({('on', 'flag'): True}, value[('nested', 'map')])
+        self.assertEqual({}, mymap._value.materialized)
+        self.assertEqual(value, mymap.value)
+
+        mymap._set_value({('other', 'counter'): 1})
+        self.assertEqual({('other', 'counter'): 1}, mymap.value)
+
+    def test_op_of_accessed_entries(self):
+        mymap = self.fetch_map()
+        mymap.counters['c1'].increment()
+        mymap.sets['tags'].discard('a')
+        self.assertTrue(mymap.modified)
+        self.assertEqual(
+            sorted([('update', ('c1', 'counter'), ('increment', 1)),
+                    ('update', ('tags', 'set'), {'removes': ['a']})]),
+            sorted(mymap.to_op()))
+
+
+class FetchDatatypesUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connect()
+        self.bucket = Bucket(None, 'test', BucketType(None, 'counters'))
+
+    def respond(self, *values):
+        for value in values:
+            if value is None:
+                resp = None
+                code = messages.MSG_CODE_PING_RESP
+            elif isinstance(value, str):
+                resp = riak_pb2.RpbErrorResp(errmsg=value.encode(),
+                                             errcode=0)
+                code = messages.MSG_CODE_ERROR_RESP
+            else:
+                resp = riak_dt_pb2.DtFetchResp(
+                    type=riak_dt_pb2.DtFetchResp.COUNTER)
+                resp.value.counter_value = value
+                code = messages.MSG_CODE_DT_FETCH_RESP
+            self.reader.feed_data(
+                self.transport._encode_message(code, resp))
+
+    def test_pipelined_in_order(self):
+        self.respond(1, 2, 3, 4, 5)
+        results = self.loop.run_until_complete(
+            self.transport.fetch_datatypes(
+                self.bucket, ['a', 'b', 'c', 'd', 'e'], window=2,
+                include_context=False))
+        self.assertEqual([1, 2, 3, 4, 5], [value for _, value, _ in results])
+        self.assertEqual(5, self.writer.write.call_count)
+        req = riak_dt_pb2.DtFetchReq()
+        req.ParseFromString(self.writer.write.call_args[0][0][5:])
+        self.assertEqual(b'e', req.key)
+        self.assertFalse(req.include_context)
+
+    def test_fetch_options(self):
+        self.respond(7)
+        dtype, value, context = self.loop.run_until_complete(
+            self.transport.fetch_datatype(
+                self.bucket, 'a', r=2, pr='one', notfound_ok=False,
+                timeout=500, include_context=False))
+        self.assertEqual(('counter', 7, None), (dtype, value, context))
+        req = riak_dt_pb2.DtFetchReq()
+        req.ParseFromString(self.writer.write.call_args[0][0][5:])
+        self.assertEqual(2, req.r)
+        self.assertEqual(self.transport._encode_quorum('one'), req.pr)
+        self.assertFalse(req.notfound_ok)
+        self.assertEqual(500, req.timeout)
+        self.assertFalse(req.include_context)
+        self.assertFalse(req.HasField('basic_quorum'))
+
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(self.transport.fetch_datatype(
+                self.bucket, 'a', timeout=-1))
+
+    def test_error_keeps_connection_in_sync(self):
+        self.respond(1, 'overload', 3, 4)
+        with self.assertRaises(error.RiakError):
+            self.loop.run_until_complete(self.transport.fetch_datatypes(
+                self.bucket, ['a', 'b', 'c'], window=3))
+        results = self.loop.run_until_complete(
+            self.transport.fetch_datatypes(self.bucket, ['d']))
+        self.assertEqual(4, results[0][1])
+
+    def test_unexpected_code_keeps_connection_in_sync(self):
+        self.respond(1, None, 3, 4)
+        with self.assertRaisesRegex(Exception, 'Unexpected response code'):
+            self.loop.run_until_complete(self.transport.fetch_datatypes(
+                self.bucket, ['a', 'b', 'c', 'd'], window=2))
+        # The requests after the unexpected response are not sent
+        self.assertEqual(3, self.writer.write.call_count)
+        results = self.loop.run_until_complete(
+            self.transport.fetch_datatypes(self.bucket, ['d']))
+        self.assertEqual(4, results[0][1])
+
+
+class CounterBufferUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bucket = self.client.bucket_type('counters').bucket('test')
+        self.updates = []
+        self.failures = 0
+
+        async def update_datatype(datatype, **params):
+            if self.failures:
+                self.failures -= 1
+                raise error.RiakError('update failed')
+            self.updates.append((datatype.key, datatype.to_op()))
+        self.patch(self.client, 'update_datatype', update_datatype)
+
+    def test_coalesces_increments(self):
+        async def go():
+            buf = datatypes.CounterBuffer(self.bucket, interval=60)
+            for _ in range(100):
+                await buf.increment('a')
+            await buf.decrement('b', 3)
+            await buf.increment('b')
+            self.assertEqual({'a': 100, 'b': -2}, buf.pending)
+            self.assertEqual([], self.updates)
+            await buf.flush()
+            self.assertEqual([('a', ('increment', 100)),
+                              ('b', ('increment', -2))],
+                             sorted(self.updates))
+            self.assertEqual({}, buf.pending)
+        self.loop.run_until_complete(go())
+
+    def test_flushes_on_interval(self):
+        async def go():
+            buf = datatypes.CounterBuffer(self.bucket, interval=0.01)
+            await buf.increment('a', 5)
+            await asyncio.sleep(0.05, loop=self.loop)
+            self.assertEqual([('a', ('increment', 5))], self.updates)
+            await buf.close()
+        self.loop.run_until_complete(go())
+
+    def test_flushes_on_max_ops(self):
+        async def go():
+            buf = datatypes.CounterBuffer(self.bucket, interval=60,
+                                          max_ops=10)
+            for _ in range(10):
+                await buf.increment('a')
+            await asyncio.sleep(0.01, loop=self.loop)
+            self.assertEqual([('a', ('increment', 10))], self.updates)
+            await buf.close()
+        self.loop.run_until_complete(go())
+
+    def test_max_pending_waits_for_flush(self):
+        async def go():
+            buf = datatypes.CounterBuffer(self.bucket, interval=60,
+                                          max_ops=5, max_pending=5)
+            for _ in range(5):
+                await buf.increment('a')
+            self.assertEqual([('a', ('increment', 5))], self.updates)
+            await buf.close()
+        self.loop.run_until_complete(go())
+
+    def test_failed_flush_keeps_increments(self):
+        async def go():
+            buf = datatypes.CounterBuffer(self.bucket, interval=60)
+            await buf.increment('a', 2)
+            self.failures = 1
+            with self.assertRaises(error.RiakError):
+                await buf.flush()
+            await buf.increment('a', 3)
+            self.assertEqual({'a': 5}, buf.pending)
+            await buf.close()
+            self.assertEqual([('a', ('increment', 5))], self.updates)
+            with self.assertRaises(RuntimeError):
+                await buf.increment('a')
+        self.loop.run_until_complete(go())
+
+
+class DatatypeBufferUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bucket = self.client.bucket_type('maps').bucket('test')
+        self.updates = []
+        self.fetches = []
+
+        async def update_datatype(datatype, **params):
+            self.updates.append((datatype.key, datatype.to_op(),
+                                 datatype.context))
+
+        async def fetch_datatype(bucket, key):
+            self.fetches.append(key)
+            return 'map', {}, b'fresh'
+        self.patch(self.client, 'update_datatype', update_datatype)
+        self.patch(self.client, '_fetch_datatype', fetch_datatype)
+
+    def test_merges_sets(self):
+        async def go():
+            buf = datatypes.DatatypeBuffer(self.client, interval=60)
+            first = datatypes.Set(self.bucket, 'key')
+            first.add('a')
+            first.add('b')
+            await buf.stage(first)
+            self.assertFalse(first.modified)
+            second = datatypes.Set(self.bucket, 'key', context=b'ctx')
+            second.add('c')
+            second.discard('b')
+            await buf.stage(second)
+            self.assertEqual(1, len(buf))
+            await buf.flush()
+            key, op, context = self.updates[0]
+            self.assertEqual(['a', 'c'], sorted(op['adds']))
+            self.assertEqual(['b'], op['removes'])
+            self.assertEqual(b'ctx', context)
+            self.assertEqual([], self.fetches)
+        self.loop.run_until_complete(go())
+
+    def test_adds_are_sent_without_context(self):
+        async def go():
+            buf = datatypes.DatatypeBuffer(self.client, interval=60)
+            myset = datatypes.Set(self.bucket, 'key', context=b'ctx')
+            myset.add('a')
+            await buf.stage(myset)
+            await buf.close()
+            self.assertEqual([('key', {'adds': ['a']}, None)], self.updates)
+        self.loop.run_until_complete(go())
+
+    def test_conflicting_contexts_fetch_fresh_one(self):
+        async def go():
+            buf = datatypes.DatatypeBuffer(self.client, interval=60)
+            for context in (b'one', b'two'):
+                mymap = datatypes.Map(self.bucket, 'key', context=context)
+                del mymap.sets[context.decode()]
+                await buf.stage(mymap)
+            await buf.close()
+            self.assertEqual(['key'], self.fetches)
+            self.assertEqual(b'fresh', self.updates[0][2])
+        self.loop.run_until_complete(go())
+
+    def test_merges_maps(self):
+        async def go():
+            buf = datatypes.DatatypeBuffer(self.client, interval=60)
+            first = datatypes.Map(self.bucket, 'key')
+            first.registers['name'].assign('old')
+            first.counters['visits'].increment()
+            first.maps['nested'].sets['tags'].add('x')
+            await buf.stage(first)
+            second = datatypes.Map(self.bucket, 'key')
+            second.registers['name'].assign('new')
+            second.counters['visits'].increment(2)
+            second.maps['nested'].sets['tags'].add('y')
+            second.flags['active'].enable()
+            await buf.stage(second)
+
+            op = buf.pending(self.bucket, 'key')
+            self.assertIn(('update', ('name', 'register'),
+                           ('assign', 'new')), op)
+            self.assertIn(('update', ('visits', 'counter'),
+                           ('increment', 3)), op)
+            self.assertIn(('update', ('active', 'flag'), 'enable'), op)
+            nested = [item for item in op if item[1][0] == 'nested'][0]
+            self.assertEqual(['x', 'y'],
+                             sorted(nested[2][0][2]['adds']))
+            await buf.close()
+            self.assertEqual(1, len(self.updates))
+            self.assertIsNone(self.updates[0][2])
+        self.loop.run_until_complete(go())
+
+    def test_rejects_different_type(self):
+        async def go():
+            buf = datatypes.DatatypeBuffer(self.client, interval=60)
+            myset = datatypes.Set(self.bucket, 'key')
+            myset.add('a')
+            await buf.stage(myset)
+            counter = datatypes.Counter(self.bucket, 'key')
+            counter.increment()
+            with self.assertRaises(TypeError):
+                await buf.stage(counter)
+            await buf.close()
+        self.loop.run_until_complete(go())
+
+
+class ShardedCounterUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bucket = self.client.bucket_type('counters').bucket('test')
+        self.shards = {}
+        self.fetches = 0
+
+        async def update_datatype(datatype, **params):
+            self.shards[datatype.key] = (self.shards.get(datatype.key, 0) +
+                                         datatype.to_op()[1])
+
+        async def fetch_datatype(bucket, key, **params):
+            self.fetches += 1
+            return 'counter', self.shards.get(key, 0), None
+        self.patch(self.client, 'update_datatype', update_datatype)
+        self.patch(self.client, '_fetch_datatype', fetch_datatype)
+
+    def test_spreads_increments(self):
+        async def go():
+            counter = datatypes.ShardedCounter(self.bucket, 'hits', shards=4)
+            for _ in range(100):
+                await counter.increment()
+            await counter.decrement(10, shard=0)
+            self.assertTrue(set(self.shards) <= set(counter.shard_keys))
+            self.assertGreater(len(self.shards), 1)
+            await counter.reload()
+            self.assertEqual(90, counter.value)
+            self.assertEqual(4, self.fetches)
+        self.loop.run_until_complete(go())
+
+    def test_affinity(self):
+        async def go():
+            counter = datatypes.ShardedCounter(self.bucket, 'hits', shards=4,
+                                               affinity='worker-1')
+            for _ in range(10):
+                await counter.increment()
+            self.assertEqual(1, len(self.shards))
+        self.loop.run_until_complete(go())
+
+    def test_cached_total(self):
+        async def go():
+            counter = datatypes.ShardedCounter(self.bucket, 'hits', shards=4,
+                                               cache_ttl=60)
+            await counter.reload()
+            await counter.increment(5)
+            await counter.reload()
+            self.assertEqual(5, counter.value)
+            self.assertEqual(4, self.fetches)
+        self.loop.run_until_complete(go())
+
+
 class DatatypeIntegrationTests(IntegrationTest,
                                AsyncUnitTestCase):
     def test_dt_counter(self):
@@ -141,6 +551,98 @@ class DatatypeIntegrationTests(IntegrationTest,
             self.assertEqual(2, mycount.value)
         self.loop.run_until_complete(go())
 
+    def test_dt_sharded_counter(self):
+        async def go():
+            btype = self.client.bucket_type('pytest-counters')
+            bucket = btype.bucket(self.bucket_name)
+            counter = datatypes.ShardedCounter(bucket, self.key_name,
+                                               shards=4)
+            for _ in range(20):
+                await counter.increment()
+            await counter.decrement(5)
+
+            other = datatypes.ShardedCounter(bucket, self.key_name, shards=4)
+            await other.reload()
+            self.assertEqual(15, other.value)
+
+            await other.delete()
+            await counter.reload()
+            self.assertEqual(0, counter.value)
+        self.loop.run_until_complete(go())
+
+    def test_dt_hll(self):
+        async def go():
+            btype = self.client.bucket_type('pytest-hlls')
+            bucket = btype.bucket(self.bucket_name)
+            myhll = datatypes.Hll(bucket, self.key_name)
+            for element in ('a', 'b', 'c', 'a'):
+                myhll.add(element)
+            await myhll.store()
+            self.assertEqual(3, myhll.value)
+
+            otherhll = await bucket.get(self.key_name)
+            self.assertIsInstance(otherhll, datatypes.Hll)
+            self.assertEqual(3, otherhll.value)
+        self.loop.run_until_complete(go())
+
+    def test_dt_gset(self):
+        async def go():
+            btype = self.client.bucket_type('pytest-gsets')
+            bucket = btype.bucket(self.bucket_name)
+            myset = datatypes.GSet(bucket, self.key_name)
+            myset.add('Sean')
+            myset.add('Brett')
+            await myset.store()
+
+            otherset = await bucket.get(self.key_name)
+            self.assertIsInstance(otherset, datatypes.GSet)
+            self.assertEqual({'Sean', 'Brett'}, set(otherset))
+        self.loop.run_until_complete(go())
+
+    def test_fetch_datatypes(self):
+        async def go():
+            btype = self.client.bucket_type('pytest-counters')
+            bucket = btype.bucket(self.bucket_name)
+            keys = ['{}-{}'.format(self.key_name, i) for i in range(10)]
+            for i, key in enumerate(keys):
+                counter = datatypes.Counter(bucket, key)
+                counter.increment(i + 1)
+                await counter.store()
+
+            counters = await self.client.fetch_datatypes(
+                bucket, keys, concurrency=3)
+            self.assertEqual(keys, [counter.key for counter in counters])
+            self.assertEqual(list(range(1, 11)),
+                             [counter.value for counter in counters])
+            self.assertIsNotNone(counters[0].context)
+
+            counters = await self.client.fetch_datatypes(
+                bucket, keys[:2], include_context=False)
+            self.assertEqual([1, 2], [counter.value for counter in counters])
+            self.assertIsNone(counters[0].context)
+
+            self.assertTrue(await self.client.ping())
+        self.loop.run_until_complete(go())
+
+    def test_dt_reload_without_context(self):
+        async def go():
+            btype = self.client.bucket_type('pytest-sets')
+            bucket = btype.bucket(self.bucket_name)
+            myset = datatypes.Set(bucket, self.key_name)
+            myset.add('Sean')
+            await myset.store()
+
+            await myset.reload(r=1, include_context=False, timeout=1000)
+            self.assertEqual(frozenset(['Sean']), myset.value)
+            self.assertIsNone(myset.context)
+            with self.assertRaises(error.ContextRequired):
+                myset.discard('Sean')
+
+            otherset = await self.client.fetch_datatype(
+                bucket, self.key_name, notfound_ok=True)
+            self.assertIsNotNone(otherset.context)
+        self.loop.run_until_complete(go())
+
     def test_dt_set(self):
         async def go():
             btype = self.client.bucket_type('pytest-sets')
@@ -1,18 +1,43 @@
-from .base import IntegrationTest, AsyncUnitTestCase
-from aioriak.bucket import Bucket
+from .base import IntegrationTest, AsyncUnitTestCase, UnitTestCase
+from aioriak.bucket import Bucket, BucketType
+from aioriak.riak_object import RiakObject
+from aioriak.client import RiakClient
+from aioriak.content import RiakContent
+from aioriak import codecs
+from aioriak import chunked
+from aioriak import sweeper
+from aioriak import backup
 from aioriak.mapreduce import RiakMapReduce
-from aioriak.error import ConflictError
-from aioriak.resolver import default_resolver, last_written_resolver
+from aioriak.vclocks import VClockCache
+from aioriak.siblings import SiblingStats
+from aioriak.transport import RiakPbcAsyncTransport, MapRedResult
+from riak.pb import riak_pb2, riak_kv_pb2, messages
+from aioriak.error import ConflictError, RiakError, SiblingExplosionError
+from aioriak.resolver import (
+    default_resolver, last_written_resolver, json_merge_resolver,
+    set_union_resolver, max_resolver, sum_resolver, content_type_resolver,
+    offload_resolver)
 import asyncio
 import json
 import pickle
 import copy
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+import gzip
+import zlib
 
 
 testrun_props_bucket = 'propsbucket'
 testrun_sibs_bucket = 'sibsbucket'
 
 
+def reduce_sum(values, arg):
+    return [sum(int(value) for value in values)]
+
+
 class NotJsonSerializable(object):
     def __init__(self, *args, **kwargs):
         self.args = list(args)
@@ -45,6 +70,18 @@ class BasicKVTests(IntegrationTest, AsyncUnitTestCase):
             self.assertEqual(o.vclock, None)
         self.loop.run_until_complete(go())
 
+    def test_return_head(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            o = await bucket.new(self.key_name, "bar")
+            await o.store(return_body=False, return_head=True)
+            self.assertIsNotNone(o.vclock)
+            self.assertIsNotNone(o.siblings[0].etag)
+            self.assertEqual("bar", o.data)
+            fetched = await bucket.get(self.key_name)
+            self.assertEqual(o.vclock, fetched.vclock)
+        self.loop.run_until_complete(go())
+
     def test_is_alive(self):
         async def go():
             self.assertTrue(await self.client.is_alive())
@@ -69,6 +106,32 @@ class BasicKVTests(IntegrationTest, AsyncUnitTestCase):
             self.assertEqual(obj2.data, rand)
         self.loop.run_until_complete(go())
 
+    def test_get_if_modified_and_head(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            obj = await bucket.new(self.key_name, {'value': 1})
+            obj.usermeta = {'owner': 'me'}
+            await obj.store()
+
+            same = await bucket.get(self.key_name, if_modified=obj.vclock)
+            self.assertTrue(same.unchanged)
+
+            head = await bucket.head(self.key_name)
+            self.assertTrue(head.exists)
+            self.assertEqual(obj.vclock, head.vclock)
+            self.assertEqual({'owner': 'me'}, head.usermeta)
+            self.assertIsNotNone(head.siblings[0].last_modified)
+
+            obj.data = {'value': 2}
+            await obj.store()
+            changed = await bucket.get(self.key_name, if_modified=same.vclock)
+            self.assertFalse(changed.unchanged)
+            self.assertEqual({'value': 2}, changed.data)
+
+            missing = await bucket.head(self.randname())
+            self.assertFalse(missing.exists)
+        self.loop.run_until_complete(go())
+
     def test_store_with_links_with_explicit_tag(self):
         async def go():
             bucket = self.client.bucket(self.bucket_name)
@@ -481,6 +544,41 @@ class BasicKVTests(IntegrationTest, AsyncUnitTestCase):
             self.assertEqual(self.client.resolver, default_resolver)  # reset
         self.loop.run_until_complete(go())
 
+    def test_vclock_cache_blind_puts(self):
+        async def go():
+            client = await self.async_create_client(vclock_cache_size=10)
+            try:
+                bucket = client.bucket(testrun_sibs_bucket)
+                await bucket.set_property('allow_mult', True)
+                obj = await bucket.new(self.key_name, 'start')
+                await obj.store()
+                for value in ('one', 'two', 'three'):
+                    obj = await bucket.new(self.key_name, value)
+                    await obj.store(return_body=False, return_head=True)
+                obj = await bucket.get(self.key_name)
+                self.assertEqual(1, len(obj.siblings))
+                self.assertEqual('three', obj.data)
+            finally:
+                client.close()
+        self.loop.run_until_complete(go())
+
+    def test_backup(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            for n in range(5):
+                obj = await bucket.new('key{}'.format(n), {'n': n})
+                await obj.store(return_body=False)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, 'test.bak')
+                self.assertEqual(5, await backup.export_bucket(
+                    bucket, path, page_size=2))
+                other = self.client.bucket(self.randname())
+                self.assertEqual(5, await backup.import_bucket(
+                    other, path, batch_size=2))
+            obj = await other.get('key3')
+            self.assertEqual({'n': 3}, obj.data)
+        self.loop.run_until_complete(go())
+
     def test_resolution_default(self):
         async def go():
             # If no resolver is setup, be sure to resolve to default_resolver
@@ -553,6 +651,85 @@ class BasicKVTests(IntegrationTest, AsyncUnitTestCase):
             self.assertEqual('some metadata', obj.usermeta['custom'])
         self.loop.run_until_complete(go())
 
+    def test_store_compressed(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            bucket.set_compression('gzip', threshold=100)
+            data = {'values': list(range(1000))}
+            obj = await bucket.new(self.key_name, data)
+            await obj.store()
+            self.assertEqual('gzip', obj.content_encoding)
+            self.assertEqual(data, obj.data)
+
+            obj = await bucket.get(self.key_name)
+            self.assertEqual('gzip', obj.content_encoding)
+            self.assertEqual(data, obj.data)
+        self.loop.run_until_complete(go())
+
+    def test_store_chunked(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            data = bytes(range(256)) * 40
+            obj = await bucket.store_chunked(
+                self.key_name, encoded_data=data,
+                content_type='binary/octet-stream',
+                chunk_size=1000, threshold=2000)
+            self.assertTrue(chunked.is_manifest(obj))
+            generation = obj.data['generation']
+
+            obj = await bucket.get_chunked(self.key_name)
+            self.assertEqual(data, obj.encoded_data)
+            self.assertEqual('binary/octet-stream', obj.content_type)
+
+            stream = await bucket.stream_chunked(self.key_name, prefetch=2)
+            self.assertEqual(len(data), stream.size)
+            parts = []
+            async for part in stream:
+                parts.append(part)
+            self.assertEqual(11, len(parts))
+            self.assertEqual(data, b''.join(parts))
+
+            await bucket.store_chunked(
+                self.key_name, encoded_data=b'small',
+                content_type='binary/octet-stream', threshold=2000)
+            obj = await bucket.get(self.key_name)
+            self.assertEqual(b'small', obj.encoded_data)
+            chunk = await bucket.get(
+                chunked.chunk_key(self.key_name, 0, generation))
+            self.assertFalse(chunk.exists)
+
+            await bucket.delete_chunked(self.key_name)
+            obj = await bucket.get(self.key_name)
+            self.assertFalse(obj.exists)
+        self.loop.run_until_complete(go())
+
+    def test_overwrite_chunked_allow_mult(self):
+        async def go():
+            bucket = self.client.bucket(testrun_sibs_bucket)
+            await bucket.set_property('allow_mult', True)
+            for n in range(3):
+                data = bytes([n]) * 2500
+                await bucket.store_chunked(
+                    self.key_name, encoded_data=data,
+                    content_type='binary/octet-stream',
+                    chunk_size=1000, threshold=2000)
+                obj = await bucket.get_chunked(self.key_name)
+                self.assertEqual(data, obj.encoded_data)
+            await bucket.delete_chunked(self.key_name)
+        self.loop.run_until_complete(go())
+
+    def test_concurrent_requests(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            for i in range(10):
+                obj = await bucket.new('{}-{}'.format(self.key_name, i), i)
+                await obj.store()
+            objs = await asyncio.gather(*[
+                bucket.get('{}-{}'.format(self.key_name, i))
+                for i in range(10)], loop=self.loop)
+            self.assertEqual(list(range(10)), [obj.data for obj in objs])
+        self.loop.run_until_complete(go())
+
     def test_list_buckets(self):
         async def go():
             bucket = self.client.bucket(self.bucket_name)
@@ -695,3 +872,967 @@ class BasicKVTests(IntegrationTest, AsyncUnitTestCase):
             self.assertIn(json.dumps({'foo': 'two', 'bar': 'green'}), results)
 
         self.loop.run_until_complete(go())
+
+    def test_stream_map_reduce_batches(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            for i in range(10):
+                await (await bucket.new('foo{}'.format(i), i)).store()
+
+            mr = RiakMapReduce(self.client)
+            mr.add_bucket(self.bucket_name)
+            mr.map(['riak_kv_mapreduce', 'map_object_value'])
+
+            results = []
+            async for phase, batch in (await mr.stream(batch=True)):
+                self.assertEqual(0, phase)
+                self.assertIsInstance(batch, list)
+                results.extend(batch)
+            self.assertEqual(sorted(str(i) for i in range(10)),
+                             sorted(results))
+
+            by_phase = await self.client.mapred(
+                self.bucket_name, mr._normalize_query()[0], by_phase=True)
+            self.assertEqual([0], list(by_phase))
+            self.assertEqual(10, len(by_phase[0]))
+        self.loop.run_until_complete(go())
+
+    def test_map_reduce_local_reduce(self):
+        async def go():
+            bucket = self.client.bucket(self.bucket_name)
+            for i in range(10):
+                await (await bucket.new('foo{}'.format(i), i)).store()
+
+            mr = RiakMapReduce(self.client)
+            mr.add_bucket(self.bucket_name)
+            mr.map(['riak_kv_mapreduce', 'map_object_value'])
+            mr.local_reduce(reduce_sum, chunk_size=3)
+            self.assertEqual([45], await mr.run())
+            self.assertTrue(await self.client.ping())
+        self.loop.run_until_complete(go())
+
+
+class LocalReduceUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+        async def stream_mapred(inputs, query, timeout, batch):
+            self.query = query
+            transport = RiakPbcAsyncTransport(
+                asyncio.StreamReader(loop=self.loop), mock.Mock(),
+                loop=self.loop)
+            frames = [(1, [str(i) for i in range(j, j + 10)])
+                      for j in range(0, 100, 10)]
+            frames.insert(3, (0, ['ignored']))
+            for phase, part in frames + [(0, None)]:
+                resp = riak_kv_pb2.RpbMapRedResp(phase=phase,
+                                                 done=part is None)
+                if part is not None:
+                    resp.response = json.dumps(part).encode()
+                transport._reader.feed_data(transport._encode_message(
+                    messages.MSG_CODE_MAP_RED_RESP, resp))
+            return await transport.stream_mapred(inputs, query, timeout,
+                                                 batch)
+        self.patch(self.client, 'stream_mapred', stream_mapred)
+
+    def mapreduce(self):
+        mr = RiakMapReduce(self.client)
+        mr.add_bucket('bucket')
+        mr.map(['riak_kv_mapreduce', 'map_object_value'], {'keep': True})
+        mr.map(['riak_kv_mapreduce', 'map_object_value'])
+        return mr
+
+    def reduce(self, values, arg):
+        self.assertEqual('arg', arg)
+        self.calls.append(len(values))
+        return reduce_sum(values, arg)
+
+    def test_chunked_reduce(self):
+        executor = ThreadPoolExecutor(2)
+        self.addCleanup(executor.shutdown)
+        mr = self.mapreduce().local_reduce(
+            self.reduce, arg='arg', chunk_size=30, executor=executor,
+            concurrency=2)
+        self.assertEqual([4950], self.loop.run_until_complete(mr.run()))
+        self.assertEqual(2, len(self.query))
+        self.assertEqual([30, 30, 30, 10, 4], self.calls)
+
+    def test_process_pool(self):
+        mr = self.mapreduce().local_reduce(reduce_sum, chunk_size=25)
+        self.assertEqual([4950], self.loop.run_until_complete(mr.run()))
+
+    def test_must_be_last_phase(self):
+        mr = self.mapreduce().local_reduce(reduce_sum)
+        mr.reduce(['riak_kv_mapreduce', 'reduce_sum'])
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(mr.run())
+
+    def test_error_consumes_stream(self):
+        def failing(values, arg):
+            raise ZeroDivisionError()
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        mr = self.mapreduce().local_reduce(failing, chunk_size=10,
+                                           executor=executor, concurrency=1)
+        with self.assertRaises(ZeroDivisionError):
+            self.loop.run_until_complete(mr.run())
+
+
+class MapRedUnitTests(UnitTestCase):
+    def test_merge_lists(self):
+        result = MapRedResult()
+        for i in range(3):
+            result.add(0, [i, i])
+        self.assertEqual([0, 0, 1, 1, 2, 2], result.result())
+
+    def test_merge_dicts_first_wins(self):
+        result = MapRedResult()
+        result.add(0, {'a': 1})
+        result.add(0, {'a': 2, 'b': 2})
+        self.assertEqual({'a': 1, 'b': 2}, result.result())
+
+    def test_merge_by_phase(self):
+        result = MapRedResult(by_phase=True)
+        result.add(0, [1])
+        result.add(1, {'a': 1})
+        result.add(0, [2])
+        result.add(2, 'value')
+        self.assertEqual({0: [1, 2], 1: {'a': 1}, 2: ['value']},
+                         result.result())
+
+    def test_empty(self):
+        self.assertEqual([], MapRedResult().result())
+
+    def test_stream_batches(self):
+        self.connect()
+        transport = self.transport
+        for phase, part, done in ((0, [1, 2], False), (0, [3], False),
+                                  (1, [4], False), (0, None, True)):
+            resp = riak_kv_pb2.RpbMapRedResp(phase=phase, done=done)
+            if part is not None:
+                resp.response = json.dumps(part).encode()
+            self.reader.feed_data(transport._encode_message(
+                messages.MSG_CODE_MAP_RED_RESP, resp))
+
+        async def go():
+            stream = await transport.stream_mapred([], [], None, batch=True)
+            items = []
+            async for item in stream:
+                items.append(item)
+            return items
+        self.assertEqual([(0, [1, 2]), (0, [3]), (1, [4])],
+                         self.loop.run_until_complete(go()))
+        self.assertFalse(transport._lock.locked())
+
+    def test_stream_early_exit(self):
+        self.connect()
+        transport = self.transport
+
+        def respond():
+            for part, done in (([1, 2], False), ([3], False), (None, True)):
+                resp = riak_kv_pb2.RpbMapRedResp(phase=0, done=done)
+                if part is not None:
+                    resp.response = json.dumps(part).encode()
+                self.reader.feed_data(transport._encode_message(
+                    messages.MSG_CODE_MAP_RED_RESP, resp))
+            self.reader.feed_data(transport._encode_message(
+                messages.MSG_CODE_PING_RESP))
+
+        async def go():
+            respond()
+            async with await transport.stream_mapred([], [], None) as stream:
+                async for phase, value in stream:
+                    break
+            self.assertEqual((0, 1), (phase, value))
+            self.assertFalse(transport._lock.locked())
+            self.assertTrue(await transport.ping())
+
+            # A dropped stream is drained in the background
+            respond()
+            stream = await transport.stream_mapred([], [], None)
+            self.assertEqual((0, 1), await stream.__anext__())
+            del stream
+            self.assertTrue(await transport.ping())
+        self.loop.run_until_complete(go())
+        self.assertFalse(transport._lock.locked())
+
+
+class ResolverUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bucket = self.client.bucket('test')
+
+    def conflict(self, *values, **params):
+        obj = RiakObject(self.bucket._client, self.bucket, 'key')
+        obj.siblings = [
+            RiakContent(obj, encoded_data=value, exists=value is not None,
+                        last_modified=n, **params)
+            for n, value in enumerate(values)]
+        return obj
+
+    def test_json_merge(self):
+        obj = self.conflict(b'{"a": 1, "b": 1}', b'{"b": 2, "c": 2}',
+                            b'{"a": 3}', None)
+        obj.siblings[0].usermeta = {'timestamp': '10'}
+        obj.siblings[1].usermeta = {'timestamp': 'invalid'}
+        json_merge_resolver()(obj)
+        self.assertEqual({'timestamp': '10'}, obj.usermeta)
+        self.assertEqual({'a': 1, 'b': 1, 'c': 2}, obj.data)
+
+        obj = self.conflict(None, None)
+        json_merge_resolver()(obj)
+        self.assertFalse(obj.exists)
+
+    def test_set_union(self):
+        obj = self.conflict(b'["a", "b"]', b'["c", "a"]', b'["c", "a"]')
+        decoder = mock.Mock(side_effect=json.loads)
+        self.bucket.set_decoder('application/json', decoder)
+        set_union_resolver(obj)
+        self.assertEqual(2, decoder.call_count)
+        self.assertEqual(['c', 'a', 'b'], obj.data)
+
+    def test_numbers(self):
+        obj = self.conflict(b'3', b'12', b'1.5', None)
+        max_resolver(obj)
+        self.assertEqual(b'12', obj.encoded_data)
+
+        obj = self.conflict(b'3', b'12', b'1.5', None)
+        sum_resolver(obj)
+        self.assertEqual(b'16.5', obj.encoded_data)
+        self.assertEqual(2, obj.siblings[0].last_modified)
+
+        obj = self.conflict(b'3', gzip.compress(b'4'))
+        obj.siblings[1].content_encoding = 'gzip'
+        sum_resolver(obj)
+        self.assertEqual(7, obj.data)
+
+    def test_content_type(self):
+        resolver = content_type_resolver({'text/plain': sum_resolver})
+        obj = self.conflict(b'1', b'2', content_type='text/plain')
+        resolver(obj)
+        self.assertEqual(b'3', obj.encoded_data)
+
+        obj = self.conflict(b'1', b'2')
+        obj.siblings[0].content_type = 'text/plain'
+        resolver(obj)
+        self.assertEqual(2, obj.data)
+
+    def test_content_type_offload(self):
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        resolver = content_type_resolver(
+            {'text/plain': offload_resolver(sum_resolver, executor)})
+        obj = self.conflict(b'1', b'2', content_type='text/plain')
+        self.loop.run_until_complete(resolver(obj))
+        self.assertEqual(b'3', obj.encoded_data)
+
+    def test_offload_rejects_process_pool(self):
+        executor = ProcessPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        with self.assertRaises(TypeError):
+            offload_resolver(sum_resolver, executor)
+
+
+class BackupUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connect()
+        self.bucket = self.client.bucket('test')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, 'test.bak')
+
+    def respond(self, code, resp):
+        self.reader.feed_data(self.transport._encode_message(code, resp))
+
+    def sent_puts(self):
+        puts = []
+        for call in self.writer.write.call_args_list:
+            data = call[0][0]
+            if data[4] == messages.MSG_CODE_PUT_REQ:
+                req = riak_kv_pb2.RpbPutReq()
+                req.ParseFromString(data[5:])
+                puts.append(req)
+        return puts
+
+    def export(self):
+        self.respond(messages.MSG_CODE_INDEX_RESP, riak_kv_pb2.RpbIndexResp(
+            keys=[b'a', b'b', b'c', b'd'], continuation=b'next'))
+        resp = riak_kv_pb2.RpbGetResp(vclock=b'vclock-a')
+        resp.content.add(value=b'1', content_type=b'application/json')
+        resp.content.add(value=b'2', content_type=b'application/json')
+        self.respond(messages.MSG_CODE_GET_RESP, resp)
+        resp = riak_kv_pb2.RpbGetResp(vclock=b'vclock-b')
+        resp.content.add(value=b'', deleted=True)
+        self.respond(messages.MSG_CODE_GET_RESP, resp)
+        self.respond(messages.MSG_CODE_GET_RESP, riak_kv_pb2.RpbGetResp())
+        resp = riak_kv_pb2.RpbGetResp(vclock=b'vclock-d')
+        resp.content.add(value=b'"d"', content_type=b'application/json')
+        self.respond(messages.MSG_CODE_GET_RESP, resp)
+        self.respond(messages.MSG_CODE_INDEX_RESP, riak_kv_pb2.RpbIndexResp())
+        return self.loop.run_until_complete(backup.export_bucket(
+            self.bucket, self.path, concurrency=2, page_size=4))
+
+    def test_export(self):
+        self.assertEqual(2, self.export())
+        with backup.BackupReader(self.path) as reader:
+            self.assertEqual(3, len(reader))
+            self.assertEqual([b'a', b'd'], sorted(reader.keys()))
+            records = reader.get(b'a')
+            self.assertEqual([b'1', b'2'],
+                             [req.content.value for req in records])
+            self.assertEqual(b'vclock-a', records[0].vclock)
+            self.assertEqual([], reader.get(b'b'))
+            self.assertEqual([b'a', b'a', b'd'],
+                             [req.key for req in reader])
+
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(ValueError):
+            backup.BackupReader(self.path)
+
+    def test_long_key(self):
+        key = b'k' * 70000
+        content = riak_kv_pb2.RpbContent(value=b'value')
+        with backup.BackupWriter(self.path) as writer:
+            writer.write(key, b'vclock', content)
+        with backup.BackupReader(self.path) as reader:
+            self.assertEqual([key], reader.keys())
+            self.assertEqual(b'value', reader.get(key)[0].content.value)
+
+    def test_import(self):
+        self.export()
+        self.writer.reset_mock()
+        other = self.client.bucket('other', 'typed')
+        for _ in range(3):
+            self.respond(messages.MSG_CODE_PUT_RESP, riak_kv_pb2.RpbPutResp())
+        self.assertEqual(3, self.loop.run_until_complete(
+            backup.import_bucket(other, self.path, batch_size=2)))
+        puts = self.sent_puts()
+        self.assertEqual([b'a', b'a', b'd'], [req.key for req in puts])
+        self.assertEqual(b'vclock-a', puts[1].vclock)
+        self.assertEqual(b'"d"', puts[2].content.value)
+        self.assertEqual({(b'typed', b'other')},
+                         set((req.type, req.bucket) for req in puts))
+
+        self.writer.reset_mock()
+        self.respond(messages.MSG_CODE_ERROR_RESP,
+                     riak_pb2.RpbErrorResp(errmsg=b'failed', errcode=1))
+        self.respond(messages.MSG_CODE_PUT_RESP, riak_kv_pb2.RpbPutResp())
+        self.respond(messages.MSG_CODE_PUT_RESP, riak_kv_pb2.RpbPutResp())
+        with self.assertRaises(RiakError):
+            self.loop.run_until_complete(backup.import_bucket(
+                other, self.path, batch_size=2, vclocks=False))
+        puts = self.sent_puts()
+        self.assertEqual(3, len(puts))
+        self.assertFalse(puts[2].HasField('vclock'))
+
+
+class RiakObjectUnitTests(unittest.TestCase):
+    bucket = Bucket(None, 'test', BucketType(None, 'default'))
+
+    def test_no_instance_dict(self):
+        obj = RiakObject(None, self.bucket, 'key')
+        self.assertFalse(hasattr(obj, '__dict__'))
+        self.assertFalse(hasattr(obj.siblings[0], '__dict__'))
+
+    def test_metadata_allocated_on_access(self):
+        content = RiakContent(None)
+        self.assertIsNone(content._usermeta)
+        self.assertIsNone(content._links)
+        self.assertIsNone(content._indexes)
+        content.usermeta['custom'] = 'value'
+        content.links.append(('bucket', 'key', None))
+        content.indexes.add(('field_bin', 'value'))
+        self.assertEqual({'custom': 'value'}, content.usermeta)
+        self.assertEqual([('bucket', 'key', None)], content.links)
+        self.assertEqual({('field_bin', 'value')}, content.indexes)
+        self.assertEqual([], RiakContent(None).links)
+
+        usermeta = {}
+        self.assertIs(usermeta, RiakContent(None, usermeta=usermeta).usermeta)
+
+    def test_metadata_not_allocated_on_store(self):
+        obj = RiakObject(None, self.bucket, 'key')
+        obj.encoded_data = b'{"value": 1}'
+        RiakPbcAsyncTransport(None, None)._encode_content(
+            obj, riak_kv_pb2.RpbContent())
+        self.assertIsNone(obj.siblings[0]._usermeta)
+        self.assertIsNone(obj.siblings[0]._links)
+        self.assertIsNone(obj.siblings[0]._indexes)
+
+    def test_siblings_are_not_shared(self):
+        obj1 = RiakObject(None, self.bucket, 'key1')
+        obj2 = RiakObject(None, self.bucket, 'key2')
+        obj1.clear()
+        self.assertEqual([], obj1.siblings)
+        self.assertEqual(1, len(obj2.siblings))
+
+
+class ObjectRequestUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connect()
+        self.bucket = self.client.bucket('test')
+        self.bucket.bucket_type._datatype = None
+
+    def respond(self, resp, code=messages.MSG_CODE_GET_RESP):
+        self.reader.feed_data(self.transport._encode_message(code, resp))
+
+    def sent(self, pbclass=riak_kv_pb2.RpbGetReq):
+        req = pbclass()
+        req.ParseFromString(self.writer.write.call_args[0][0][5:])
+        return req
+
+    def test_if_modified_unchanged(self):
+        self.respond(riak_kv_pb2.RpbGetResp(unchanged=True))
+        obj = self.loop.run_until_complete(
+            self.bucket.get('key', if_modified=b'vclock'))
+        self.assertTrue(obj.unchanged)
+        self.assertEqual(b'vclock', obj.vclock.encode('binary'))
+        self.assertEqual(b'vclock', self.sent().if_modified)
+        self.assertFalse(self.sent().head)
+
+    def test_if_modified_changed(self):
+        resp = riak_kv_pb2.RpbGetResp(vclock=b'newer')
+        resp.content.add(value=b'{"a": 1}', content_type=b'application/json')
+        self.respond(resp)
+        obj = self.loop.run_until_complete(
+            self.bucket.get('key', if_modified=b'vclock'))
+        self.assertFalse(obj.unchanged)
+        self.assertEqual(b'newer', obj.vclock.encode('binary'))
+        self.assertEqual({'a': 1}, obj.data)
+
+    def test_head(self):
+        resp = riak_kv_pb2.RpbGetResp(vclock=b'vclock')
+        for vtag in (b'one', b'two'):
+            content = resp.content.add(value=b'', vtag=vtag,
+                                       content_type=b'application/json',
+                                       last_mod=1000)
+            content.usermeta.add(key=b'owner', value=vtag)
+        self.respond(resp)
+        resolver = mock.Mock()
+        self.bucket.resolver = resolver
+        obj = self.loop.run_until_complete(self.bucket.head('key'))
+        self.assertTrue(self.sent().head)
+        self.assertTrue(obj.head_only)
+        self.assertFalse(resolver.called)
+        self.assertEqual(['one', 'two'],
+                         [sibling.etag for sibling in obj.siblings])
+        self.assertEqual([{'owner': 'one'}, {'owner': 'two'}],
+                         [sibling.usermeta for sibling in obj.siblings])
+        self.assertEqual(1000.0, obj.siblings[0].last_modified)
+        self.assertIsNone(obj.siblings[0]._encoded_data)
+
+        obj.siblings = obj.siblings[:1]
+        with self.assertRaises(RiakError):
+            self.loop.run_until_complete(obj.store())
+
+    def test_put_return_head(self):
+        resp = riak_kv_pb2.RpbPutResp(vclock=b'vclock')
+        resp.content.add(value=b'', vtag=b'tag', last_mod=1000,
+                         content_type=b'application/json')
+        self.respond(resp, messages.MSG_CODE_PUT_RESP)
+        obj = RiakObject(self.client, self.bucket, 'key')
+        obj.data = {'a': 1}
+        self.loop.run_until_complete(
+            obj.store(return_body=False, return_head=True))
+        req = self.sent(riak_kv_pb2.RpbPutReq)
+        self.assertTrue(req.return_head)
+        self.assertFalse(req.return_body)
+        self.assertEqual(b'vclock', obj.vclock.encode('binary'))
+        self.assertEqual('tag', obj.siblings[0].etag)
+        self.assertEqual(1000.0, obj.siblings[0].last_modified)
+        self.assertFalse(obj.head_only)
+        self.assertEqual({'a': 1}, obj.data)
+
+    def test_put_return_head_siblings(self):
+        resp = riak_kv_pb2.RpbPutResp(vclock=b'vclock')
+        for vtag in (b'one', b'two'):
+            resp.content.add(value=b'', vtag=vtag)
+        self.respond(resp, messages.MSG_CODE_PUT_RESP)
+        obj = RiakObject(self.client, self.bucket, 'key')
+        obj.data = {'a': 1}
+        self.loop.run_until_complete(
+            obj.store(return_body=False, return_head=True))
+        self.assertTrue(obj.head_only)
+        self.assertEqual(['one', 'two'],
+                         [sibling.etag for sibling in obj.siblings])
+
+    def test_vclock_cache(self):
+        self.client._vclocks = VClockCache(10)
+        resp = riak_kv_pb2.RpbGetResp(vclock=b'fetched')
+        resp.content.add(value=b'1')
+        self.respond(resp)
+        self.respond(riak_kv_pb2.RpbPutResp(vclock=b'stored'),
+                     messages.MSG_CODE_PUT_RESP)
+        self.respond(riak_kv_pb2.RpbPutResp(), messages.MSG_CODE_PUT_RESP)
+
+        async def go():
+            await self.bucket.get('key')
+            obj = await self.bucket.new('key', 2)
+            self.assertEqual(b'fetched', obj.vclock.encode('binary'))
+            await obj.store(return_body=False, return_head=True)
+            self.assertEqual(b'fetched', self.sent(
+                riak_kv_pb2.RpbPutReq).vclock)
+
+            obj = await self.bucket.new('key', 3)
+            self.assertEqual(b'stored', obj.vclock.encode('binary'))
+            await obj.store(return_body=False)
+            # The vclock sent is outdated after a blind store
+            self.assertIsNone((await self.bucket.new('key')).vclock)
+            self.assertIsNone((await self.bucket.new('other')).vclock)
+        self.loop.run_until_complete(go())
+
+    def test_sibling_stats(self):
+        stats = SiblingStats(warn_count=2, max_count=3)
+        self.client._transport._sibling_stats = stats
+        for count in (1, 2, 4):
+            resp = riak_kv_pb2.RpbGetResp(vclock=b'vclock')
+            for n in range(count):
+                resp.content.add(value=b'x' * 100, last_mod=n)
+            self.respond(resp)
+        self.bucket.resolver = last_written_resolver
+
+        async def go():
+            await self.bucket.get('one')
+            with self.assertLogs('aioriak.siblings', 'WARNING'):
+                await self.bucket.get('two')
+            with self.assertRaises(SiblingExplosionError) as cm:
+                await self.bucket.get('four')
+            return cm.exception
+        exc = self.loop.run_until_complete(go())
+        self.assertEqual(('four', 4, 400), (exc.key, exc.count, exc.size))
+        histogram = stats.histograms['default', 'test']
+        self.assertEqual({1: 1, 2: 1, 4: 1}, histogram.counts)
+        self.assertEqual({128: 1, 256: 1, 512: 1}, histogram.sizes)
+        self.assertEqual((4, 400),
+                         (histogram.max_count, histogram.max_size))
+
+    def test_sibling_stats_head(self):
+        stats = SiblingStats(warn_size=1, max_count=2)
+        self.client._transport._sibling_stats = stats
+        for count in (2, 3):
+            resp = riak_kv_pb2.RpbGetResp(vclock=b'vclock')
+            for n in range(count):
+                resp.content.add(value=b'', last_mod=n)
+            self.respond(resp)
+
+        async def go():
+            await self.bucket.head('two')
+            with self.assertRaisesRegex(SiblingExplosionError,
+                                        '3 siblings for key'):
+                await self.bucket.head('three')
+        self.loop.run_until_complete(go())
+        histogram = stats.histograms['default', 'test']
+        self.assertEqual({2: 1, 3: 1}, histogram.counts)
+        self.assertEqual({}, histogram.sizes)
+        self.assertEqual((3, 0), (histogram.max_count, histogram.max_size))
+
+    def test_async_resolver(self):
+        for code, resp in ((messages.MSG_CODE_GET_RESP,
+                            riak_kv_pb2.RpbGetResp(vclock=b'vclock')),
+                           (messages.MSG_CODE_PUT_RESP,
+                            riak_kv_pb2.RpbPutResp(vclock=b'vclock'))):
+            for n in range(2):
+                resp.content.add(value=str(n).encode(), last_mod=n)
+            self.respond(resp, code)
+        transport = self.client._transport
+
+        async def resolver(obj):
+            # Other requests can be served while resolving
+            self.assertFalse(transport._lock.locked())
+            await asyncio.sleep(0, loop=self.loop)
+            last_written_resolver(obj)
+        self.bucket.resolver = resolver
+
+        async def go():
+            obj = await self.bucket.get('key')
+            self.assertEqual(1, obj.data)
+            with ThreadPoolExecutor(1) as executor:
+                obj.resolver = offload_resolver(sum_resolver, executor)
+                obj.data = 2
+                await obj.store()
+            self.assertEqual(b'1', obj.encoded_data)
+        self.loop.run_until_complete(go())
+
+    def test_datatype_if_modified(self):
+        self.bucket.bucket_type._datatype = 'counter'
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(
+                self.bucket.get('key', if_modified=b'vclock'))
+
+
+class VClockCacheUnitTests(unittest.TestCase):
+    def test_lru(self):
+        bucket = Bucket(None, 'test', BucketType(None, 'default'))
+        other = Bucket(None, 'test', BucketType(None, 'other'))
+        cache = VClockCache(2)
+        cache.set(bucket, 'a', 1)
+        cache.set(other, 'a', 2)
+        self.assertEqual(1, cache.get(bucket, 'a'))
+        cache.set(bucket, 'b', 3)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get(other, 'a'))
+        self.assertEqual(1, cache.get(bucket, 'a'))
+        cache.set(bucket, 'a', None)
+        self.assertIsNone(cache.get(bucket, 'a'))
+        cache.discard(bucket, 'b')
+        self.assertEqual(0, len(cache))
+        with self.assertRaises(ValueError):
+            VClockCache(0)
+
+
+class FakeSweepClient:
+    resolver = staticmethod(default_resolver)
+    _loop = None
+
+    def __init__(self, loop, objects):
+        self._loop = loop
+        self.objects = objects
+        self.stored = []
+        self.deleted = []
+
+    async def get_index(self, bucket, index, startkey, endkey, return_terms,
+                        max_results, continuation, timeout, term_regex):
+        keys = sorted(self.objects)
+        start = int(continuation or 0)
+        end = start + max_results
+        return keys[start:end], str(end) if end < len(keys) else None
+
+    async def get(self, robj, **params):
+        await asyncio.sleep(0, loop=self._loop)
+        values = self.objects[robj.key]
+        if isinstance(values, Exception):
+            raise values
+        robj.vclock = robj.key
+        robj.siblings = [RiakContent(robj, encoded_data=value,
+                                     exists=value is not None,
+                                     last_modified=n)
+                         for n, value in enumerate(values)]
+        if len(robj.siblings) > 1:
+            robj.resolver(robj)
+        return robj
+
+    async def put(self, robj, **params):
+        self.stored.append((robj.key, robj.vclock, robj.encoded_data))
+
+    async def delete(self, robj):
+        self.deleted.append((robj.key, robj.vclock))
+
+
+class SweeperUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = FakeSweepClient(self.loop, {
+            'a': [b'1'],
+            'b': [b'1', b'2'],
+            'c': [b'1', b'2', b'3'],
+            'd': [b'1', None],
+            'e': [b'1', b'2', None],
+            'f': RuntimeError('timeout'),
+        })
+        self.bucket = Bucket(self.client, 'test',
+                             BucketType(self.client, 'default'))
+
+    def test_sweep(self):
+        report = self.loop.run_until_complete(sweeper.sweep(
+            self.bucket, resolver=last_written_resolver, concurrency=2,
+            page_size=4))
+        self.assertEqual({1: 1, 2: 2, 3: 2}, dict(report.histogram))
+        self.assertEqual(4, report.resolved)
+        self.assertEqual(0, report.unresolved)
+        self.assertEqual(1, report.errors)
+        self.assertEqual([('b', 'b', b'2'), ('c', 'c', b'3')],
+                         sorted(self.client.stored))
+        self.assertEqual([('d', 'd'), ('e', 'e')],
+                         sorted(self.client.deleted))
+        self.assertIn('swept 5, resolved 4', report.format())
+
+    def test_dry_run_with_default_resolver(self):
+        report = self.loop.run_until_complete(sweeper.sweep(
+            self.bucket, keys=['a', 'b', 'c'], dry_run=True))
+        self.assertEqual({1: 1, 2: 1, 3: 1}, dict(report.histogram))
+        self.assertEqual(0, report.resolved)
+        self.assertEqual(2, report.unresolved)
+        self.assertEqual([], self.client.stored)
+
+    def test_rate_limit(self):
+        with mock.patch('asyncio.sleep', wraps=asyncio.sleep) as sleep:
+            report = self.loop.run_until_complete(sweeper.sweep(
+                self.bucket, keys=['a', 'b', 'c'], rate=1000))
+        self.assertEqual(3, report.swept)
+        self.assertTrue(any(call[0][0] > 0 for call in sleep.call_args_list))
+
+    def run_main(self, *argv):
+        calls = []
+
+        async def create(*args, **kwargs):
+            return self.client
+
+        async def sweep(bucket, *args, **kwargs):
+            calls.append(kwargs)
+            return sweeper.SweepReport()
+        self.client.bucket = mock.Mock()
+        self.client.close = mock.Mock()
+        self.patch(RiakClient, 'create', create)
+        self.patch(sweeper, 'sweep', sweep)
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+        with mock.patch('builtins.print'):
+            self.assertEqual(0, sweeper.main(list(argv)))
+        return calls[0]
+
+    def test_main_without_resolver_is_dry_run(self):
+        options = self.run_main('test')
+        self.assertIsNone(options['resolver'])
+        self.assertTrue(options['dry_run'])
+
+    def test_main_with_resolver(self):
+        options = self.run_main(
+            '--resolver', 'aioriak.resolver.last_written_resolver', 'test')
+        self.assertIs(last_written_resolver, options['resolver'])
+        self.assertFalse(options['dry_run'])
+
+
+class CodecUnitTests(unittest.TestCase):
+    def test_json_codecs_roundtrip(self):
+        value = {'name': 'Ñandú', 'values': [1, 2.5, None, True]}
+        for name in codecs.JSON_CODECS:
+            encoder, decoder = codecs.get_json_codec(name)
+            encoded = encoder(value)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(value, decoder(encoded))
+            self.assertEqual(value, decoder(memoryview(encoded)))
+
+    def test_json_codecs_exact_values(self):
+        value = {'big': 2 ** 70, 'max': 2 ** 64, 'min': -2 ** 63 - 1,
+                 'id': '12345678901234567890', 'float': 1.5}
+        special = [float('inf'), float('-inf')]
+        for name in codecs.JSON_CODECS:
+            encoder, decoder = codecs.get_json_codec(name)
+            self.assertEqual(value, decoder(encoder(value)))
+            self.assertEqual(special, decoder(encoder(special)))
+            nan, = decoder(encoder([float('nan')]))
+            self.assertNotEqual(nan, nan)
+            self.assertEqual([None], decoder(encoder([None])))
+
+    def test_json_encoder_accepts_bytes(self):
+        self.assertEqual(b'"foo"', codecs.json_encoder(b'foo'))
+
+    def test_unknown_json_codec(self):
+        with self.assertRaises(ValueError):
+            codecs.get_json_codec('nope')
+
+    def test_bucket_type_codec_fallback(self):
+        btype = BucketType(None, 'mytype')
+        bucket = Bucket(None, 'test', btype)
+        btype.set_encoder('application/x-test', str.encode)
+        self.assertIs(str.encode, bucket.get_encoder('application/x-test'))
+        bucket.set_encoder('application/x-test', repr)
+        self.assertIs(repr, bucket.get_encoder('application/x-test'))
+
+
+class CompressionUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.client = RiakClient()
+        self.bucket = Bucket(self.client, 'test',
+                             BucketType(self.client, 'default'))
+        self.bucket.set_compression('gzip', threshold=100)
+
+    def test_compress_above_threshold(self):
+        obj = RiakObject(None, self.bucket, 'key')
+        data = {'values': list(range(100))}
+        obj.data = data
+        encoded = obj.encoded_data
+        self.assertEqual('gzip', obj.content_encoding)
+        self.assertEqual(data, json.loads(gzip.decompress(encoded).decode()))
+        self.assertEqual(data, obj.data)
+
+    def test_small_values_not_compressed(self):
+        obj = RiakObject(None, self.bucket, 'key')
+        obj.content_encoding = 'gzip'
+        obj.data = {'value': 1}
+        self.assertEqual(b'{"value":1}', obj.encoded_data.replace(b' ', b''))
+        self.assertIsNone(obj.content_encoding)
+
+    def test_decompress_on_read(self):
+        obj = RiakObject(None, self.client.bucket('other'), 'key')
+        obj.content_encoding = 'deflate'
+        obj.encoded_data = zlib.compress(b'[1, 2, 3]')
+        self.assertEqual([1, 2, 3], obj.data)
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            self.bucket.set_compression('rot13')
+
+    def test_opt_out(self):
+        self.client.set_compression('gzip', threshold=10)
+        btype = self.client.bucket_type('other')
+        bucket = btype.bucket('test')
+        self.assertEqual(('gzip', 10), bucket.get_compression())
+        btype.set_compression(None)
+        self.assertIsNone(bucket.get_compression())
+        bucket.set_compression('deflate')
+        self.assertEqual('deflate', bucket.get_compression()[0])
+
+        self.bucket.bucket_type.set_compression('gzip', threshold=10)
+        self.bucket.set_compression(None)
+        self.assertIsNone(self.bucket.get_compression())
+        obj = RiakObject(None, self.bucket, 'key')
+        obj.data = {'values': list(range(100))}
+        encoded = obj.encoded_data
+        self.assertIsNone(obj.content_encoding)
+        self.assertEqual(list(range(100)),
+                         json.loads(encoded.decode())['values'])
+
+
+class FakeKVClient(RiakClient):
+    '''
+    Stores objects in memory like an allow_mult bucket: a write without
+    the current vclock adds a sibling.
+    '''
+    def __init__(self, loop):
+        super().__init__(loop=loop)
+        self.objects = {}
+        self.log = []
+
+    async def get(self, robj, **params):
+        await asyncio.sleep(0, loop=self._loop)
+        vclock, siblings = self.objects.get(robj.key, (None, []))
+        robj.vclock = vclock
+        robj.siblings = [RiakContent(robj, encoded_data=value,
+                                     content_type=content_type,
+                                     usermeta=dict(usermeta), exists=True)
+                         for value, content_type, usermeta in siblings]
+        return robj
+
+    async def put(self, robj, **params):
+        await asyncio.sleep(0, loop=self._loop)
+        self.log.append(('put', robj.key))
+        vclock, siblings = self.objects.get(robj.key, (0, []))
+        sibling = robj.siblings[0]
+        value = (sibling.encoded_data, sibling.content_type,
+                 dict(sibling.usermeta))
+        if robj.vclock == vclock or not siblings:
+            siblings = [value]
+        else:
+            siblings = siblings + [value]
+        robj.vclock = vclock + 1
+        self.objects[robj.key] = (robj.vclock, siblings)
+        return robj
+
+    async def delete(self, robj):
+        self.log.append(('delete', robj.key))
+        self.objects.pop(robj.key, None)
+
+
+class ChunkedUnitTests(UnitTestCase):
+    client_class = FakeKVClient
+
+    def setUp(self):
+        super().setUp()
+        self.bucket = self.client.bucket('test')
+
+    def store(self, data):
+        return self.loop.run_until_complete(self.bucket.store_chunked(
+            'key', encoded_data=data, content_type='binary/octet-stream',
+            chunk_size=1000, threshold=2000))
+
+    def test_overwrite(self):
+        first = self.store(b'a' * 2500).data['generation']
+        self.client.log = []
+        second = self.store(b'b' * 2500).data['generation']
+        self.assertNotEqual(first, second)
+
+        obj = self.loop.run_until_complete(self.bucket.get_chunked('key'))
+        self.assertEqual(b'b' * 2500, obj.encoded_data)
+        for vclock, siblings in self.client.objects.values():
+            self.assertEqual(1, len(siblings))
+        old_chunks = [chunked.chunk_key('key', n, first) for n in range(3)]
+        for key in old_chunks:
+            self.assertNotIn(key, self.client.objects)
+
+        # The old chunks are only deleted once the new manifest is stored,
+        # and chunks are never overwritten
+        log = self.client.log
+        manifest = log.index(('put', 'key'))
+        self.assertEqual(set(('delete', key) for key in old_chunks),
+                         set(log[manifest + 1:]))
+        self.assertFalse(set(('put', key) for key in old_chunks) & set(log))
+
+        self.store(b'small')
+        self.assertEqual(['key'], list(self.client.objects))
+
+    def test_legacy_manifest(self):
+        manifest = {'chunks': 1, 'chunk_size': 1000, 'size': 3,
+                    'content_type': 'binary/octet-stream',
+                    'content_encoding': None, 'charset': None}
+        self.client.objects['key'] = (1, [(
+            json.dumps(manifest).encode(), 'application/json',
+            {chunked.MANIFEST_USERMETA: '1'})])
+        self.client.objects['key/chunk-000000'] = (1, [
+            (b'old', 'binary/octet-stream', {})])
+        obj = self.loop.run_until_complete(self.bucket.get_chunked('key'))
+        self.assertEqual(b'old', obj.encoded_data)
+        self.loop.run_until_complete(self.bucket.delete_chunked('key'))
+        self.assertEqual({}, self.client.objects)
+
+
+class OffloadUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = ThreadPoolExecutor(1)
+        self.addCleanup(self.executor.shutdown)
+        self.bucket = self.client.bucket('test')
+        self.bucket.set_offload(100, self.executor)
+
+    def test_load_data_offloaded(self):
+        async def go():
+            obj = RiakObject(self.client, self.bucket, 'key')
+            obj.encoded_data = json.dumps(list(range(100))).encode()
+            with mock.patch.object(self.executor, 'submit',
+                                   wraps=self.executor.submit) as submit:
+                self.assertEqual(list(range(100)), await obj.load_data())
+                self.assertTrue(submit.called)
+
+            obj.data = list(range(100))
+            self.assertEqual(list(range(100)),
+                             json.loads((await obj.dump_data()).decode()))
+        self.loop.run_until_complete(go())
+
+    def test_small_values_inline(self):
+        async def go():
+            obj = RiakObject(self.client, self.bucket, 'key')
+            obj.encoded_data = b'[1, 2]'
+            with mock.patch.object(self.executor, 'submit',
+                                   wraps=self.executor.submit) as submit:
+                self.assertEqual([1, 2], await obj.load_data())
+                self.assertFalse(submit.called)
+        self.loop.run_until_complete(go())
+
+    def test_dump_data_follows_known_size(self):
+        async def dump_offloaded(obj):
+            with mock.patch.object(self.executor, 'submit',
+                                   wraps=self.executor.submit) as submit:
+                await obj.dump_data()
+            return submit.called
+
+        async def go():
+            # New values have no known size
+            obj = RiakObject(self.client, self.bucket, 'key')
+            obj.data = {'values': list(range(100))}
+            self.assertFalse(await dump_offloaded(obj))
+
+            # The decoded size of a large value is kept while it is
+            # modified in place
+            obj.encoded_data = json.dumps(list(range(100))).encode()
+            (await obj.load_data()).append(100)
+            self.assertTrue(await dump_offloaded(obj))
+
+            # and dropped when another value is assigned
+            await obj.load_data()
+            obj.data = [1, 2]
+            self.assertFalse(await dump_offloaded(obj))
+        self.loop.run_until_complete(go())
@@ -0,0 +1,203 @@
+import asyncio
+from aioriak.tests.base import (
+    IntegrationTest, AsyncUnitTestCase, UnitTestCase)
+from aioriak.error import RiakError
+from aioriak.search import SearchPages
+from riak.pb import riak_pb2, riak_search_pb2, riak_yokozuna_pb2, messages
+
+
+class SearchUnitTests(UnitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connect()
+
+    def respond(self, code, resp=None):
+        self.reader.feed_data(self.transport._encode_message(code, resp))
+
+    def sent(self, pbclass):
+        req = pbclass()
+        req.ParseFromString(self.writer.write.call_args[0][0][5:])
+        return req
+
+    def test_search(self):
+        resp = riak_search_pb2.RpbSearchQueryResp(num_found=3, max_score=1.5)
+        for name, tags in (('lion', ['big', 'cat']), ('puma', ['cat'])):
+            doc = resp.docs.add()
+            doc.fields.add(key=b'name_s', value=name.encode())
+            for tag in tags:
+                doc.fields.add(key=b'tags_ss', value=tag.encode())
+        self.respond(messages.MSG_CODE_SEARCH_QUERY_RESP, resp)
+
+        result = self.loop.run_until_complete(self.transport.search(
+            'animals', 'name_s:*', rows=2, start=0, sort='name_s asc',
+            fl=['name_s', 'tags_ss'], filter=None, presort='key'))
+
+        self.assertEqual(3, result['num_found'])
+        self.assertEqual(1.5, result['max_score'])
+        self.assertEqual([{'name_s': 'lion', 'tags_ss': ['big', 'cat']},
+                          {'name_s': 'puma', 'tags_ss': 'cat'}],
+                         result['docs'])
+        req = self.sent(riak_search_pb2.RpbSearchQueryReq)
+        self.assertEqual(b'animals', req.index)
+        self.assertEqual(b'name_s:*', req.q)
+        self.assertEqual(2, req.rows)
+        self.assertEqual(0, req.start)
+        self.assertEqual(b'name_s asc', req.sort)
+        self.assertEqual([b'name_s', b'tags_ss'], list(req.fl))
+        self.assertEqual(b'key', req.presort)
+        self.assertFalse(req.HasField('filter'))
+
+    def test_search_index_admin(self):
+        resp = riak_yokozuna_pb2.RpbYokozunaIndexGetResp()
+        resp.index.add(name=b'animals', schema=b'_yz_default', n_val=3)
+        resp.index.add(name=b'plants')
+        self.respond(messages.MSG_CODE_YOKOZUNA_INDEX_GET_RESP, resp)
+        self.assertEqual(
+            [{'name': 'animals', 'schema': '_yz_default', 'n_val': 3},
+             {'name': 'plants'}],
+            self.loop.run_until_complete(
+                self.transport.list_search_indexes()))
+        self.assertFalse(
+            self.sent(riak_yokozuna_pb2.RpbYokozunaIndexGetReq).HasField(
+                'name'))
+
+        self.respond(messages.MSG_CODE_PUT_RESP)
+        self.assertTrue(self.loop.run_until_complete(
+            self.transport.create_search_index('animals', n_val=1,
+                                               timeout=1000)))
+        req = self.sent(riak_yokozuna_pb2.RpbYokozunaIndexPutReq)
+        self.assertEqual(b'animals', req.index.name)
+        self.assertEqual(1, req.index.n_val)
+        self.assertEqual(1000, req.timeout)
+        self.assertFalse(req.index.HasField('schema'))
+
+        self.respond(messages.MSG_CODE_ERROR_RESP,
+                     riak_pb2.RpbErrorResp(errmsg=b'notfound', errcode=0))
+        with self.assertRaises(RiakError):
+            self.loop.run_until_complete(
+                self.transport.get_search_index('missing'))
+
+        self.respond(messages.MSG_CODE_DEL_RESP)
+        self.assertTrue(self.loop.run_until_complete(
+            self.transport.delete_search_index('animals')))
+
+    def test_search_schema_admin(self):
+        self.respond(messages.MSG_CODE_PUT_RESP)
+        self.loop.run_until_complete(
+            self.transport.create_search_schema('tiny', '<schema/>'))
+        req = self.sent(riak_yokozuna_pb2.RpbYokozunaSchemaPutReq)
+        self.assertEqual(b'tiny', req.schema.name)
+        self.assertEqual(b'<schema/>', req.schema.content)
+
+        resp = riak_yokozuna_pb2.RpbYokozunaSchemaGetResp(
+            schema=riak_yokozuna_pb2.RpbYokozunaSchema(
+                name=b'tiny', content=b'<schema/>'))
+        self.respond(messages.MSG_CODE_YOKOZUNA_SCHEMA_GET_RESP, resp)
+        self.assertEqual({'name': 'tiny', 'content': '<schema/>'},
+                         self.loop.run_until_complete(
+                             self.transport.get_search_schema('tiny')))
+
+
+class FakeSearchClient:
+    def __init__(self, loop, total):
+        self._loop = loop
+        self.total = total
+        self.starts = []
+
+    async def fulltext_search(self, index, query, rows, start, **params):
+        self.starts.append(start)
+        await asyncio.sleep(0, loop=self._loop)
+        return {'num_found': self.total,
+                'docs': [{'n': n}
+                         for n in range(start, min(start + rows,
+                                                   self.total))]}
+
+
+class SearchPagesUnitTests(UnitTestCase):
+    def collect(self, pages):
+        async def go():
+            result = []
+            async for item in pages:
+                result.append(item)
+            return result
+        return self.loop.run_until_complete(go())
+
+    def test_pages_through_results(self):
+        client = FakeSearchClient(self.loop, 25)
+        pages = SearchPages(client, 'idx', '*:*', rows=10, prefetch=2)
+        self.assertEqual([{'n': n} for n in range(25)], self.collect(pages))
+        self.assertEqual([0, 10, 20], client.starts)
+        self.assertEqual(25, pages.num_found)
+
+    def test_batch(self):
+        client = FakeSearchClient(self.loop, 20)
+        pages = SearchPages(client, 'idx', '*:*', rows=10, start=5,
+                            batch=True)
+        self.assertEqual([10, 5], [len(page) for page in self.collect(pages)])
+        self.assertEqual([5, 15], client.starts)
+
+    def test_no_results(self):
+        client = FakeSearchClient(self.loop, 0)
+        pages = SearchPages(client, 'idx', '*:*')
+        self.assertEqual([], self.collect(pages))
+        self.assertEqual([0], client.starts)
+
+    def test_close(self):
+        client = FakeSearchClient(self.loop, 100)
+        pages = SearchPages(client, 'idx', '*:*', rows=10)
+
+        async def go():
+            async for doc in pages:
+                pages.close()
+                return doc
+        self.assertEqual({'n': 0}, self.loop.run_until_complete(go()))
+        self.loop.run_until_complete(asyncio.sleep(0.01, loop=self.loop))
+        self.assertEqual([0, 10], client.starts)
+        self.assertEqual([], self.collect(pages))
+
+
+class SearchTests(IntegrationTest, AsyncUnitTestCase):
+    def test_search_index_admin(self):
+        async def go():
+            index = self.randname()
+            await self.client.create_search_index(index, n_val=3)
+            self.assertEqual(
+                {'name': index, 'schema': '_yz_default', 'n_val': 3},
+                await self.client.get_search_index(index))
+            self.assertIn(index, [idx['name'] for idx in
+                                  await self.client.list_search_indexes()])
+            await self.client.delete_search_index(index)
+            with self.assertRaises(RiakError):
+                await self.client.get_search_index(index)
+
+            schema = await self.client.get_search_schema('_yz_default')
+            self.assertEqual('_yz_default', schema['name'])
+            self.assertIn('<schema', schema['content'])
+        self.loop.run_until_complete(go())
+
+    def test_paginate_search(self):
+        async def go():
+            index = self.randname()
+            await self.client.create_search_index(index)
+            bucket = self.client.bucket(self.bucket_name)
+            await bucket.set_property('search_index', index)
+            for n in range(12):
+                await bucket.new('key{}'.format(n),
+                                 data={'n_i': n}).store()
+
+            result = {'num_found': 0}
+            for _ in range(30):
+                result = await self.client.fulltext_search(
+                    index, 'n_i:[* TO *]', rows=0)
+                if result['num_found'] == 12:
+                    break
+                await asyncio.sleep(1, loop=self.loop)
+            self.assertEqual(12, result['num_found'])
+
+            found = []
+            async for doc in self.client.paginate_search(
+                    index, 'n_i:[* TO *]', rows=5, sort='n_i asc',
+                    fl=['n_i']):
+                found.append(int(doc['n_i']))
+            self.assertEqual(list(range(12)), found)
+        self.loop.run_until_complete(go())
@@ -0,0 +1,191 @@
+import datetime
+from unittest import mock
+from erlastic import encode, decode
+from erlastic.types import Atom
+from aioriak import ts
+from aioriak.error import RiakError
+from aioriak.tests.base import UnitTestCase
+from riak.pb import riak_ts_pb2, messages
+
+
+def ts_resp(pbclass, rows, **kwargs):
+    resp = pbclass(**kwargs)
+    for name, type_name in (('region', riak_ts_pb2.VARCHAR),
+                            ('time', riak_ts_pb2.TIMESTAMP),
+                            ('temperature', riak_ts_pb2.DOUBLE)):
+        resp.columns.add(name=name.encode(), type=type_name)
+    for region, time, temperature in rows:
+        cells = resp.rows.add().cells
+        cells.add(varchar_value=region.encode())
+        cells.add(timestamp_value=time)
+        if temperature is None:
+            cells.add()
+        else:
+            cells.add(double_value=temperature)
+    return resp
+
+
+class TsUnitTests(UnitTestCase):
+    rows = [('south', 1000, 21.5), ('north', 2000, None)]
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+
+    def respond(self, code, resp=None):
+        self.reader.feed_data(self.transport._encode_message(code, resp))
+
+    def sent(self, pbclass=None, index=-1):
+        data = self.writer.write.call_args_list[index][0][0][5:]
+        if pbclass is None:
+            return decode(data)
+        req = pbclass()
+        req.ParseFromString(data)
+        return req
+
+    def test_get_rows(self):
+        self.respond(messages.MSG_CODE_TS_GET_RESP,
+                     ts_resp(riak_ts_pb2.TsGetResp, self.rows[:1]))
+        result = self.loop.run_until_complete(self.transport.ts_get(
+            'weather', ['south', datetime.datetime(1970, 1, 1, 0, 0, 1)],
+            convert_timestamp=True))
+        self.assertEqual(['region', 'time', 'temperature'],
+                         result.columns.names)
+        self.assertEqual(['varchar', 'timestamp', 'double'],
+                         result.columns.types)
+        self.assertEqual(
+            [('south', datetime.datetime(1970, 1, 1, 0, 0, 1), 21.5)],
+            result.rows)
+        self.assertIsNone(result.data)
+        req = self.sent(riak_ts_pb2.TsGetReq)
+        self.assertEqual(b'weather', req.table)
+        self.assertEqual(b'south', req.key[0].varchar_value)
+        self.assertEqual(1000, req.key[1].timestamp_value)
+
+    def test_query_columnar(self):
+        self.respond(messages.MSG_CODE_TS_QUERY_RESP,
+                     ts_resp(riak_ts_pb2.TsQueryResp, self.rows))
+        with mock.patch.object(ts, 'numpy', None):
+            result = self.loop.run_until_complete(self.transport.ts_query(
+                'weather', 'SELECT * FROM {table}', columnar=True))
+        self.assertIsNone(result.rows)
+        self.assertEqual(2, len(result))
+        self.assertEqual({'region': ['south', 'north'],
+                          'time': [1000, 2000],
+                          'temperature': [21.5, None]}, dict(result.data))
+        self.assertEqual(['region', 'time', 'temperature'],
+                         list(result.data))
+        req = self.sent(riak_ts_pb2.TsQueryReq)
+        self.assertEqual(b'SELECT * FROM weather', req.query.base)
+
+    def test_query_empty(self):
+        self.respond(messages.MSG_CODE_TS_QUERY_RESP,
+                     riak_ts_pb2.TsQueryResp())
+        result = self.loop.run_until_complete(self.transport.ts_query(
+            'weather', 'SELECT * FROM weather'))
+        self.assertEqual([], result.rows)
+        self.assertEqual(0, len(result))
+
+    def test_query_braces(self):
+        self.respond(messages.MSG_CODE_TS_QUERY_RESP,
+                     riak_ts_pb2.TsQueryResp())
+        self.loop.run_until_complete(self.transport.ts_query(
+            'weather', "SELECT * FROM {table} WHERE region = '{x}'"))
+        req = self.sent(riak_ts_pb2.TsQueryReq)
+        self.assertEqual(b"SELECT * FROM weather WHERE region = '{x}'",
+                         req.query.base)
+
+    def test_put_batches(self):
+        for _ in range(3):
+            self.respond(messages.MSG_CODE_TS_PUT_RESP)
+        rows = [['south', datetime.datetime(1970, 1, 1), float(n), n % 2 == 0]
+                for n in range(5)]
+        self.assertTrue(self.loop.run_until_complete(self.transport.ts_put(
+            'weather', rows, batch_size=2, window=2)))
+        self.assertEqual(3, self.writer.write.call_count)
+        req = self.sent(riak_ts_pb2.TsPutReq, 0)
+        self.assertEqual(b'weather', req.table)
+        self.assertEqual(2, len(req.rows))
+        cells = req.rows[1].cells
+        self.assertEqual(b'south', cells[0].varchar_value)
+        self.assertEqual(0, cells[1].timestamp_value)
+        self.assertEqual(1.0, cells[2].double_value)
+        self.assertFalse(cells[3].boolean_value)
+        self.assertEqual(1, len(self.sent(riak_ts_pb2.TsPutReq).rows))
+
+        with self.assertRaises(RiakError):
+            self.loop.run_until_complete(
+                self.transport.ts_put('weather', [[object()]]))
+
+    def test_ttb(self):
+        resp = (Atom('tsqueryresp'),
+                ([b'region', b'time', b'temperature'],
+                 [Atom('varchar'), Atom('timestamp'), Atom('double')],
+                 [(b'south', 1000, 21.5), (b'north', 2000, [])]))
+        self.respond(messages.MSG_CODE_TS_TTB_MSG, encode(resp))
+        result = self.loop.run_until_complete(self.transport.ts_query(
+            'weather', 'SELECT * FROM weather', ttb=True))
+        self.assertEqual(['varchar', 'timestamp', 'double'],
+                         result.columns.types)
+        self.assertEqual([('south', 1000, 21.5), ('north', 2000, None)],
+                         result.rows)
+        req = self.sent()
+        self.assertEqual(Atom('tsqueryreq'), req[0])
+        self.assertEqual(b'SELECT * FROM weather', req[1][1])
+
+        self.respond(messages.MSG_CODE_TS_TTB_MSG, encode(Atom('tsputresp')))
+        self.respond(messages.MSG_CODE_TS_TTB_MSG,
+                     encode((Atom('rpberrorresp'), b'bad row', 1003)))
+        with self.assertRaisesRegex(RiakError, 'bad row'):
+            self.loop.run_until_complete(self.transport.ts_put(
+                'weather', [['south', 1000, 21.5], ['north', None, 1.0]],
+                ttb=True, batch_size=1))
+        self.assertEqual(
+            (Atom('tsputreq'), b'weather', [], [(b'north', [], 1.0)]),
+            self.sent())
+
+    def test_stream_keys(self):
+        for keys, done in (([('south', 1000)], False),
+                           ([], False),
+                           ([('north', 2000), ('east', 3000)], True)):
+            resp = riak_ts_pb2.TsListKeysResp(done=done)
+            for region, time in keys:
+                cells = resp.keys.add().cells
+                cells.add(varchar_value=region.encode())
+                cells.add(timestamp_value=time)
+            self.respond(messages.MSG_CODE_TS_LIST_KEYS_RESP, resp)
+
+        async def go():
+            stream = await self.transport.ts_stream_keys('weather',
+                                                         timeout=1000)
+            self.assertTrue(self.transport._lock.locked())
+            keys = []
+            async for key in stream:
+                keys.append(key)
+            return keys
+        self.assertEqual([('south', 1000), ('north', 2000), ('east', 3000)],
+                         self.loop.run_until_complete(go()))
+        self.assertFalse(self.transport._lock.locked())
+        req = self.sent(riak_ts_pb2.TsListKeysReq)
+        self.assertEqual(b'weather', req.table)
+        self.assertEqual(1000, req.timeout)
+
+    def test_stream_keys_close(self):
+        for done in (False, False, True):
+            resp = riak_ts_pb2.TsListKeysResp(done=done)
+            cells = resp.keys.add().cells
+            cells.add(varchar_value=b'south')
+            cells.add(timestamp_value=1000)
+            self.respond(messages.MSG_CODE_TS_LIST_KEYS_RESP, resp)
+        self.respond(messages.MSG_CODE_PING_RESP)
+
+        async def go():
+            stream = await self.transport.ts_stream_keys('weather')
+            self.assertEqual(('south', 1000), await stream.__anext__())
+            await stream.aclose()
+            self.assertFalse(self.transport._lock.locked())
+            await stream.aclose()
+            with self.assertRaises(StopAsyncIteration):
+                await stream.__anext__()
+            return await self.transport.ping()
+        self.assertTrue(self.loop.run_until_complete(go()))
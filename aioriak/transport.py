@@ -1,24 +1,35 @@
 import logging
 import asyncio
+import inspect
 import struct
 import json
 import warnings
 from riak.pb import riak_pb2
 from riak.pb import riak_dt_pb2
 from riak.pb import riak_kv_pb2
-from collections import ChainMap
+from riak.pb import riak_search_pb2
+from riak.pb import riak_yokozuna_pb2
+from riak.pb import riak_ts_pb2
 from riak.pb import messages
 from riak.codecs import pbuf as codec
 from aioriak.content import RiakContent
+from aioriak.datatypes.map import LazyMapValue
+from aioriak import ts
 from riak.riak_object import VClock
 from riak.util import decode_index_value, bytes_to_str, str_to_bytes
 from aioriak.error import RiakError
+from aioriak.util import discard_result
 
 
 MAX_CHUNK_SIZE = 65536
 
 logger = logging.getLogger('aioriak.transport')
 
+# Datatypes in fetch responses, riak.codecs.pbuf does not know gset
+DT_FETCH_TYPES = dict(codec.DT_FETCH_TYPES)
+DT_FETCH_TYPES[riak_dt_pb2.DtFetchResp.HLL] = 'hll'
+DT_FETCH_TYPES[riak_dt_pb2.DtFetchResp.GSET] = 'gset'
+
 
 def _validate_timeout(timeout):
     """
@@ -45,10 +56,12 @@ def _encode_link_field(value):
     return value.encode()
 
 
-async def create_transport(host='localhost', port=8087, loop=None):
+async def create_transport(host='localhost', port=8087, loop=None,
+                           sibling_stats=None):
     reader, writer = await asyncio.open_connection(
         host, port, loop=loop)
-    conn = RiakPbcAsyncTransport(reader, writer, loop=loop)
+    conn = RiakPbcAsyncTransport(reader, writer, loop=loop,
+                                 sibling_stats=sibling_stats)
     return conn
 
 
@@ -90,6 +103,9 @@ class RPBPacketParser:
             logger.error('Riak error message recieved: %s',
                          bytes_to_str(error.errmsg))
             raise RiakError(bytes_to_str(error.errmsg))
+        elif self.msg_code == messages.MSG_CODE_TS_TTB_MSG:
+            # Term-to-binary payloads are decoded by the caller
+            self.msg = bytes(self._msg[1:])
         elif self.msg_code in messages.MESSAGE_CLASSES:
             logger.debug('Normal message with code %d received', self.msg_code)
             self.msg = self._get_pb_msg(self.msg_code, self._msg[1:])
@@ -128,8 +144,9 @@ class RPBPacketParser:
     async def get_pbo(self):
         if self._parse_header():
             if self._check_eof():
-                self._parse_msg()
+                # The tail is kept even if the message is an error
                 self._grow_tail()
+                self._parse_msg()
                 return self.msg_code, self.msg
 
         while not self.at_eof():
@@ -137,8 +154,8 @@ class RPBPacketParser:
             self._data.extend(chunk)
             self._parse_header()
             if self._check_eof():
-                self._parse_msg()
                 self._grow_tail()
+                self._parse_msg()
                 return self.msg_code, self.msg
 
 
@@ -159,7 +176,7 @@ class RPBStreamParser:
     def tail(self):
         return self._in_buf
 
-    async def __aiter__(self):
+    def __aiter__(self):
         return self
 
     async def __anext__(self):
@@ -180,56 +197,248 @@ class RPBStreamParser:
         return code, pbo
 
 
-class MapRedStream:
+class MapRedResult:
     """
-    Wrapper for returning streaming result of MapReduce operation to user
+    Merges the parts of a MapReduce response as they arrive: list parts
+    are concatenated, dict parts are merged keeping the first value of
+    each key, and other parts are collected in a list.
     """
-    def __init__(self, stream_parser, expect=None):
+    def __init__(self, by_phase=False):
+        """
+        :param by_phase: whether to merge the parts of each phase apart
+        :type by_phase: bool
+        """
+        self._by_phase = by_phase
+        self._results = {}
+
+    def add(self, phase, part):
+        """
+        Merges a decoded part of the response.
+
+        :param phase: the phase number of the part
+        :type phase: int
+        :param part: the decoded part
+        """
+        key = phase if self._by_phase else None
+        try:
+            result = self._results[key]
+        except KeyError:
+            if isinstance(part, (list, dict)):
+                self._results[key] = part
+            else:
+                self._results[key] = [part]
+            return
+        if isinstance(result, dict):
+            for name, value in part.items():
+                result.setdefault(name, value)
+        elif isinstance(part, list):
+            result.extend(part)
+        else:
+            result.append(part)
+
+    def result(self):
+        """
+        Returns the merged result, or a dict of merged results by phase.
+        """
+        if self._by_phase:
+            return self._results
+        return self._results.get(None, [])
+
+
+class _ResponseStream:
+    """
+    Base of the streams reading a streamed response from the connection,
+    which is busy until the last frame is read.
+
+    A consumer leaving the stream before its end closes it, with
+    :meth:`aclose` or ``async with``, so that the remaining frames are
+    read and the connection is freed::
+
+        async with stream:
+            async for item in stream:
+                if done(item):
+                    break
+
+    :meth:`close` and the garbage collection of a stream left open read
+    the remaining frames in the background instead.
+    """
+    def __init__(self, stream_parser, on_done=None, loop=None):
         """
         :param stream_parser: instance of StreamParser
-        :param expect: expected message code for response packet
-        :type expect: int | None
+        :param on_done: called once when the stream is exhausted, fails
+            or is closed
+        :type on_done: callable | None
         """
+        self._loop = loop or asyncio.get_event_loop()
         self._stream_parser = stream_parser
         self._buf = iter([])  # initialize with empty iterator
-        self._phase = None
-        self._expect = expect
+        self._on_done = on_done
+
+    def __aiter__(self):
+        return self
 
-    async def __aiter__(self):
+    async def __aenter__(self):
         return self
 
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def __del__(self):
+        if self._on_done is not None and not self._loop.is_closed():
+            self.close()
+
+    async def aclose(self):
+        """
+        Reads and drops the remaining frames of the response, then frees
+        the connection. Does nothing if the stream is exhausted.
+        """
+        if self._on_done is None:
+            return
+        self._buf = iter([])
+        try:
+            async for _ in self._stream_parser:
+                pass
+        except RiakError:
+            # An error response ends the stream
+            pass
+        finally:
+            self._done()
+
+    def close(self):
+        """
+        Schedules :meth:`aclose` on the event loop, for callers that
+        cannot wait for it.
+        """
+        if self._on_done is not None:
+            future = asyncio.ensure_future(self.aclose(), loop=self._loop)
+            future.add_done_callback(discard_result)
+
+    def _done(self):
+        if self._on_done is not None:
+            on_done, self._on_done = self._on_done, None
+            on_done()
+
+
+class MapRedStream(_ResponseStream):
+    """
+    Wrapper for returning streaming result of MapReduce operation to user.
+
+    Frames are only read from the connection when the consumer asks for
+    the next item, so a slow consumer pauses the socket reads.
+    """
+    def __init__(self, stream_parser, expect=None, on_done=None,
+                 batch=False, loop=None):
+        """
+        :param stream_parser: instance of StreamParser
+        :param expect: expected message code for response packet
+        :type expect: int | None
+        :param on_done: called once when the stream is exhausted, fails
+            or is closed
+        :type on_done: callable | None
+        :param batch: whether to yield the decoded content of each frame
+            at once instead of item by item
+        :type batch: bool
+        """
+        super().__init__(stream_parser, on_done, loop)
+        self._phase = None
+        self._expect = expect
+        self._batch = batch
+
     async def __anext__(self):
         try:
             return self._phase, next(self._buf)
         except StopIteration:
-            msg_code, pbo = await self._stream_parser.__anext__()
-            if self._expect and self._expect != msg_code:
-                raise Exception(
-                    'Unexpected response code ({})'.format(msg_code))
+            pass
+        try:
+            return await self._next_part()
+        except BaseException:
+            self._done()
+            raise
+
+    async def _next_part(self):
+        msg_code, pbo = await self._stream_parser.__anext__()
+        if self._expect and self._expect != msg_code:
+            raise Exception(
+                'Unexpected response code ({})'.format(msg_code))
+
+        self._phase = pbo.phase
+        try:
+            part = json.loads(bytes_to_str(pbo.response))
+        except ValueError:
+            raise StopAsyncIteration
+        if self._batch:
+            return self._phase, part
+        self._buf = iter(part)
 
-            self._phase = pbo.phase
-            try:
-                self._buf = iter(json.loads(bytes_to_str(pbo.response)))
-            except ValueError:
-                raise StopAsyncIteration
+        try:
+            return self._phase, next(self._buf)
+        except StopIteration:
+            # usually we raise this on last part of the stream,
+            # when pbo.response is empty
+            raise StopAsyncIteration
 
-            try:
-                return self._phase, next(self._buf)
-            except StopIteration:
-                # usually we raise this on last part of the stream,
-                # when pbo.response is empty
-                raise StopAsyncIteration
+
+class TsKeyStream(_ResponseStream):
+    """
+    Async iterator over the keys of a Riak TS table, as tuples of cell
+    values, read from the connection as the consumer asks for them.
+    """
+    def __init__(self, stream_parser, on_done=None, batch=False,
+                 loop=None):
+        """
+        :param stream_parser: instance of StreamParser
+        :param on_done: called once when the stream is exhausted, fails
+            or is closed
+        :type on_done: callable | None
+        :param batch: whether to yield the keys of each frame at once
+        :type batch: bool
+        """
+        super().__init__(stream_parser, on_done, loop)
+        self._batch = batch
+
+    async def __anext__(self):
+        try:
+            return next(self._buf)
+        except StopIteration:
+            pass
+        try:
+            while True:
+                keys = await self._next_frame()
+                if self._batch:
+                    if keys:
+                        return keys
+                    continue
+                self._buf = iter(keys)
+                try:
+                    return next(self._buf)
+                except StopIteration:
+                    pass
+        except BaseException:
+            self._done()
+            raise
+
+    async def _next_frame(self):
+        msg_code, pbo = await self._stream_parser.__anext__()
+        if msg_code != messages.MSG_CODE_TS_LIST_KEYS_RESP:
+            raise Exception(
+                'Unexpected response code ({})'.format(msg_code))
+        return [tuple(ts.decode_cell(cell) for cell in row.cells)
+                for row in pbo.keys]
 
 
 class RiakPbcAsyncTransport:
     ParserClass = RPBPacketParser
     StreamParserClass = RPBStreamParser
 
-    def __init__(self, reader, writer, loop=None):
+    def __init__(self, reader, writer, loop=None, sibling_stats=None):
         self._loop = loop or asyncio.get_event_loop()
         self._writer = writer
         self._reader = reader
         self._parser = None
+        self._sibling_stats = sibling_stats
+        # Responses are read in request order on the single connection,
+        # so concurrent requests are serialized.
+        self._lock = asyncio.Lock(loop=self._loop)
 
     def _encode_content(self, robj, rpb_content):
         '''
@@ -241,17 +450,23 @@ class RiakPbcAsyncTransport:
         :param rpb_content: the protobuf message to fill
         :type rpb_content: riak_pb2.RpbContent
         '''
+        # Encoding the value may set the content encoding, so do it first
+        rpb_content.value = robj.encoded_data
         if robj.content_type:
             rpb_content.content_type = robj.content_type.encode()
         if robj.charset:
             rpb_content.charset = robj.charset.encode()
         if robj.content_encoding:
-            rpb_content.content_encoding = robj.content_encoding
-        for uk in robj.usermeta:
+            rpb_content.content_encoding = robj.content_encoding.encode()
+        # The metadata is read from the slots of the sibling, as reading
+        # the properties would allocate containers for missing metadata
+        sibling = robj.siblings[0]
+        usermeta = sibling._usermeta or {}
+        for uk in usermeta:
             pair = rpb_content.usermeta.add()
             pair.key = uk.encode()
-            pair.value = robj.usermeta[uk].encode()
-        for link in robj.links:
+            pair.value = usermeta[uk].encode()
+        for link in sibling._links or ():
             pb_link = rpb_content.links.add()
             try:
                 bucket, key, tag = link
@@ -265,7 +480,7 @@ class RiakPbcAsyncTransport:
             else:
                 pb_link.tag = b''
 
-        for field, value in robj.indexes:
+        for field, value in sibling._indexes or ():
             if isinstance(value, int):
                 value = str(value)
 
@@ -273,8 +488,6 @@ class RiakPbcAsyncTransport:
             pair.key = str_to_bytes(field)
             pair.value = value.encode()
 
-        rpb_content.value = robj.encoded_data
-
     def _encode_bucket_props(self, props, msg):
         '''
         Encodes a dict of bucket properties into the protobuf message.
@@ -374,7 +587,11 @@ class RiakPbcAsyncTransport:
     def _encode_message(self, msg_code, msg=None):
         if msg is None:
             return struct.pack("!iB", 1, msg_code)
-        msgstr = msg.SerializeToString()
+        if isinstance(msg, bytes):
+            # Already encoded, e.g. term-to-binary
+            msgstr = msg
+        else:
+            msgstr = msg.SerializeToString()
         slen = len(msgstr)
         hdr = struct.pack("!iB", 1 + slen, msg_code)
         return hdr + msgstr
@@ -393,6 +610,12 @@ class RiakPbcAsyncTransport:
             self._encode_set_op(req.op, op)
         elif dtype == 'map':
             self._encode_map_op(req.op.map_op, op)
+        elif dtype == 'hll':
+            req.op.hll_op.adds.extend(
+                str_to_bytes(element) for element in op['adds'])
+        elif dtype == 'gset':
+            req.op.gset_op.adds.extend(
+                str_to_bytes(element) for element in op['adds'])
         else:
             raise TypeError("Cannot send operation on datatype {!r}".
                             format(dtype))
@@ -506,7 +729,7 @@ class RiakPbcAsyncTransport:
         return req
 
     def _decode_dt_fetch(self, resp):
-        dtype = codec.DT_FETCH_TYPES.get(resp.type)
+        dtype = DT_FETCH_TYPES.get(resp.type)
         if dtype is None:
             raise ValueError("Unknown datatype on wire: {}".format(resp.type))
 
@@ -526,24 +749,35 @@ class RiakPbcAsyncTransport:
             return self._decode_set_value(msg.set_value)
         elif dtype == 'map':
             return self._decode_map_value(msg.map_value)
+        elif dtype == 'hll':
+            return msg.hll_value
+        elif dtype == 'gset':
+            return self._decode_set_value(msg.gset_value)
 
     def _decode_map_value(self, entries):
+        '''
+        Indexes map entries by key. Their values are only decoded when
+        the map accesses them.
+        '''
         out = {}
         for entry in entries:
             name = entry.field.name[:].decode()
             dtype = codec.MAP_FIELD_TYPES[entry.field.type]
-            if dtype == 'counter':
-                value = entry.counter_value
-            elif dtype == 'set':
-                value = self._decode_set_value(entry.set_value)
-            elif dtype == 'register':
-                value = entry.register_value[:].decode()
-            elif dtype == 'flag':
-                value = entry.flag_value
-            elif dtype == 'map':
-                value = self._decode_map_value(entry.map_value)
-            out[(name, dtype)] = value
-        return out
+            out[(name, dtype)] = entry
+        return LazyMapValue(out, self._decode_map_entry)
+
+    def _decode_map_entry(self, entry):
+        dtype = codec.MAP_FIELD_TYPES[entry.field.type]
+        if dtype == 'counter':
+            return entry.counter_value
+        elif dtype == 'set':
+            return self._decode_set_value(entry.set_value)
+        elif dtype == 'register':
+            return entry.register_value[:].decode()
+        elif dtype == 'flag':
+            return entry.flag_value
+        elif dtype == 'map':
+            return self._decode_map_value(entry.map_value)
 
     def _decode_set_value(self, set_value):
         return [string[:].decode() for string in set_value]
@@ -631,28 +865,75 @@ class RiakPbcAsyncTransport:
             return rw
 
     async def _stream(self, msg_code, msg=None, expect=None):
-        self._writer.write(self._encode_message(msg_code, msg))
-        self._parser = self.StreamParserClass(self._reader, loop=self._loop)
+        async with self._lock:
+            self._writer.write(self._encode_message(msg_code, msg))
+            self._parser = self.StreamParserClass(self._reader,
+                                                  loop=self._loop)
+            responses = []
+            async for code, pbo in self._parser:
+                if expect is not None and code != expect:
+                    raise Exception(
+                        'Unexpected response code ({})'.format(code))
+                responses.append((code, pbo))
+            return responses
+
+    async def _request(self, msg_code, msg=None, expect=None):
+        async with self._lock:
+            self._writer.write(self._encode_message(msg_code, msg))
+            code, response = await self._read_message()
+
+        if expect is not None and code != expect:
+            raise Exception('Unexpected response code ({})'.format(code))
+        return code, response
+
+    async def _pipeline(self, requests, expect=None, window=1):
+        '''
+        Sends requests without waiting for the previous responses, with
+        up to ``window`` of them in flight, and reads the responses in
+        order. Riak errors do not stop the pipeline: every response is
+        read so the connection stays in sync. An unexpected response code
+        stops sending requests, and is raised once the responses in
+        flight are read.
+
+        :param requests: pairs of message code and message
+        :type requests: list
+        :param expect: the expected response code
+        :type expect: int
+        :param window: the maximal number of requests in flight
+        :type window: int
+        :rtype: list of responses or :class:`~aioriak.error.RiakError`
+        '''
+        window = max(1, window)
         responses = []
-        async for code, pbo in self._parser:
-            if expect is not None and code != expect:
-                raise Exception('Unexpected response code ({})'.format(code))
-            responses.append((code, pbo))
+        error = None
+        async with self._lock:
+            sent = 0
+            total = len(requests)
+            while len(responses) < total:
+                while sent < total and sent - len(responses) < window:
+                    self._writer.write(self._encode_message(*requests[sent]))
+                    sent += 1
+                try:
+                    code, response = await self._read_message()
+                except RiakError as exc:
+                    responses.append(exc)
+                    continue
+                if expect is not None and code != expect and error is None:
+                    error = Exception(
+                        'Unexpected response code ({})'.format(code))
+                    total = sent
+                responses.append(response)
+        if error is not None:
+            raise error
         return responses
 
-    async def _request(self, msg_code, msg=None, expect=None):
-        self._writer.write(self._encode_message(msg_code, msg))
+    async def _read_message(self):
         if self._parser:
             tail = self._parser.tail
-            del self._parser
         else:
             tail = bytearray()
         self._parser = self.ParserClass(self._reader, tail, loop=self._loop)
-        code, response = await self._parser.get_pbo()
-
-        if expect is not None and code != expect:
-            raise Exception('Unexpected response code ({})'.format(code))
-        return code, response
+        return await self._parser.get_pbo()
 
     async def _read_response(self):
         while not self._reader.at_eof():
@@ -721,8 +1002,7 @@ class RiakPbcAsyncTransport:
             messages.MSG_CODE_GET_BUCKET_RESP)
         return self._decode_bucket_props(resp.props)
 
-    async def fetch_datatype(self, bucket, key):
-
+    def _encode_dt_fetch_req(self, bucket, key, **options):
         if bucket.bucket_type.is_default():
             raise NotImplementedError('Datatypes cannot be used in the default'
                                       ' bucket-type.')
@@ -730,6 +1010,12 @@ class RiakPbcAsyncTransport:
         req.type = bucket.bucket_type.name.encode()
         req.bucket = bucket.name.encode()
         req.key = key.encode()
+        _validate_timeout(options.get('timeout'))
+        self._encode_dt_options(req, options)
+        return req
+
+    async def fetch_datatype(self, bucket, key, **options):
+        req = self._encode_dt_fetch_req(bucket, key, **options)
 
         msg_code, resp = await self._request(messages.MSG_CODE_DT_FETCH_REQ,
                                              req,
@@ -737,6 +1023,24 @@ class RiakPbcAsyncTransport:
 
         return self._decode_dt_fetch(resp)
 
+    async def fetch_datatypes(self, bucket, keys, window=1, **options):
+        '''
+        Fetches several datatypes of a bucket, pipelining up to
+        ``window`` requests. Raises the first Riak error once all
+        responses are read.
+
+        :rtype: list of tuples of type, value and context
+        '''
+        requests = [(messages.MSG_CODE_DT_FETCH_REQ,
+                     self._encode_dt_fetch_req(bucket, key, **options))
+                    for key in keys]
+        responses = await self._pipeline(
+            requests, messages.MSG_CODE_DT_FETCH_RESP, window)
+        for resp in responses:
+            if isinstance(resp, RiakError):
+                raise resp
+        return [self._decode_dt_fetch(resp) for resp in responses]
+
     async def get_bucket_props(self, bucket):
         '''
         Serialize bucket property request and deserialize response
@@ -812,25 +1116,43 @@ class RiakPbcAsyncTransport:
                 keys.append(key.decode())
         return keys
 
-    def _decode_contents(self, contents, obj):
+    def _decode_contents(self, contents, obj, head_only=False):
         '''
         Decodes the list of siblings from the protobuf representation
-        into the object.
+        into the object. Siblings are resolved separately, by
+        :meth:`_resolve`.
 
         :param contents: a list of RpbContent messages
         :type contents: list
         :param obj: a RiakObject
         :type obj: RiakObject
+        :param head_only: whether the contents carry no values
+        :type head_only: bool
         :rtype RiakObject
         '''
-        obj.siblings = [self._decode_content(c, RiakContent(obj))
+        if self._sibling_stats is not None:
+            self._sibling_stats.record(obj, contents, head_only)
+        obj.siblings = [self._decode_content(c, RiakContent(obj), head_only)
                         for c in contents]
-        # Invoke sibling-resolution logic
-        if len(obj.siblings) > 1 and obj.resolver is not None:
-            obj.resolver(obj)
         return obj
 
-    def _decode_content(self, rpb_content, sibling):
+    async def _resolve(self, obj):
+        '''
+        Invokes the sibling-resolution logic of an object in conflict.
+        The resolver may return an awaitable, e.g. be a coroutine
+        function or run in an executor with
+        :func:`~aioriak.resolver.offload_resolver`, which is awaited
+        once the connection serves other requests again.
+
+        :param obj: a RiakObject
+        :type obj: RiakObject
+        '''
+        if len(obj.siblings) > 1 and obj.resolver is not None:
+            result = obj.resolver(obj)
+            if inspect.isawaitable(result):
+                await result
+
+    def _decode_content(self, rpb_content, sibling, head_only=False):
         '''
         Decodes a single sibling from the protobuf representation into
         a RiakObject.
@@ -839,6 +1161,8 @@ class RiakPbcAsyncTransport:
         :type rpb_content: riak_pb2.RpbContent
         :param sibling: a RiakContent sibling container
         :type sibling: RiakContent
+        :param head_only: whether the content carries no value
+        :type head_only: bool
         :rtype: RiakContent
         '''
 
@@ -855,23 +1179,44 @@ class RiakPbcAsyncTransport:
         if rpb_content.HasField("vtag"):
             sibling.etag = rpb_content.vtag.decode()
 
-        sibling.links = [self._decode_link(link)
-                         for link in rpb_content.links]
+        # Metadata containers are only allocated when the sibling
+        # actually carries metadata.
+        if rpb_content.links:
+            sibling.links = [self._decode_link(link)
+                             for link in rpb_content.links]
         if rpb_content.HasField("last_mod"):
             sibling.last_modified = float(rpb_content.last_mod)
             if rpb_content.HasField("last_mod_usecs"):
                 sibling.last_modified += rpb_content.last_mod_usecs / 1000000.0
 
-        sibling.usermeta = dict([(usermd.key.decode(), usermd.value.decode())
-                                 for usermd in rpb_content.usermeta])
-        sibling.indexes = set([(bytes_to_str(index.key),
-                                decode_index_value(index.key, index.value))
-                               for index in rpb_content.indexes])
+        if rpb_content.usermeta:
+            sibling.usermeta = dict([(usermd.key.decode(),
+                                      usermd.value.decode())
+                                     for usermd in rpb_content.usermeta])
+        if rpb_content.indexes:
+            sibling.indexes = set([(bytes_to_str(index.key),
+                                    decode_index_value(index.key,
+                                                       index.value))
+                                   for index in rpb_content.indexes])
 
-        sibling.encoded_data = rpb_content.value
+        if not head_only:
+            sibling.encoded_data = rpb_content.value
 
         return sibling
 
+    def _decode_heads(self, contents, obj):
+        '''
+        Decodes the sibling metadata returned by a put with
+        ``return_head``. Without conflict, the metadata updates the
+        stored sibling, which keeps its value. Otherwise the object gets
+        the metadata of every sibling, without values.
+        '''
+        if len(contents) == 1 and len(obj.siblings) == 1:
+            self._decode_content(contents[0], obj.siblings[0], head_only=True)
+        else:
+            obj.head_only = True
+            self._decode_contents(contents, obj, head_only=True)
+
     def _decode_link(self, link):
         '''
         Decodes an RpbLink message into a tuple
@@ -897,7 +1242,7 @@ class RiakPbcAsyncTransport:
         return (bucket, key, tag)
 
     async def get(self, robj, r=None, pr=None, timeout=None, basic_quorum=None,
-                  notfound_ok=None):
+                  notfound_ok=None, if_modified=None, head_only=False):
         '''
         Serialize get request and deserialize response
         '''
@@ -914,6 +1259,12 @@ class RiakPbcAsyncTransport:
             req.notfound_ok = notfound_ok
         if timeout:
             req.timeout = timeout
+        if if_modified:
+            if isinstance(if_modified, VClock):
+                if_modified = if_modified.encode('binary')
+            req.if_modified = if_modified
+        if head_only:
+            req.head = True
         req.deletedvclock = True
 
         req.bucket = bucket.name.encode()
@@ -922,12 +1273,22 @@ class RiakPbcAsyncTransport:
 
         msg_code, resp = await self._request(messages.MSG_CODE_GET_REQ, req,
                                              messages.MSG_CODE_GET_RESP)
-        if resp is not None:
+        robj.unchanged = False
+        robj.head_only = False
+        if resp is not None and resp.unchanged:
+            # Nothing was sent but the fact that the object is unchanged
+            robj.unchanged = True
+            if isinstance(if_modified, bytes):
+                robj.vclock = VClock(if_modified, 'binary')
+        elif resp is not None:
             if resp.HasField('vclock'):
                 robj.vclock = VClock(resp.vclock, 'binary')
             # We should do this even if there are no contents, i.e.
             # the object is tombstoned
-            self._decode_contents(resp.content, robj)
+            robj.head_only = head_only
+            self._decode_contents(resp.content, robj, head_only)
+            if not head_only:
+                await self._resolve(robj)
         else:
             # "not found" returns an empty message,
             # so let's make sure to clear the siblings
@@ -957,7 +1318,7 @@ class RiakPbcAsyncTransport:
             return results, None
 
     async def put(self, robj, w=None, dw=None, pw=None, return_body=True,
-                  if_none_match=False, timeout=None):
+                  if_none_match=False, timeout=None, return_head=False):
         bucket = robj.bucket
 
         req = riak_kv_pb2.RpbPutReq()
@@ -970,6 +1331,8 @@ class RiakPbcAsyncTransport:
 
         if return_body:
             req.return_body = 1
+        elif return_head:
+            req.return_head = 1
         if if_none_match:
             req.if_none_match = 1
         if timeout:
@@ -993,13 +1356,59 @@ class RiakPbcAsyncTransport:
                 robj.key = bytes_to_str(resp.key)
             if resp.HasField('vclock'):
                 robj.vclock = VClock(resp.vclock, 'binary')
-            if resp.content:
+            if resp.content and req.return_head:
+                self._decode_heads(resp.content, robj)
+            elif resp.content:
+                robj.head_only = False
                 self._decode_contents(resp.content, robj)
+                await self._resolve(robj)
         elif not robj.key:
             raise RiakError("missing response object")
 
         return robj
 
+    async def get_raw(self, bucket, keys, window=1):
+        '''
+        Fetches several objects of a bucket without decoding them,
+        pipelining up to ``window`` requests. Raises the first Riak error
+        once all responses are read.
+
+        :rtype: list of RpbGetResp messages, without content for
+            missing keys
+        '''
+        requests = []
+        for key in keys:
+            req = riak_kv_pb2.RpbGetReq()
+            req.bucket = str_to_bytes(bucket.name)
+            self._add_bucket_type(req, bucket.bucket_type)
+            req.key = str_to_bytes(key)
+            requests.append((messages.MSG_CODE_GET_REQ, req))
+        responses = await self._pipeline(
+            requests, messages.MSG_CODE_GET_RESP, window)
+        for resp in responses:
+            if isinstance(resp, RiakError):
+                raise resp
+        return responses
+
+    async def put_raw(self, bucket, requests, window=1):
+        '''
+        Stores RpbPutReq messages in a bucket, pipelining up to
+        ``window`` requests. The bucket of the messages is set, and
+        nothing is returned by Riak. Raises the first Riak error once
+        all responses are read.
+        '''
+        name = str_to_bytes(bucket.name)
+        for req in requests:
+            req.bucket = name
+            self._add_bucket_type(req, bucket.bucket_type)
+            req.return_body = False
+        responses = await self._pipeline(
+            [(messages.MSG_CODE_PUT_REQ, req) for req in requests],
+            messages.MSG_CODE_PUT_RESP, window)
+        for resp in responses:
+            if isinstance(resp, RiakError):
+                raise resp
+
     async def delete(self, robj):
         req = riak_kv_pb2.RpbDelReq()
 
@@ -1027,31 +1436,37 @@ class RiakPbcAsyncTransport:
         req.content_type = b'application/json'
         return req
 
-    async def mapred(self, inputs, query, timeout):
+    async def mapred(self, inputs, query, timeout, by_phase=False):
         """
         Send MR Job to Server.
-        Retrieves and merge all parts of result
+        Retrieves and merge all parts of result as they arrive
 
         :param inputs: map reduce source
         :type inputs: list | dict
         :param query: map reduce phases
         :type query: list[dict]
         :type timeout: int | None
-        :return: list
+        :param by_phase: whether to return the results of each phase apart
+        :type by_phase: bool
+        :return: list | dict
         """
         req = self._encode_mapred_req(inputs, query, timeout)
-        parts = await self._stream(messages.MSG_CODE_MAP_RED_REQ,
-                                   req,
-                                   messages.MSG_CODE_MAP_RED_RESP)
-        result = [json.loads(
-            bytes_to_str(part.response)) for _, part in parts if part.response]
-        if result and isinstance(result[0], list):
-            result = sum(result, [])
-        if result and isinstance(result[0], dict):
-            result = dict(ChainMap(*result))
-        return result
-
-    async def stream_mapred(self, inputs, query, timeout):
+        result = MapRedResult(by_phase)
+        async with self._lock:
+            self._writer.write(self._encode_message(
+                messages.MSG_CODE_MAP_RED_REQ, req))
+            self._parser = self.StreamParserClass(self._reader,
+                                                  loop=self._loop)
+            async for code, part in self._parser:
+                if code != messages.MSG_CODE_MAP_RED_RESP:
+                    raise Exception(
+                        'Unexpected response code ({})'.format(code))
+                if part.response:
+                    result.add(part.phase,
+                               json.loads(bytes_to_str(part.response)))
+        return result.result()
+
+    async def stream_mapred(self, inputs, query, timeout, batch=False):
         """
         Send MR Job to Server.
         Returns stream (async iterator) with result
@@ -1061,16 +1476,22 @@ class RiakPbcAsyncTransport:
         :param query: map reduce phases
         :type query: list[dict]
         :type timeout: int | None
+        :param batch: whether to yield the results of each frame at once
+        :type batch: bool
         :return: async iterator
         """
 
         req = self._encode_mapred_req(inputs, query, timeout)
 
+        # The connection stays busy until the stream is consumed
+        await self._lock.acquire()
         self._writer.write(self._encode_message(
             messages.MSG_CODE_MAP_RED_REQ, req))
         self._parser = self.StreamParserClass(self._reader, loop=self._loop)
         return MapRedStream(self._parser,
-                            expect=messages.MSG_CODE_MAP_RED_RESP)
+                            expect=messages.MSG_CODE_MAP_RED_RESP,
+                            on_done=self._lock.release, batch=batch,
+                            loop=self._loop)
 
     async def update_datatype(self, datatype, **options):
 
@@ -1107,3 +1528,214 @@ class RiakPbcAsyncTransport:
         datatype._set_value(self._decode_dt_value(type_name, resp))
 
         return True
+
+    async def search(self, index, query, **params):
+        '''
+        Performs a search query on a Riak Search index.
+
+        Field names repeat from one document to the next, so they are
+        decoded once per response.
+
+        :rtype: dict with ``docs``, ``num_found`` and ``max_score``
+        '''
+        req = riak_search_pb2.RpbSearchQueryReq(
+            index=str_to_bytes(index), q=str_to_bytes(query))
+        for name in ('sort', 'filter', 'df', 'op', 'presort'):
+            if params.get(name) is not None:
+                setattr(req, name, str_to_bytes(params[name]))
+        for name in ('rows', 'start'):
+            if params.get(name) is not None:
+                setattr(req, name, params[name])
+        fl = params.get('fl')
+        if fl is not None:
+            if isinstance(fl, str):
+                fl = [fl]
+            req.fl.extend(str_to_bytes(field) for field in fl)
+
+        msg_code, resp = await self._request(
+            messages.MSG_CODE_SEARCH_QUERY_REQ, req,
+            messages.MSG_CODE_SEARCH_QUERY_RESP)
+
+        names = {}
+        result = {'docs': [self._decode_search_doc(doc, names)
+                           for doc in resp.docs],
+                  'num_found': resp.num_found}
+        if resp.HasField('max_score'):
+            result['max_score'] = resp.max_score
+        return result
+
+    def _decode_search_doc(self, doc, names):
+        result = {}
+        for pair in doc.fields:
+            name = names.get(pair.key)
+            if name is None:
+                name = names[pair.key] = pair.key.decode()
+            value = pair.value.decode()
+            if name in result:
+                if isinstance(result[name], list):
+                    result[name].append(value)
+                else:
+                    result[name] = [result[name], value]
+            else:
+                result[name] = value
+        return result
+
+    def _decode_search_index(self, index):
+        result = {'name': index.name.decode()}
+        if index.HasField('schema'):
+            result['schema'] = index.schema.decode()
+        if index.HasField('n_val'):
+            result['n_val'] = index.n_val
+        return result
+
+    async def create_search_index(self, index, schema=None, n_val=None,
+                                  timeout=None):
+        _validate_timeout(timeout)
+        idx = riak_yokozuna_pb2.RpbYokozunaIndex(name=str_to_bytes(index))
+        if schema:
+            idx.schema = str_to_bytes(schema)
+        if n_val:
+            idx.n_val = n_val
+        req = riak_yokozuna_pb2.RpbYokozunaIndexPutReq(index=idx)
+        if timeout is not None:
+            req.timeout = timeout
+
+        await self._request(messages.MSG_CODE_YOKOZUNA_INDEX_PUT_REQ, req,
+                            messages.MSG_CODE_PUT_RESP)
+        return True
+
+    async def get_search_index(self, index):
+        req = riak_yokozuna_pb2.RpbYokozunaIndexGetReq(
+            name=str_to_bytes(index))
+
+        msg_code, resp = await self._request(
+            messages.MSG_CODE_YOKOZUNA_INDEX_GET_REQ, req,
+            messages.MSG_CODE_YOKOZUNA_INDEX_GET_RESP)
+        if not resp.index:
+            raise RiakError('notfound')
+        return self._decode_search_index(resp.index[0])
+
+    async def list_search_indexes(self):
+        req = riak_yokozuna_pb2.RpbYokozunaIndexGetReq()
+
+        msg_code, resp = await self._request(
+            messages.MSG_CODE_YOKOZUNA_INDEX_GET_REQ, req,
+            messages.MSG_CODE_YOKOZUNA_INDEX_GET_RESP)
+        return [self._decode_search_index(index) for index in resp.index]
+
+    async def delete_search_index(self, index):
+        req = riak_yokozuna_pb2.RpbYokozunaIndexDeleteReq(
+            name=str_to_bytes(index))
+
+        await self._request(messages.MSG_CODE_YOKOZUNA_INDEX_DELETE_REQ, req,
+                            messages.MSG_CODE_DEL_RESP)
+        return True
+
+    async def create_search_schema(self, schema, content):
+        req = riak_yokozuna_pb2.RpbYokozunaSchemaPutReq(
+            schema=riak_yokozuna_pb2.RpbYokozunaSchema(
+                name=str_to_bytes(schema), content=str_to_bytes(content)))
+
+        await self._request(messages.MSG_CODE_YOKOZUNA_SCHEMA_PUT_REQ, req,
+                            messages.MSG_CODE_PUT_RESP)
+        return True
+
+    async def get_search_schema(self, schema):
+        req = riak_yokozuna_pb2.RpbYokozunaSchemaGetReq(
+            name=str_to_bytes(schema))
+
+        msg_code, resp = await self._request(
+            messages.MSG_CODE_YOKOZUNA_SCHEMA_GET_REQ, req,
+            messages.MSG_CODE_YOKOZUNA_SCHEMA_GET_RESP)
+        return {'name': resp.schema.name.decode(),
+                'content': resp.schema.content.decode()}
+
+    async def ts_get(self, table, key, ttb=False, columnar=False,
+                     convert_timestamp=False):
+        builder = ts.TsResultBuilder(columnar, convert_timestamp)
+        if ttb:
+            msg_code, resp = await self._request(
+                messages.MSG_CODE_TS_TTB_MSG, ts.encode_ttb_get(table, key),
+                messages.MSG_CODE_TS_TTB_MSG)
+            builder.add_ttb(ts.decode_ttb(resp))
+        else:
+            req = riak_ts_pb2.TsGetReq(table=str_to_bytes(table))
+            for value in key:
+                ts.encode_cell(value, req.key.add())
+            msg_code, resp = await self._request(
+                messages.MSG_CODE_TS_GET_REQ, req,
+                messages.MSG_CODE_TS_GET_RESP)
+            builder.add_pb(resp)
+        return builder.result()
+
+    def _encode_ts_put_req(self, table, rows, ttb):
+        if ttb:
+            return messages.MSG_CODE_TS_TTB_MSG, ts.encode_ttb_put(table, rows)
+        req = riak_ts_pb2.TsPutReq(table=str_to_bytes(table))
+        for row in rows:
+            cells = req.rows.add().cells
+            for value in row:
+                ts.encode_cell(value, cells.add())
+        return messages.MSG_CODE_TS_PUT_REQ, req
+
+    async def ts_put(self, table, rows, ttb=False,
+                     batch_size=ts.DEFAULT_BATCH_SIZE,
+                     window=ts.DEFAULT_WINDOW):
+        '''
+        Writes rows to a TS table in requests of up to ``batch_size``
+        rows, pipelining up to ``window`` requests. Raises the first
+        Riak error once all responses are read.
+        '''
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+        rows = list(rows)
+        requests = [self._encode_ts_put_req(table, rows[i:i + batch_size],
+                                            ttb)
+                    for i in range(0, len(rows), batch_size)]
+        expect = (messages.MSG_CODE_TS_TTB_MSG if ttb
+                  else messages.MSG_CODE_TS_PUT_RESP)
+        responses = await self._pipeline(requests, expect, window)
+        errors = [resp for resp in responses if isinstance(resp, RiakError)]
+        if ttb:
+            for resp in responses:
+                try:
+                    if not isinstance(resp, RiakError):
+                        ts.decode_ttb(resp)
+                except RiakError as exc:
+                    errors.append(exc)
+        if errors:
+            raise errors[0]
+        return True
+
+    async def ts_query(self, table, query, ttb=False, columnar=False,
+                       convert_timestamp=False):
+        # Other braces may appear in the query, e.g. in literals
+        query = query.replace('{table}', table)
+        builder = ts.TsResultBuilder(columnar, convert_timestamp)
+        if ttb:
+            msg_code, resp = await self._request(
+                messages.MSG_CODE_TS_TTB_MSG, ts.encode_ttb_query(query),
+                messages.MSG_CODE_TS_TTB_MSG)
+            builder.add_ttb(ts.decode_ttb(resp))
+        else:
+            req = riak_ts_pb2.TsQueryReq()
+            req.query.base = str_to_bytes(query)
+            msg_code, resp = await self._request(
+                messages.MSG_CODE_TS_QUERY_REQ, req,
+                messages.MSG_CODE_TS_QUERY_RESP)
+            builder.add_pb(resp)
+        return builder.result()
+
+    async def ts_stream_keys(self, table, timeout=None, batch=False):
+        _validate_timeout(timeout)
+        req = riak_ts_pb2.TsListKeysReq(table=str_to_bytes(table))
+        if timeout is not None:
+            req.timeout = timeout
+
+        # The connection stays busy until the stream is consumed
+        await self._lock.acquire()
+        self._writer.write(self._encode_message(
+            messages.MSG_CODE_TS_LIST_KEYS_REQ, req))
+        self._parser = self.StreamParserClass(self._reader, loop=self._loop)
+        return TsKeyStream(self._parser, on_done=self._lock.release,
+                           batch=batch, loop=self._loop)
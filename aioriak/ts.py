@@ -0,0 +1,306 @@
+'''
+Riak TS (time series) tables.
+
+Rows are sent and received either as protocol buffers messages or, when
+the client is created with ``ts_ttb=True``, as Erlang term-to-binary
+(TTB) encoded messages, which Riak TS 1.5 and later decode faster.
+
+Results hold either rows, as tuples, or columns. Columns are NumPy
+arrays when the ``numpy`` package is installed and plain lists
+otherwise.
+'''
+import datetime
+from collections import OrderedDict, namedtuple
+from erlastic import encode, decode
+from erlastic.types import Atom
+from riak.pb import riak_ts_pb2
+from riak.util import unix_time_millis, datetime_from_unix_time_millis
+from aioriak.error import RiakError
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+#: Default number of rows per put request
+DEFAULT_BATCH_SIZE = 1000
+
+#: Default number of put requests in flight
+DEFAULT_WINDOW = 4
+
+#: Names and types of the columns of a result
+TsColumns = namedtuple('TsColumns', ['names', 'types'])
+
+_COLUMN_TYPES = {
+    riak_ts_pb2.VARCHAR: 'varchar',
+    riak_ts_pb2.SINT64: 'sint64',
+    riak_ts_pb2.DOUBLE: 'double',
+    riak_ts_pb2.TIMESTAMP: 'timestamp',
+    riak_ts_pb2.BOOLEAN: 'boolean',
+    riak_ts_pb2.BLOB: 'blob',
+}
+
+# TsCell fields holding the values of each column type
+_CELL_FIELDS = {
+    'varchar': 'varchar_value',
+    'sint64': 'sint64_value',
+    'double': 'double_value',
+    'timestamp': 'timestamp_value',
+    'boolean': 'boolean_value',
+    'blob': 'varchar_value',
+}
+
+# NumPy dtypes of the columns without missing values
+_DTYPES = {
+    'sint64': 'int64',
+    'double': 'float64',
+    'timestamp': 'int64',
+    'boolean': 'bool',
+}
+
+_UNDEFINED = Atom('undefined')
+_TS_GET_REQ = Atom('tsgetreq')
+_TS_GET_RESP = Atom('tsgetresp')
+_TS_PUT_REQ = Atom('tsputreq')
+_TS_QUERY_REQ = Atom('tsqueryreq')
+_TS_QUERY_RESP = Atom('tsqueryresp')
+_TS_INTERPOLATION = Atom('tsinterpolation')
+_RPB_ERROR_RESP = Atom('rpberrorresp')
+
+
+class TsResult:
+    '''
+    The result of a Riak TS get or query.
+
+    In row mode, :attr:`rows` is a list of tuples and :attr:`data` is
+    None. In columnar mode, :attr:`data` maps each column name to the
+    column values and :attr:`rows` is None.
+    '''
+    def __init__(self, columns, rows=None, data=None):
+        #: Names and types of the columns, a :class:`TsColumns`
+        self.columns = columns
+        #: The rows, as tuples of cell values
+        self.rows = rows
+        #: The columns by name, as NumPy arrays or lists
+        self.data = data
+
+    def __len__(self):
+        if self.rows is not None:
+            return len(self.rows)
+        for values in self.data.values():
+            return len(values)
+        return 0
+
+    def __repr__(self):
+        return '<TsResult columns={!r} length={}>'.format(
+            list(self.columns.names), len(self))
+
+
+def encode_cell(value, cell):
+    '''
+    Fills a protobuf ``TsCell`` with a value. None leaves the cell empty.
+
+    :param value: the cell value
+    :type value: str | bytes | int | float | bool | datetime | None
+    :param cell: the cell to fill
+    :type cell: riak.pb.riak_ts_pb2.TsCell
+    '''
+    if value is None:
+        return
+    if isinstance(value, datetime.datetime):
+        cell.timestamp_value = unix_time_millis(value)
+    elif isinstance(value, bool):
+        cell.boolean_value = value
+    elif isinstance(value, bytes):
+        cell.varchar_value = value
+    elif isinstance(value, str):
+        cell.varchar_value = value.encode()
+    elif isinstance(value, int):
+        cell.sint64_value = value
+    elif isinstance(value, float):
+        cell.double_value = value
+    else:
+        raise RiakError("can't serialize type '{}', value '{}'".format(
+            type(value), value))
+
+
+def encode_ttb_cell(value):
+    '''
+    Returns the TTB term of a cell value.
+    '''
+    if value is None:
+        return []
+    if isinstance(value, datetime.datetime):
+        return unix_time_millis(value)
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, (bool, bytes, int, float)):
+        return value
+    raise RiakError("can't serialize type '{}', value '{}'".format(
+        type(value), value))
+
+
+def encode_ttb_get(table, key):
+    return encode((_TS_GET_REQ, table.encode(),
+                   [encode_ttb_cell(value) for value in key], _UNDEFINED))
+
+
+def encode_ttb_put(table, rows):
+    return encode((_TS_PUT_REQ, table.encode(), [],
+                   [tuple(encode_ttb_cell(value) for value in row)
+                    for row in rows]))
+
+
+def encode_ttb_query(query):
+    return encode((_TS_QUERY_REQ,
+                   (_TS_INTERPOLATION, query.encode(), []),
+                   False, _UNDEFINED))
+
+
+def decode_ttb(data):
+    '''
+    Decodes a TTB response, raising the Riak errors it holds.
+    '''
+    if not data:
+        return None
+    term = decode(data)
+    if isinstance(term, tuple) and term[0] == _RPB_ERROR_RESP:
+        raise RiakError(term[1].decode())
+    return term
+
+
+def decode_cell(cell):
+    '''
+    Returns the value of a protobuf ``TsCell`` of unknown type. Varchar
+    values are decoded to str.
+    '''
+    fields = cell.ListFields()
+    if not fields:
+        return None
+    field, value = fields[0]
+    if field.name == 'varchar_value':
+        return value.decode()
+    return value
+
+
+class TsResultBuilder:
+    '''
+    Collects the rows of TS responses into a :class:`TsResult`.
+
+    :param columnar: whether to build columns instead of rows
+    :type columnar: bool
+    :param convert_timestamp: whether to convert timestamps to
+        :class:`datetime.datetime`, or ``datetime64[ms]`` arrays
+    :type convert_timestamp: bool
+    '''
+    def __init__(self, columnar=False, convert_timestamp=False):
+        self._columnar = columnar
+        self._convert_timestamp = convert_timestamp
+        self._columns = None
+        self._rows = []
+        self._data = None
+
+    def add_pb(self, resp):
+        '''
+        Adds the rows of a ``TsGetResp`` or ``TsQueryResp`` message.
+        '''
+        if self._columns is None and resp.columns:
+            self._set_columns(
+                [column.name.decode() for column in resp.columns],
+                [_COLUMN_TYPES[column.type] for column in resp.columns])
+        if not resp.rows:
+            return
+        if self._columnar:
+            for index, type_name in enumerate(self._columns.types):
+                field = _CELL_FIELDS[type_name]
+                self._data[index].extend(
+                    getattr(row.cells[index], field)
+                    if row.cells[index].HasField(field) else None
+                    for row in resp.rows)
+        else:
+            fields = [_CELL_FIELDS[type_name]
+                      for type_name in self._columns.types]
+            self._rows.extend(
+                tuple(getattr(cell, field) if cell.HasField(field) else None
+                      for cell, field in zip(row.cells, fields))
+                for row in resp.rows)
+
+    def add_ttb(self, term):
+        '''
+        Adds the rows of a decoded TTB ``tsgetresp`` or ``tsqueryresp``.
+        '''
+        # Empty results are sometimes a bare atom
+        if not isinstance(term, tuple):
+            return
+        if term[0] not in (_TS_GET_RESP, _TS_QUERY_RESP):
+            raise RiakError('Unknown TTB response type: {}'.format(term[0]))
+        if not term[1]:
+            return
+        names, types, rows = term[1]
+        if self._columns is None:
+            self._set_columns([name.decode() for name in names],
+                              [str(type_name) for type_name in types])
+        if self._columnar:
+            for index, values in enumerate(zip(*rows)):
+                self._data[index].extend(
+                    None if value == [] or value == _UNDEFINED else value
+                    for value in values)
+        else:
+            self._rows.extend(
+                tuple(None if value == [] or value == _UNDEFINED else value
+                      for value in row)
+                for row in rows)
+
+    def result(self):
+        '''
+        Returns the collected :class:`TsResult`.
+        '''
+        columns = self._columns or TsColumns([], [])
+        if self._columnar:
+            data = OrderedDict(
+                (name, self._to_column(type_name, values))
+                for name, type_name, values in zip(
+                    columns.names, columns.types, self._data or []))
+            return TsResult(columns, data=data)
+        varchars = [index for index, type_name in enumerate(columns.types)
+                    if type_name == 'varchar']
+        timestamps = []
+        if self._convert_timestamp:
+            timestamps = [index
+                          for index, type_name in enumerate(columns.types)
+                          if type_name == 'timestamp']
+        if varchars or timestamps:
+            self._rows = [self._convert_row(row, varchars, timestamps)
+                          for row in self._rows]
+        return TsResult(columns, rows=self._rows)
+
+    def _set_columns(self, names, types):
+        self._columns = TsColumns(names, types)
+        self._data = [[] for _ in names]
+
+    def _convert_row(self, row, varchars, timestamps):
+        row = list(row)
+        for index in varchars:
+            if row[index] is not None:
+                row[index] = row[index].decode()
+        for index in timestamps:
+            if row[index] is not None:
+                row[index] = datetime_from_unix_time_millis(row[index])
+        return tuple(row)
+
+    def _to_column(self, type_name, values):
+        if type_name == 'varchar':
+            values = [None if value is None else value.decode()
+                      for value in values]
+        if numpy is None or None in values:
+            if self._convert_timestamp and type_name == 'timestamp':
+                values = [None if value is None
+                          else datetime_from_unix_time_millis(value)
+                          for value in values]
+            if numpy is None:
+                return values
+            return numpy.array(values, dtype=object)
+        if self._convert_timestamp and type_name == 'timestamp':
+            return numpy.array(values, dtype='datetime64[ms]')
+        return numpy.array(values, dtype=_DTYPES.get(type_name, object))
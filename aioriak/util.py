@@ -0,0 +1,12 @@
+'''
+Helpers shared by the modules of the package.
+'''
+
+
+def discard_result(future):
+    '''
+    Done callback of futures whose result is not needed, which retrieves
+    their exception so that it is not logged as never retrieved.
+    '''
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,76 @@
+'''
+A bounded cache of the last vector clock seen for each key, so that
+objects created with :meth:`Bucket.new <aioriak.bucket.Bucket.new>` can
+be stored over an existing key without fetching it first and without
+creating siblings.
+
+Enabled with the ``vclock_cache_size`` argument of
+:class:`~aioriak.client.RiakClient`.
+'''
+from collections import OrderedDict
+
+
+class VClockCache:
+    '''
+    Least recently used mapping of ``(bucket, key)`` to the last vector
+    clock seen for the key, holding up to ``size`` keys.
+
+    Fetches and stores that return a vector clock record it. Stores that
+    do not, and deletes, drop it since it is then outdated.
+
+    :param size: the maximal number of keys
+    :type size: int
+    '''
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError('size must be a positive integer')
+        self._size = size
+        self._vclocks = OrderedDict()
+
+    def __len__(self):
+        return len(self._vclocks)
+
+    @staticmethod
+    def _key(bucket, key):
+        return bucket.bucket_type.name, bucket.name, key
+
+    def get(self, bucket, key):
+        '''
+        Returns the last vector clock seen for a key, if cached.
+
+        :param bucket: the bucket of the key
+        :type bucket: :class:`~aioriak.bucket.Bucket`
+        :param key: the key
+        :type key: str
+        :rtype: :class:`~riak.riak_object.VClock` or None
+        '''
+        cache_key = self._key(bucket, key)
+        vclock = self._vclocks.get(cache_key)
+        if vclock is not None:
+            self._vclocks.move_to_end(cache_key)
+        return vclock
+
+    def set(self, bucket, key, vclock):
+        '''
+        Records the vector clock of a key, or drops it if None.
+        '''
+        cache_key = self._key(bucket, key)
+        if vclock is None:
+            self._vclocks.pop(cache_key, None)
+            return
+        self._vclocks[cache_key] = vclock
+        self._vclocks.move_to_end(cache_key)
+        if len(self._vclocks) > self._size:
+            self._vclocks.popitem(last=False)
+
+    def discard(self, bucket, key):
+        '''
+        Drops the vector clock of a key.
+        '''
+        self._vclocks.pop(self._key(bucket, key), None)
+
+    def clear(self):
+        '''
+        Drops all vector clocks.
+        '''
+        self._vclocks.clear()
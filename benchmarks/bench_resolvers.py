@@ -0,0 +1,63 @@
+'''
+Measures the time taken by the resolvers of :mod:`aioriak.resolver` on
+objects with many siblings.
+
+Objects are built the same way the transport builds them after a fetch:
+siblings holding their encoded value, a last modification time and, for
+the JSON merge, a timestamp in their usermeta. Half of the siblings
+repeat the value of another one, as siblings written by retries do.
+
+Usage::
+
+    python benchmarks/bench_resolvers.py [siblings] [repeat]
+'''
+import sys
+import timeit
+from aioriak.client import RiakClient
+from aioriak.content import RiakContent
+from aioriak.riak_object import RiakObject
+from aioriak.resolver import (
+    last_written_resolver, json_merge_resolver, set_union_resolver,
+    max_resolver, sum_resolver)
+
+
+def dict_value(i):
+    return '{{"field{}": {}, "shared": {}}}'.format(i % 50, i, i).encode()
+
+
+def list_value(i):
+    return '["item{}", "item{}"]'.format(i, i + 1).encode()
+
+
+def number_value(i):
+    return str(i).encode()
+
+
+def build(bucket, siblings, value):
+    obj = RiakObject(bucket._client, bucket, 'key')
+    obj.siblings = []
+    for i in range(siblings):
+        sibling = RiakContent(obj, encoded_data=value(i // 2), exists=True,
+                              last_modified=1500000000.0 + i)
+        sibling.usermeta = {'timestamp': str(i)}
+        obj.siblings.append(sibling)
+    return obj
+
+
+def main(siblings=1000, repeat=20):
+    bucket = RiakClient().bucket('bench')
+    cases = [('last_written_resolver', last_written_resolver, dict_value),
+             ('json_merge_resolver', json_merge_resolver(), dict_value),
+             ('set_union_resolver', set_union_resolver, list_value),
+             ('max_resolver', max_resolver, number_value),
+             ('sum_resolver', sum_resolver, number_value)]
+    for name, resolver, value in cases:
+        objects = [build(bucket, siblings, value) for _ in range(repeat)]
+        it = iter(objects)
+        elapsed = timeit.timeit(lambda: resolver(next(it)), number=repeat)
+        print('{:<22} {} siblings: {:8.3f} ms'.format(
+            name, siblings, elapsed / repeat * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
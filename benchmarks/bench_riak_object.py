@@ -0,0 +1,49 @@
+'''
+Measures the memory footprint of cached
+:class:`~aioriak.riak_object.RiakObject` instances.
+
+Objects are built the same way the transport builds them after a fetch:
+one :class:`~aioriak.content.RiakContent` sibling holding the encoded
+value and no user metadata, links or indexes.
+
+Usage::
+
+    python benchmarks/bench_riak_object.py [count]
+'''
+import sys
+import tracemalloc
+from aioriak.bucket import Bucket, BucketType
+from aioriak.content import RiakContent
+from aioriak.riak_object import RiakObject
+
+
+def build(bucket, count):
+    objects = []
+    for i in range(count):
+        obj = RiakObject(None, bucket, 'key-{}'.format(i))
+        sibling = RiakContent(obj)
+        sibling.exists = True
+        sibling.encoded_data = b'{"value": 1}'
+        sibling.last_modified = 1500000000.0
+        obj.siblings = [sibling]
+        objects.append(obj)
+    return objects
+
+
+def main(count=100000):
+    bucket = Bucket(None, 'bench', BucketType(None, 'default'))
+    # Keys are allocated outside of the measured region
+    build(bucket, 1)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = build(bucket, count)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('{} objects: {:.1f} bytes per object'.format(
+        len(objects), (after - before) / count))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -141,6 +141,8 @@ class create_bucket_types(Command):
     * `pytest-maps` with ``{"datatype":"map"}``
     * `pytest-sets` with ``{"datatype":"set"}``
     * `pytest-counters` with ``{"datatype":"counter"}``
+    * `pytest-hlls` with ``{"datatype":"hll"}``
+    * `pytest-gsets` with ``{"datatype":"gset"}``
     * `pytest-consistent` with ``{"consistent":true}``
     * `pytest-write-once` with ``{"write_once": true}``
     * `pytest-mr`
@@ -157,6 +159,8 @@ class create_bucket_types(Command):
         'pytest-maps': {'datatype': 'map'},
         'pytest-sets': {'datatype': 'set'},
         'pytest-counters': {'datatype': 'counter'},
+        'pytest-hlls': {'datatype': 'hll'},
+        'pytest-gsets': {'datatype': 'gset'},
         'pytest-consistent': {'consistent': True},
         'pytest-write-once': {'write_once': True},
         'pytest-mr': {},
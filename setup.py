@@ -40,6 +40,16 @@ setup(
     tests_require=req_file('requirements-tests.txt'),
     extras_require={
         'dev': req_file('requirements-dev.txt'),
+        'orjson': ['orjson'],
+        'ujson': ['ujson'],
+        'msgpack': ['msgpack'],
+        'zstd': ['zstandard'],
+        'lz4': ['lz4'],
+        'numpy': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': ['aioriak-sweep = aioriak.sweeper:main',
+                            'aioriak-backup = aioriak.backup:main'],
     },
     cmdclass={
         'test': Test,